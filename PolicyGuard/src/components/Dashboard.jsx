@@ -55,42 +55,26 @@ export default function Dashboard({ userId }) {
         setViolations([])
 
         try {
-            // 0. Reset Backend State for Isolated Scan
-            const resetRes = await fetch(`${BASE_URL}/scan/reset`, { method: 'POST', headers: authHeaders() })
-            if (!resetRes.ok) throw new Error('Failed to isolate scan environment.')
-
-            // 1. Upload Policy PDF
-            const policyFormData = new FormData()
-            policyFormData.append('file', pdfFile)
-            const policyRes = await fetch(`${BASE_URL}/policies/upload`, {
+            // Reset, policy extraction, dataset import and scan in one pipelined request
+            const runFormData = new FormData()
+            runFormData.append('policy', pdfFile)
+            runFormData.append('dataset', csvFile)
+            runFormData.append('reset', 'true')
+            const runRes = await fetch(`${BASE_URL}/scan/run`, {
                 method: 'POST',
-                body: policyFormData,
+                headers: authHeaders(),
+                body: runFormData,
             })
-            if (!policyRes.ok) throw new Error(`Policy upload failed: ${await policyRes.text()}`)
-            const policyData = await policyRes.json()
-
-            // 2. Upload Employee Dataset CSV
-            const csvFormData = new FormData()
-            csvFormData.append('file', csvFile)
-            const csvRes = await fetch(`${BASE_URL}/employees/batch`, {
-                method: 'POST',
-                body: csvFormData,
-            })
-            if (!csvRes.ok) throw new Error(`Dataset format invalid: ${await csvRes.text()}`)
-            const csvData = await csvRes.json()
-
-            // 3. Trigger Scan
-            const scanRes = await fetch(`${BASE_URL}/scan/trigger`, { method: 'POST', headers: authHeaders() })
-            if (!scanRes.ok) throw new Error(`Scan failed: ${await scanRes.text()}`)
-            const scanData = await scanRes.json()
+            if (!runRes.ok) throw new Error(`Compliance run failed: ${await runRes.text()}`)
+            const runData = await runRes.json()
 
-            // 4. Build Summary
-            const totalViolations = scanData.length
-            setViolations(scanData)
+            // Build Summary
+            const totalViolations = runData.violations.length
+            setViolations(runData.violations)
             const newSummary = {
                 compliance_score: Math.max(0, 100 - (totalViolations * 5)),
-                total_records: csvData.imported_count || csvData.records_imported || 0,
-                total_rules: policyData.rules?.length || 0,
+                total_records: runData.dataset.records_imported || 0,
+                total_rules: runData.policy.rules?.length || 0,
                 violations_found: totalViolations
             }
             setSummary(newSummary)
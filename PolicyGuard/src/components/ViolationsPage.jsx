@@ -3,6 +3,11 @@ import ViolationsTable from './ViolationsTable'
 
 const BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000/api'
 
+function authHeaders() {
+    const token = localStorage.getItem('pg_token')
+    return token ? { 'Authorization': `Bearer ${token}` } : {}
+}
+
 export default function ViolationsPage() {
     const [violations, setViolations] = useState([])
     const [loading, setLoading] = useState(true)
@@ -12,7 +17,7 @@ export default function ViolationsPage() {
         setLoading(true)
         setError('')
         try {
-            const res = await fetch(`${BASE_URL}/violations/`)
+            const res = await fetch(`${BASE_URL}/violations/`, { headers: authHeaders() })
             if (!res.ok) throw new Error('Failed to fetch violations')
             const data = await res.json()
             setViolations(data)
@@ -0,0 +1,103 @@
+"""
+bench_login.py — Login throughput under a burst of concurrent logins
+=====================================================================
+Fires N concurrent /api/auth/login requests at the app in-process and, while
+they are running, probes GET / to measure how long unrelated requests wait.
+
+Usage (from backend/):
+    python benchmarks/bench_login.py --logins 64 --concurrency 64
+    python benchmarks/bench_login.py --inline     # bcrypt on the event loop, for comparison
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db")
+
+import httpx  # noqa: E402
+
+from main import app  # noqa: E402
+from routers import auth as auth_router  # noqa: E402
+from services import auth_service  # noqa: E402
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000
+
+
+async def _run(args):
+    if args.inline:
+        async def verify_inline(plain, hashed):
+            return auth_service.verify_password(plain, hashed)
+        auth_router.verify_password_async = verify_inline
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/api/auth/register", json={
+            "email": "bench@example.com", "username": "bench", "password": "bench-password",
+        })
+
+        sem = asyncio.Semaphore(args.concurrency)
+        login_latencies, statuses = [], {}
+
+        async def login():
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.post("/api/auth/login", json={
+                    "email": "bench@example.com", "password": "bench-password",
+                })
+                login_latencies.append(time.perf_counter() - t0)
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+        probe_latencies = []
+        done = asyncio.Event()
+
+        async def probe():
+            # Latency includes any time spent waiting for the loop to wake us up
+            while not done.is_set():
+                t0 = time.perf_counter()
+                await asyncio.sleep(0.005)
+                await client.get("/")
+                probe_latencies.append(time.perf_counter() - t0 - 0.005)
+
+        probe_task = asyncio.create_task(probe())
+        t0 = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(args.logins)))
+        elapsed = time.perf_counter() - t0
+        done.set()
+        await probe_task
+
+    mode = "inline (event loop)" if args.inline else \
+        f"executor ({auth_service.settings.PASSWORD_HASH_WORKERS} workers)"
+    print(f"bcrypt rounds      : {auth_service.settings.BCRYPT_ROUNDS}")
+    print(f"mode               : {mode}")
+    print(f"logins             : {args.logins} (concurrency {args.concurrency})")
+    print(f"status codes       : {statuses}")
+    print(f"wall time          : {elapsed:.2f} s")
+    print(f"throughput         : {args.logins / elapsed:.1f} logins/s")
+    print(f"login p50 / p95    : {_percentile(login_latencies, 50):.0f} / "
+          f"{_percentile(login_latencies, 95):.0f} ms")
+    if probe_latencies:
+        print(f"GET / p50 / max    : {statistics.median(probe_latencies) * 1000:.1f} / "
+              f"{max(probe_latencies) * 1000:.1f} ms ({len(probe_latencies)} probes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--inline", action="store_true", help="verify passwords on the event loop")
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+bench_mixed_load.py — Dashboard reads while scans and imports write
+===================================================================
+Seeds a workspace with the sample policy and dataset, then for a fixed
+duration runs concurrent readers (violations of one employee, as the
+dashboard polls them) against a writer that keeps inserting employees and
+re-triggering scans. Reports read latency percentiles and both throughputs.
+
+Usage (from backend/):
+    python benchmarks/bench_mixed_load.py --seconds 10 --readers 8
+    python benchmarks/bench_mixed_load.py --journal-mode DELETE   # pre-WAL behaviour
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000 if values else 0.0
+
+
+async def _run(args):
+    import httpx
+    from main import app
+    from config import settings
+
+    policy_path = os.path.join(REPO_DIR, "PolicyGuard", "Global_Policy_V2.pdf")
+    dataset_path = os.path.join(REPO_DIR, "PolicyGuard", "Policy_Compliance_Dataset_Updated.csv")
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        with open(policy_path, "rb") as pdf, open(dataset_path, "rb") as csv:
+            r = await client.post("/api/scan/run", files={
+                "policy": ("Global_Policy_V2.pdf", pdf, "application/pdf"),
+                "dataset": ("dataset.csv", csv, "text/csv"),
+            })
+        r.raise_for_status()
+        employee_count = r.json()["employee_count"]
+
+        deadline = time.perf_counter() + args.seconds
+        read_latencies, read_errors = [], 0
+        writes = {"employees": 0, "scans": 0}
+
+        async def reader():
+            nonlocal read_errors
+            while time.perf_counter() < deadline:
+                employee_id = random.randint(1, employee_count)
+                t0 = time.perf_counter()
+                r = await client.get("/api/violations/", params={"employee_id": employee_id})
+                read_latencies.append(time.perf_counter() - t0)
+                if r.status_code != 200:
+                    read_errors += 1
+
+        async def writer():
+            n = 0
+            while time.perf_counter() < deadline:
+                n += 1
+                await client.post("/api/employees/", json={
+                    "employee_id": f"bench-{n}", "name": "Bench", "working_days": random.randint(10, 26),
+                })
+                writes["employees"] += 1
+                if n % 10 == 0:
+                    await client.post("/api/scan/trigger")
+                    writes["scans"] += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(writer(), *(reader() for _ in range(args.readers)))
+        elapsed = time.perf_counter() - t0
+
+    print(f"journal mode       : {settings.SQLITE_JOURNAL_MODE}")
+    print(f"pools              : 1 writer, {settings.DB_READ_POOL_SIZE} readers")
+    print(f"duration           : {elapsed:.1f} s, {args.readers} concurrent readers")
+    print(f"reads              : {len(read_latencies)} ({len(read_latencies) / elapsed:.0f}/s, {read_errors} errors)")
+    print(f"read p50/p95/p99   : {_percentile(read_latencies, 50):.1f} / "
+          f"{_percentile(read_latencies, 95):.1f} / {_percentile(read_latencies, 99):.1f} ms")
+    print(f"writes             : {writes['employees']} employee inserts, {writes['scans']} scans")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--journal-mode", default=None, help="override SQLITE_JOURNAL_MODE")
+    parser.add_argument("--read-pool", type=int, default=None, help="override DB_READ_POOL_SIZE")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db")
+    if args.journal_mode:
+        os.environ["SQLITE_JOURNAL_MODE"] = args.journal_mode
+    if args.read_pool:
+        os.environ["DB_READ_POOL_SIZE"] = str(args.read_pool)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
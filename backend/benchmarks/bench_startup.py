@@ -0,0 +1,79 @@
+"""
+bench_startup.py — Cold start: import time and time to first response
+======================================================================
+Each run happens in a fresh interpreter so nothing is already imported.
+Reports the time to `import main`, the time until startup hooks finish and
+GET / answers, and which heavy optional modules were loaded along the way
+(none of them should be until a request needs them).
+
+Usage (from backend/):
+    python benchmarks/bench_startup.py --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("pandas", "numpy", "pdfplumber", "google.genai")
+
+_CHILD = r"""
+import asyncio, json, sys, time
+t0 = time.perf_counter()
+import main
+t_import = time.perf_counter() - t0
+
+import httpx
+
+async def first_response():
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        r = await client.get("/")
+        assert r.status_code == 200
+    return time.perf_counter() - t0
+
+t_first = asyncio.run(first_response())
+print(json.dumps({
+    "import_s": t_import,
+    "first_response_s": t_first,
+    "heavy_loaded": [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def _run_once(db_url: str) -> dict:
+    env = dict(os.environ, DATABASE_URL=db_url)
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    db_url = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+    # The first boot creates the schema; later boots only check its version
+    first_boot = _run_once(db_url)
+    runs = [_run_once(db_url) for _ in range(args.runs)]
+
+    imports = [r["import_s"] * 1000 for r in runs]
+    firsts = [r["first_response_s"] * 1000 for r in runs]
+    print(f"runs                   : {args.runs} (after one schema-creating boot)")
+    print(f"first boot             : {first_boot['first_response_s'] * 1000:.0f} ms to first response")
+    print(f"import main  median/min: {statistics.median(imports):.0f} / {min(imports):.0f} ms")
+    print(f"first response med/min : {statistics.median(firsts):.0f} / {min(firsts):.0f} ms")
+    print(f"heavy modules loaded   : {runs[-1]['heavy_loaded'] or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
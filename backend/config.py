@@ -1,4 +1,5 @@
 import os
+from typing import List
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -6,6 +7,75 @@ class Settings(BaseSettings):
     # Provide defaults to simplify local setup if a user prefers it
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./policyguard.db")
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    DB_ECHO: bool = False                   # log every SQL statement
+
+    # Connection pools — one serialized writer per workspace, read-only pool for GET routes
+    DB_WRITE_POOL_SIZE: int = 1
+    DB_READ_POOL_SIZE: int = 4
+    DB_CONTROL_POOL_SIZE: int = 5           # users and scan logs
+
+    # SQLite pragmas applied to every new connection
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_CACHE_SIZE_KB: int = 65536       # page cache per connection
+    SQLITE_MMAP_SIZE: int = 268435456       # bytes of the file memory-mapped per connection
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+
+    # Per-user workspaces — one SQLite file per tenant (SQLite deployments only)
+    WORKSPACE_ISOLATION: bool = True
+    WORKSPACE_DIR: str = "./workspaces"
+
+    # Password hashing — bcrypt runs in a dedicated thread pool
+    BCRYPT_ROUNDS: int = 12                 # work factor; existing hashes are upgraded on login
+    PASSWORD_HASH_WORKERS: int = 4          # threads dedicated to bcrypt
+    PASSWORD_HASH_MAX_PENDING: int = 64     # queued + running operations before answering 503
+
+    # Verified JWT cache — entries never outlive the token's own `exp`
+    TOKEN_CACHE_SIZE: int = 1024
+    TOKEN_CACHE_TTL_SECONDS: int = 300
+
+    # Read-through cache for dashboard read endpoints (entries across all workspaces)
+    QUERY_CACHE_MAX_ENTRIES: int = 256
+
+    # Retention — old violations / scan logs are archived to Parquet, then deleted.
+    # A limit of 0 keeps rows forever; count limits are per workspace (violations)
+    # and per user (scan logs), keeping the newest rows.
+    RETENTION_ENABLED: bool = False         # run the background sweep
+    RETENTION_INTERVAL_SECONDS: int = 3600
+    VIOLATION_MAX_AGE_DAYS: int = 0
+    VIOLATION_MAX_ROWS: int = 0
+    SCAN_LOG_MAX_AGE_DAYS: int = 0
+    SCAN_LOG_MAX_ROWS: int = 0
+    RETENTION_ARCHIVE: bool = True          # False deletes without archiving
+    ARCHIVE_DIR: str = "./archives"
+    RETENTION_BATCH_SIZE: int = 2000        # rows per delete transaction
+    RETENTION_BATCH_PAUSE_MS: int = 50      # yield the writer between batches
+    RETENTION_MAX_ROWS_PER_RUN: int = 200000  # one archive file per run; the rest waits for the next
+
+    # Batch policy upload — PDFs are parsed in worker processes, rules extracted concurrently
+    POLICY_BATCH_MAX_FILES: int = 50
+    PDF_EXTRACT_WORKERS: int = 0            # 0 = one per CPU
+    RULE_EXTRACTION_CONCURRENCY: int = 4    # files extracting rules (calling the model) at once
+
+    # Admin-only routes (profiling, loop lag) accept this X-Admin-Token or a
+    # Bearer token of one of these users; with neither set they are closed
+    ADMIN_TOKEN: str = ""
+    ADMIN_USER_IDS: List[int] = []
+
+    # Profiling — captures are armed through /api/admin/profiles, or requested
+    # per call by an admin with ?profile=cprofile|sample when PROFILE_REQUEST_FLAG is set
+    PROFILE_REQUEST_FLAG: bool = False
+    PROFILE_DIR: str = "./profiles"
+    PROFILE_MAX_FILES: int = 50
+    PROFILE_SAMPLE_INTERVAL_MS: float = 5
+    LOOP_LAG_MONITOR: bool = False          # start the event-loop lag monitor at startup
+    LOOP_LAG_THRESHOLD_MS: float = 100
+    LOOP_LAG_MAX_EVENTS: int = 200
+
+    # Scheduled scans — cron schedules per workspace, run inside the API process
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_TICK_SECONDS: int = 30
+    SCHEDULER_MAX_CONCURRENT_SCANS: int = 2  # across all workspaces
 
     class Config:
         env_file = ".env"
@@ -1,20 +1,244 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+import asyncio
+import os
+
+from fastapi import Depends
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
 from sqlalchemy.orm import declarative_base
 from config import settings
+from dependencies import get_current_user_id
+
+
+# ─── Storage configuration ─────────────────────────────────────────────────────
+# SQLite connections are tuned on connect (WAL, synchronous, cache/mmap sizes)
+# and begin their transactions explicitly, so schema changes roll back too.
+# Every workspace gets a single serialized writer connection plus a pool of
+# read-only connections; with WAL, readers never wait on an in-progress scan.
+
+def _sqlite_pragmas(readonly: bool) -> list:
+    pragmas = [
+        f"PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA cache_size = -{int(settings.SQLITE_CACHE_SIZE_KB)}",
+        f"PRAGMA mmap_size = {int(settings.SQLITE_MMAP_SIZE)}",
+        f"PRAGMA busy_timeout = {int(settings.SQLITE_BUSY_TIMEOUT_MS)}",
+        "PRAGMA temp_store = MEMORY",
+    ]
+    if readonly:
+        pragmas.append("PRAGMA query_only = ON")
+    return pragmas
+
+
+def _make_engine(url: str, pool_size: int, readonly: bool = False) -> AsyncEngine:
+    if not url.startswith("sqlite"):
+        return create_async_engine(url, echo=settings.DB_ECHO, future=True, pool_size=pool_size)
+
+    # SQLite requires specific connect_args to avoid thread issues, even with async
+    new_engine = create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        future=True,
+        connect_args={"check_same_thread": False},
+        pool_size=pool_size,
+        max_overflow=0,
+    )
+    pragmas = _sqlite_pragmas(readonly)
+
+    @event.listens_for(new_engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+        # The sqlite3 module only opens a transaction before DML, so DDL would
+        # autocommit; SQLAlchemy emits BEGIN itself instead (see below)
+        dbapi_connection.isolation_level = None
 
-# SQLite requires specific connect_args to avoid thread issues, even with async
-engine = create_async_engine(
-    settings.DATABASE_URL, 
-    echo=True, 
-    future=True,
-    connect_args={"check_same_thread": False}
-)
-AsyncSessionLocal = async_sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
-)
+    @event.listens_for(new_engine.sync_engine, "begin")
+    def _on_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    return new_engine
+
+
+def _sessionmaker(target_engine: AsyncEngine) -> async_sessionmaker:
+    return async_sessionmaker(target_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+# Control database: users and scan logs
+engine = _make_engine(settings.DATABASE_URL, pool_size=settings.DB_CONTROL_POOL_SIZE)
+AsyncSessionLocal = _sessionmaker(engine)
 
 Base = declarative_base()
 
-async def get_db():
+
+# ─── Schema ────────────────────────────────────────────────────────────────────
+# Creating tables reflects every table on every boot. SQLite databases instead
+# record SCHEMA_VERSION in PRAGMA user_version and skip create_all when it matches.
+# Bump this whenever models.py changes. Columns added to existing tables are
+# created in place with ALTER TABLE ADD COLUMN, so new columns must be nullable;
+# indexes added to existing tables are created on the same upgrade.
+
+SCHEMA_VERSION = 9
+
+
+def _add_missing_columns(sync_conn, tables: list | None = None) -> None:
+    inspector = inspect(sync_conn)
+    for table in tables or Base.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        missing = [c for c in table.columns if c.name not in existing]
+        for column in missing:
+            col_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}")
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+async def ensure_schema(target_engine: AsyncEngine, tables: list | None = None) -> None:
+    is_sqlite = target_engine.dialect.name == "sqlite"
+    async with target_engine.begin() as conn:
+        if is_sqlite:
+            current = (await conn.exec_driver_sql("PRAGMA user_version")).scalar()
+            if current == SCHEMA_VERSION:
+                return
+        await conn.run_sync(Base.metadata.create_all, tables=tables)
+        if is_sqlite:
+            await conn.run_sync(_add_missing_columns, tables)
+            await conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+# ─── Workspaces ────────────────────────────────────────────────────────────────
+# Each authenticated user gets a private SQLite file holding their policies,
+# rules, employees and violations. Scans only ever touch the caller's file and
+# a reset drops and recreates that file's tables instead of DELETEs over shared tables.
+
+DEFAULT_WORKSPACE = "default"
+
+# Tables that live in a workspace; users, scan logs and schedules stay in the control database
+WORKSPACE_TABLES = ("policies", "rules", "employees", "violations", "json_path_buffers")
+
+
+class Workspace:
+    def __init__(self, key: str, url: str):
+        self.key = key
+        self.engine = _make_engine(url, pool_size=settings.DB_WRITE_POOL_SIZE)
+        self.sessionmaker = _sessionmaker(self.engine)
+        if url.startswith("sqlite"):
+            self.read_engine = _make_engine(url, pool_size=settings.DB_READ_POOL_SIZE, readonly=True)
+            self.read_sessionmaker = _sessionmaker(self.read_engine)
+        else:
+            self.read_engine = self.engine
+            self.read_sessionmaker = self.sessionmaker
+
+    async def dispose(self) -> None:
+        await self.engine.dispose()
+        if self.read_engine is not self.engine:
+            await self.read_engine.dispose()
+
+
+# Anonymous requests share a workspace stored in the main database
+_workspaces: dict = {DEFAULT_WORKSPACE: Workspace(DEFAULT_WORKSPACE, settings.DATABASE_URL)}
+_workspaces_lock = asyncio.Lock()
+
+
+def _isolation_enabled() -> bool:
+    return settings.WORKSPACE_ISOLATION and settings.DATABASE_URL.startswith("sqlite")
+
+
+def workspace_key(user_id: int | None) -> str:
+    """Anonymous requests (and non-SQLite deployments) share the default workspace."""
+    if user_id is None or not _isolation_enabled():
+        return DEFAULT_WORKSPACE
+    return f"tenant_{user_id}"
+
+
+def workspace_path(key: str) -> str:
+    return os.path.join(settings.WORKSPACE_DIR, f"{key}.db")
+
+
+def workspace_tables() -> list:
+    return [Base.metadata.tables[name] for name in WORKSPACE_TABLES]
+
+
+def workspace_keys() -> list:
+    """Every workspace with data on disk: the default one plus one per tenant file."""
+    keys = [DEFAULT_WORKSPACE]
+    if _isolation_enabled() and os.path.isdir(settings.WORKSPACE_DIR):
+        keys += sorted(
+            name[:-3] for name in os.listdir(settings.WORKSPACE_DIR)
+            if name.startswith("tenant_") and name.endswith(".db")
+        )
+    return keys
+
+
+async def get_workspace(key: str) -> Workspace:
+    ws = _workspaces.get(key)
+    if ws is not None:
+        return ws
+
+    async with _workspaces_lock:
+        ws = _workspaces.get(key)
+        if ws is None:
+            os.makedirs(settings.WORKSPACE_DIR, exist_ok=True)
+            ws = Workspace(key, f"sqlite+aiosqlite:///{workspace_path(key)}")
+            await ensure_schema(ws.engine, tables=workspace_tables())
+            _workspaces[key] = ws
+    return ws
+
+
+def _recreate_tables(session) -> None:
+    # The metadata's after_drop / after_create hooks drop and rebuild the search index
+    tables = workspace_tables()
+    connection = session.connection()
+    Base.metadata.drop_all(connection, tables=tables)
+    Base.metadata.create_all(connection, tables=tables)
+
+
+async def clear_workspace(session: AsyncSession) -> None:
+    """
+    Empty the workspace tables inside the session's transaction by dropping
+    and recreating them (DDL is transactional in SQLite), so a caller can
+    empty and refill a workspace in one commit. Unlike DELETEs, dropping
+    frees whole pages instead of visiting every row and index entry, and
+    skips the search-index triggers that would fire for every policy and rule.
+    """
+    await session.run_sync(_recreate_tables)
+
+
+async def reset_workspace(key: str) -> None:
+    """
+    Empty a workspace (see clear_workspace) under its writer connection. The
+    file and engines stay in place, so requests that already hold the Workspace (or a session on it)
+    keep working against the same database: writers queue behind the reset
+    on the single writer connection and readers keep their WAL snapshot.
+    """
+    ws = await get_workspace(key)
+    async with ws.sessionmaker() as session:
+        await clear_workspace(session)
+        await session.commit()
+
+
+async def close_workspaces() -> None:
+    for ws in list(_workspaces.values()):
+        await ws.dispose()
+    await engine.dispose()
+
+
+async def get_db(user_id: int | None = Depends(get_current_user_id)):
+    """Session on the caller's workspace writer connection."""
+    ws = await get_workspace(workspace_key(user_id))
+    async with ws.sessionmaker() as session:
+        yield session
+
+
+async def get_read_db(user_id: int | None = Depends(get_current_user_id)):
+    """Session on the caller's workspace read-only pool, for GET routes."""
+    ws = await get_workspace(workspace_key(user_id))
+    async with ws.read_sessionmaker() as session:
+        yield session
+
+
+async def get_control_db():
+    """Session bound to the control database (users, scan logs, schedules)."""
     async with AsyncSessionLocal() as session:
         yield session
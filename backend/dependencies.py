@@ -0,0 +1,48 @@
+import hmac
+
+from fastapi import HTTPException, Request
+
+from config import settings
+from services.auth_service import decode_token_cached
+
+
+def get_current_user_id(request: Request) -> int | None:
+    """
+    Shared auth dependency: returns the user id from the Bearer JWT, or None
+    when the request is anonymous or the token is missing/invalid.
+    The id is also stored on request.state.user_id for downstream use.
+    """
+    user_id = None
+    auth = request.headers.get("Authorization", "")
+    if auth.startswith("Bearer "):
+        payload = decode_token_cached(auth[7:])
+        if payload:
+            try:
+                user_id = int(payload.get("sub"))
+            except (TypeError, ValueError):
+                pass
+    request.state.user_id = user_id
+    return user_id
+
+
+def is_admin(request: Request) -> bool:
+    """
+    True for a request carrying the configured X-Admin-Token, or a Bearer token
+    of a user listed in ADMIN_USER_IDS. Nobody is an admin until one is set.
+    """
+    token = request.headers.get("X-Admin-Token", "")
+    if settings.ADMIN_TOKEN and token and hmac.compare_digest(token, settings.ADMIN_TOKEN):
+        return True
+    user_id = getattr(request.state, "user_id", None)
+    if user_id is None:
+        user_id = get_current_user_id(request)
+    return user_id is not None and user_id in settings.ADMIN_USER_IDS
+
+
+def require_admin(request: Request) -> None:
+    """Dependency for process-wide controls: 401 for anonymous callers, 403 for non-admins."""
+    if is_admin(request):
+        return
+    if get_current_user_id(request) is None and not request.headers.get("X-Admin-Token"):
+        raise HTTPException(status_code=401, detail="Authentication required")
+    raise HTTPException(status_code=403, detail="Admin access required")
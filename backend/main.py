@@ -1,9 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from config import settings
-from database import engine, Base
+from database import engine, ensure_schema, close_workspaces
 
-from routers import policies, rules, employees, scan, violations, auth
+from routers import policies, rules, employees, scan, violations, auth, admin, dashboard, analysis, schedules
+from services import retention, batch_upload, profiling, scheduler
 
 app = FastAPI(title=settings.PROJECT_NAME)
 
@@ -15,17 +16,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.middleware("http")(profiling.request_middleware)
+
 app.include_router(policies.router)
 app.include_router(rules.router)
 app.include_router(employees.router)
 app.include_router(scan.router)
 app.include_router(violations.router)
+app.include_router(dashboard.router)
+app.include_router(analysis.router)
+app.include_router(schedules.router)
 app.include_router(auth.router)
+app.include_router(admin.router)
 
 @app.on_event("startup")
 async def startup():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    await ensure_schema(engine)
+    retention.start()
+    scheduler.start()
+    if settings.LOOP_LAG_MONITOR:
+        profiling.start_loop_monitor()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await scheduler.stop()
+    await retention.stop()
+    await profiling.stop_loop_monitor()
+    batch_upload.shutdown()
+    await close_workspaces()
 
 @app.get("/")
 async def root():
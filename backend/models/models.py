@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text, JSON
+from sqlalchemy import Column, Integer, SmallInteger, Float, String, Boolean, ForeignKey, DateTime, Text, JSON, LargeBinary, event
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -8,6 +8,9 @@ class Policy(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, index=True)
+    name = Column(String, nullable=True, index=True)  # Policy family, e.g. 'Global_Policy' for V2/V3
+    version = Column(Integer, default=1)
+    previous_version_id = Column(Integer, ForeignKey("policies.id"), nullable=True)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
     extracted_text = Column(Text, nullable=True)
 
@@ -21,6 +24,7 @@ class Rule(Base):
     description = Column(Text)
     field = Column(String, nullable=True)     # Which employee field this rule checks
     condition = Column(String, nullable=True) # The condition (e.g., '< 20', '== False')
+    expression = Column(Text, nullable=True)  # Compound condition, see services/rule_expressions.py
     severity = Column(String, default="Medium")
     is_active = Column(Boolean, default=True)
 
@@ -33,7 +37,7 @@ class Employee(Base):
     id = Column(Integer, primary_key=True, index=True)
     employee_id = Column(String, unique=True, index=True)
     name = Column(String)
-    department = Column(String, nullable=True)
+    department = Column(String, nullable=True, index=True)
     role = Column(String, nullable=True)
     working_days = Column(Integer, default=0)
     target_sales = Column(Integer, default=0)
@@ -44,25 +48,71 @@ class Employee(Base):
     target_not_met = Column(Boolean, default=False)
     low_customer_satisfaction = Column(Boolean, default=False)
     non_compliance_reason = Column(String, nullable=True)
-    month = Column(String, nullable=True)
+    month = Column(String, nullable=True, index=True)
     
     data = Column(JSON, nullable=True) 
 
     violations = relationship("Violation", back_populates="employee")
 
+class JsonPathBuffer(Base):
+    """Elements one Employee.data path selects for a block of employees, packed for scans (services/json_buffers.py)."""
+    __tablename__ = "json_path_buffers"
+
+    path = Column(String, primary_key=True)       # e.g. 'data.recent_trades[].amount'
+    is_text = Column(Boolean, primary_key=True)   # string elements; otherwise numbers
+    block = Column(Integer, primary_key=True)     # employee id // BLOCK_SIZE
+    size = Column(Integer, default=0)
+    employee_ids = Column(LargeBinary)            # int64 per element, ascending
+    elements = Column(LargeBinary)                # float64 per element, or a JSON list of strings
+
+
+# Created on an existing database (schema upgrade): build it from the stored employees
+@event.listens_for(JsonPathBuffer.__table__, "after_create")
+def _backfill_json_buffers(target, connection, **kw):
+    from services.json_buffers import backfill  # the service imports these models
+
+    backfill(connection)
+
+# Violations store severity as a small integer code
+SEVERITY_CODES = {"Low": 1, "Medium": 2, "High": 3, "Critical": 4}
+SEVERITY_NAMES = {code: name for name, code in SEVERITY_CODES.items()}
+
 class Violation(Base):
     __tablename__ = "violations"
 
     id = Column(Integer, primary_key=True, index=True)
-    employee_id = Column(Integer, ForeignKey("employees.id"))
-    rule_id = Column(Integer, ForeignKey("rules.id"))
-    description = Column(Text) # Renamed from details
-    severity = Column(String, default="Medium") 
+    employee_id = Column(Integer, ForeignKey("employees.id"), index=True)
+    rule_id = Column(Integer, ForeignKey("rules.id"), index=True)
+    scan_id = Column(String, nullable=True)            # ScanLog.scan_id of the scan that found it
+    observed_value = Column(Float, nullable=True)      # what the employee had (numeric rules)
+    ref_value = Column(Float, nullable=True)           # the compared column's value (ref rules)
+    observed_text = Column(Text, nullable=True)        # string value, or an expression's observed values
+    severity_code = Column(SmallInteger, nullable=True)  # see SEVERITY_CODES
+    # Pre-compaction rows keep their rendered text; new rows leave these NULL
+    legacy_description = Column("description", Text, nullable=True)
+    legacy_severity = Column("severity", String, nullable=True)
     timestamp = Column(DateTime, default=datetime.utcnow) # Renamed from detected_at
 
     employee = relationship("Employee", back_populates="violations")
     rule = relationship("Rule", back_populates="violations")
 
+    @property
+    def severity(self) -> str:
+        return SEVERITY_NAMES.get(self.severity_code) or self.legacy_severity or "Medium"
+
+    @property
+    def description(self) -> str:
+        """Rendered from the rule, which must be loaded (selectinload / assigned) in async code."""
+        if self.legacy_description is not None:
+            return self.legacy_description
+        if self.rule is None:
+            return ""
+        from services.compliance_engine import Observation, render_description
+        return render_description(
+            self.rule.field, self.rule.condition, self.rule.expression,
+            Observation(self.observed_value, self.ref_value, self.observed_text),
+        )
+
 class User(Base):
     __tablename__ = "users"
 
@@ -83,4 +133,101 @@ class ScanLog(Base):
     violation_count = Column(Integer, default=0)
     employee_count  = Column(Integer, default=0)
     scanned_at      = Column(DateTime, default=datetime.utcnow)
+    trigger_type    = Column(String, nullable=True)   # manual | pipeline | scheduled
+    duration_ms     = Column(Float, nullable=True)
+    cached_from     = Column(String, nullable=True)   # scan whose result an unchanged scan reused
+
+class ScanSchedule(Base):
+    """Recurring scan of one user's workspace (control database)."""
+    __tablename__ = "scan_schedules"
 
+    id              = Column(Integer, primary_key=True, index=True)
+    user_id         = Column(Integer, nullable=True, index=True)  # FK to users.id; None = default workspace
+    name            = Column(String, nullable=True)
+    cron            = Column(String, nullable=False)              # 5-field cron or @hourly / @daily / ..., UTC
+    mode            = Column(String, default="standard")          # standard | fused
+    enabled         = Column(Boolean, default=True)
+    created_at      = Column(DateTime, default=datetime.utcnow)
+    next_run_at     = Column(DateTime, nullable=True, index=True)
+    last_run_at     = Column(DateTime, nullable=True)
+    last_status     = Column(String, nullable=True)               # scanned | unchanged | no data | failed: ...
+    last_scan_id    = Column(String, nullable=True)
+
+
+
+# ─── Full-text search index (SQLite FTS5) ──────────────────────────────────────
+# One FTS5 table indexes policy text and rule descriptions; triggers on the
+# base tables keep it in sync, so uploads, version moves and deletes need no
+# application code. Row ids encode the source: policy id * 2, rule id * 2 + 1.
+
+SEARCH_INDEX = "search_index"
+
+_SEARCH_RULE_TITLE = ("trim(coalesce({r}.field, '') || ' ' || coalesce({r}.condition, '') "
+                      "|| ' ' || coalesce({r}.expression, ''))")
+
+_SEARCH_INDEX_DDL = [
+    f"""CREATE VIRTUAL TABLE {SEARCH_INDEX} USING fts5(
+        title, body, kind UNINDEXED, ref_id UNINDEXED, policy_id UNINDEXED,
+        tokenize = 'porter unicode61')""",
+    f"""CREATE TRIGGER IF NOT EXISTS policies_search_insert AFTER INSERT ON policies BEGIN
+        INSERT INTO {SEARCH_INDEX} (rowid, title, body, kind, ref_id, policy_id)
+        VALUES (new.id * 2, new.filename, new.extracted_text, 'policy', new.id, new.id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS policies_search_update
+        AFTER UPDATE OF filename, extracted_text ON policies BEGIN
+        DELETE FROM {SEARCH_INDEX} WHERE rowid = old.id * 2;
+        INSERT INTO {SEARCH_INDEX} (rowid, title, body, kind, ref_id, policy_id)
+        VALUES (new.id * 2, new.filename, new.extracted_text, 'policy', new.id, new.id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS policies_search_delete AFTER DELETE ON policies BEGIN
+        DELETE FROM {SEARCH_INDEX} WHERE rowid = old.id * 2;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS rules_search_insert AFTER INSERT ON rules BEGIN
+        INSERT INTO {SEARCH_INDEX} (rowid, title, body, kind, ref_id, policy_id)
+        VALUES (new.id * 2 + 1, {_SEARCH_RULE_TITLE.format(r="new")}, new.description, 'rule', new.id, new.policy_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS rules_search_update
+        AFTER UPDATE OF description, field, condition, expression, policy_id ON rules BEGIN
+        DELETE FROM {SEARCH_INDEX} WHERE rowid = old.id * 2 + 1;
+        INSERT INTO {SEARCH_INDEX} (rowid, title, body, kind, ref_id, policy_id)
+        VALUES (new.id * 2 + 1, {_SEARCH_RULE_TITLE.format(r="new")}, new.description, 'rule', new.id, new.policy_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS rules_search_delete AFTER DELETE ON rules BEGIN
+        DELETE FROM {SEARCH_INDEX} WHERE rowid = old.id * 2 + 1;
+    END""",
+]
+
+_SEARCH_INDEX_BACKFILL = [
+    f"""INSERT INTO {SEARCH_INDEX} (rowid, title, body, kind, ref_id, policy_id)
+        SELECT id * 2, filename, extracted_text, 'policy', id, id FROM policies""",
+    f"""INSERT INTO {SEARCH_INDEX} (rowid, title, body, kind, ref_id, policy_id)
+        SELECT id * 2 + 1, {_SEARCH_RULE_TITLE.format(r="rules")}, description, 'rule', id, policy_id FROM rules""",
+]
+
+
+def _sqlite_table_exists(connection, name: str) -> bool:
+    return connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).first() is not None
+
+
+# `tables` holds only the tables this create_all / drop_all actually touched,
+# so creation checks the database itself: upgraded files get the index too
+@event.listens_for(Base.metadata, "after_create")
+def _create_search_index(target, connection, **kw):
+    if connection.dialect.name != "sqlite" or not _sqlite_table_exists(connection, "policies"):
+        return
+    exists = _sqlite_table_exists(connection, SEARCH_INDEX)
+    for i, statement in enumerate(_SEARCH_INDEX_DDL):
+        if i == 0 and exists:
+            continue
+        connection.exec_driver_sql(statement)
+    if not exists:
+        for statement in _SEARCH_INDEX_BACKFILL:
+            connection.exec_driver_sql(statement)
+
+
+@event.listens_for(Base.metadata, "after_drop")
+def _drop_search_index(target, connection, tables=None, **kw):
+    if connection.dialect.name == "sqlite" and any(t.name == "policies" for t in tables or ()):
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {SEARCH_INDEX}")
@@ -0,0 +1,152 @@
+import asyncio
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from typing import Dict, Any, Optional
+
+from config import settings
+from database import workspace_key
+from dependencies import get_current_user_id, require_admin
+from services import profiling, retention
+from services.query_cache import query_cache
+
+router = APIRouter(
+    prefix="/api/admin",
+    tags=["Admin"],
+    dependencies=[Depends(get_current_user_id)],
+)
+
+# On-demand retention runs, kept referenced until they finish
+_retention_tasks: set = set()
+
+@router.get("/cache", response_model=Dict[str, Any])
+async def cache_stats():
+    """Hit-rate metrics for the read-through query cache."""
+    return query_cache.stats()
+
+
+def _retention_targets(user_id: int | None) -> list:
+    targets = [f"violations:{workspace_key(user_id)}"]
+    if user_id is not None:
+        targets.append(f"{retention.SCAN_LOG_ARCHIVE}:user_{user_id}")
+    return targets
+
+
+@router.get("/retention", response_model=Dict[str, Any])
+async def retention_status(user_id: int | None = Depends(get_current_user_id)):
+    """Configured retention policies and the caller's recent retention runs."""
+    targets = _retention_targets(user_id)
+    return {
+        "enabled": settings.RETENTION_ENABLED,
+        "interval_seconds": settings.RETENTION_INTERVAL_SECONDS,
+        "archive": settings.RETENTION_ARCHIVE,
+        "archive_available": retention.archive_available(),
+        "violations": retention.violation_policy(),
+        "scan_logs": retention.scan_log_policy(),
+        "running": [t for t in retention.running() if t in targets],
+        "recent": retention.recent_runs(targets),
+    }
+
+
+@router.post("/retention/run", status_code=202, response_model=Dict[str, Any])
+async def run_retention(user_id: int | None = Depends(get_current_user_id)):
+    """
+    Start a retention run for the caller's workspace and scan logs in the
+    background. Progress shows up under GET /api/admin/retention.
+    """
+    if settings.RETENTION_ARCHIVE and not retention.archive_available():
+        raise HTTPException(status_code=501, detail="Archiving requires the pyarrow package")
+    targets = _retention_targets(user_id)
+    if any(t in retention.running() for t in targets):
+        raise HTTPException(status_code=409, detail="A retention run is already in progress")
+
+    task = asyncio.create_task(retention.run_workspace(workspace_key(user_id), user_id))
+    _retention_tasks.add(task)
+    task.add_done_callback(_retention_tasks.discard)
+    return {"started": targets}
+
+
+@router.get("/archive/{kind}", response_model=Dict[str, Any])
+async def read_archive(
+    kind: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    employee_id: Optional[int] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    user_id: int | None = Depends(get_current_user_id),
+):
+    """Rows archived by retention runs: `violations` of the caller's workspace or their `scan_logs`."""
+    if kind not in retention.ARCHIVE_KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown archive '{kind}'")
+    try:
+        page = await retention.query_archive(
+            kind, workspace_key(user_id), user_id=user_id, since=since, until=until,
+            employee_id=employee_id, offset=offset, limit=limit,
+        )
+    except retention.ArchiveUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return {"kind": kind, "offset": offset, "limit": limit, **page}
+
+
+# Profiling and loop-lag controls act on the whole process (every tenant's
+# requests), so they need an admin, not just a signed-in user
+
+@router.get("/profiles", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Stored profiles (newest first), what is armed, and the latest captures."""
+    return {
+        "armed": profiling.armed(),
+        "request_flag": settings.PROFILE_REQUEST_FLAG,
+        "recent": profiling.recent_captures(),
+        "profiles": await asyncio.to_thread(profiling.list_profiles),
+    }
+
+
+@router.post("/profiles/arm", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
+async def arm_profile(
+    target: str = Query(..., pattern=f"^({'|'.join(profiling.TARGETS)})$"),
+    mode: str = Query("sample", pattern=f"^({'|'.join(profiling.MODES)})$"),
+    count: int = Query(1, ge=1, le=20),
+    path: Optional[str] = Query(None, description="Only requests whose path starts with this"),
+):
+    """
+    Profile the next `count` runs of a target: any HTTP `request` (optionally
+    under `path`), a `scan`, a `dataset` load or a policy `upload`.
+    """
+    return profiling.arm(target, mode, count, path)
+
+
+@router.delete("/profiles/arm", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
+async def disarm_profile(target: Optional[str] = None):
+    profiling.disarm(target)
+    return {"armed": profiling.armed()}
+
+
+@router.get("/profiles/{name}", dependencies=[Depends(require_admin)])
+async def download_profile(name: str):
+    """A stored profile: .pstats for pstats / snakeviz, .folded collapsed stacks for flamegraphs."""
+    path = profiling.profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "application/octet-stream" if name.endswith(".pstats") else "text/plain"
+    return FileResponse(path, media_type=media_type, filename=name)
+
+
+@router.get("/loop-lag", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
+async def loop_lag(limit: int = Query(50, ge=1, le=500)):
+    """Slow event-loop callbacks, each with the loop thread's stack while it was blocked."""
+    return profiling.loop_lag(limit)
+
+
+@router.post("/loop-lag", response_model=Dict[str, Any], dependencies=[Depends(require_admin)])
+async def toggle_loop_lag(
+    enabled: bool = Query(...),
+    threshold_ms: Optional[float] = Query(None, gt=0),
+):
+    """Start or stop the event-loop lag monitor."""
+    if enabled:
+        profiling.start_loop_monitor(threshold_ms)
+    else:
+        await profiling.stop_loop_monitor()
+    return profiling.loop_lag(0)
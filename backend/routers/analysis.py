@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Any, List, Optional
+
+from database import get_read_db, workspace_key
+from dependencies import get_current_user_id
+from services.query_cache import cached_json_response, dump_json
+from services.fused_scan import compare_policies
+from services.threshold_sweep import SweepError, sweep_points, threshold_sweep, validate_sweep
+
+router = APIRouter(
+    prefix="/api/analysis",
+    tags=["Analysis"],
+    dependencies=[Depends(get_current_user_id)],
+)
+
+MAX_COMPARED_POLICIES = 5
+
+
+@router.get("/threshold-sweep", response_model=Dict[str, Any])
+async def sweep_thresholds(
+    request: Request,
+    field: str,
+    op: str = ">=",
+    thresholds: Optional[List[float]] = Query(None),
+    start: Optional[float] = None,
+    stop: Optional[float] = None,
+    step: Optional[float] = None,
+    group_by: Optional[str] = Query(None, pattern="^(department|month)$"),
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    What-if analysis: how many employees would violate `field op threshold`
+    for each threshold (explicit `thresholds`, or `start`..`stop` by `step`),
+    optionally broken down by department or month. Nothing is written.
+    """
+    try:
+        validate_sweep(field, op)
+        points = sweep_points(thresholds, start, stop, step)
+    except SweepError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def load() -> bytes:
+        workspace = workspace_key(user_id)
+        return dump_json(await threshold_sweep(workspace, db, field, op, points, group_by))
+
+    return await cached_json_response(
+        request, workspace_key(user_id), f"sweep:{request.url.query}", ("employees", "rules"), load,
+    )
+
+
+@router.get("/compare-policies", response_model=Dict[str, Any])
+async def compare_policy_versions(
+    request: Request,
+    policy_ids: List[int] = Query(...),
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Side-by-side evaluation of two or more policies (e.g. V2 and V3 of one
+    family) against the current employees: per-policy and per-rule violation
+    counts, rules grouped by field, and how the violating populations overlap.
+    Retired rules are included; nothing is written.
+    """
+    policy_ids = list(dict.fromkeys(policy_ids))
+    if not 2 <= len(policy_ids) <= MAX_COMPARED_POLICIES:
+        raise HTTPException(status_code=400, detail=f"Pass between 2 and {MAX_COMPARED_POLICIES} policy_ids.")
+
+    async def load() -> bytes:
+        try:
+            return dump_json(await compare_policies(db, policy_ids))
+        except LookupError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+
+    return await cached_json_response(
+        request, workspace_key(user_id), f"compare:{policy_ids}", ("employees", "rules", "policies"), load,
+    )
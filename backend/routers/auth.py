@@ -3,13 +3,27 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from pydantic import BaseModel, EmailStr
 
-from database import get_db
+from database import get_control_db
 from models.models import User
-from services.auth_service import hash_password, verify_password, create_access_token
+from services.auth_service import (
+    hash_password_async,
+    verify_password_async,
+    needs_rehash,
+    create_access_token,
+    PasswordHasherBusy,
+)
 
 router = APIRouter(prefix="/api/auth", tags=["Auth"])
 
 
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, please retry shortly.",
+        headers={"Retry-After": "1"},
+    )
+
+
 class RegisterRequest(BaseModel):
     email: str
     username: str
@@ -22,7 +36,7 @@ class LoginRequest(BaseModel):
 
 
 @router.post("/register", status_code=201)
-async def register(body: RegisterRequest, db: AsyncSession = Depends(get_db)):
+async def register(body: RegisterRequest, db: AsyncSession = Depends(get_control_db)):
     # Check duplicate email
     existing = await db.execute(select(User).where(User.email == body.email))
     if existing.scalars().first():
@@ -33,10 +47,15 @@ async def register(body: RegisterRequest, db: AsyncSession = Depends(get_db)):
     if existing_u.scalars().first():
         raise HTTPException(status_code=400, detail="Username already taken.")
 
+    try:
+        hashed = await hash_password_async(body.password)
+    except PasswordHasherBusy:
+        raise _busy()
+
     user = User(
         email=body.email,
         username=body.username,
-        hashed_password=hash_password(body.password),
+        hashed_password=hashed,
     )
     db.add(user)
     await db.commit()
@@ -47,15 +66,28 @@ async def register(body: RegisterRequest, db: AsyncSession = Depends(get_db)):
 
 
 @router.post("/login")
-async def login(body: LoginRequest, db: AsyncSession = Depends(get_db)):
+async def login(body: LoginRequest, db: AsyncSession = Depends(get_control_db)):
     result = await db.execute(select(User).where(User.email == body.email))
     user = result.scalars().first()
 
-    if not user or not verify_password(body.password, user.hashed_password):
+    try:
+        valid = bool(user) and await verify_password_async(body.password, user.hashed_password)
+    except PasswordHasherBusy:
+        raise _busy()
+
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password.",
         )
 
+    # Transparently upgrade hashes made with an old work factor
+    if needs_rehash(user.hashed_password):
+        try:
+            user.hashed_password = await hash_password_async(body.password)
+            await db.commit()
+        except PasswordHasherBusy:
+            pass  # try again on a later login
+
     token = create_access_token({"sub": str(user.id), "username": user.username})
     return {"access_token": token, "username": user.username}
@@ -0,0 +1,131 @@
+from fastapi import APIRouter, Depends, Request, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, desc, distinct
+from typing import Dict, Any
+
+from database import get_read_db, workspace_key
+from dependencies import get_current_user_id
+from models.models import Employee, Rule, Violation, SEVERITY_NAMES
+from services.query_cache import cached_json_response, dump_json
+
+router = APIRouter(
+    prefix="/api/dashboard",
+    tags=["Dashboard"],
+    dependencies=[Depends(get_current_user_id)],
+)
+
+
+async def _compute_summary(db: AsyncSession, top_n: int) -> Dict[str, Any]:
+    total_violations = (await db.execute(select(func.count(Violation.id)))).scalar() or 0
+    total_employees = (await db.execute(select(func.count(Employee.id)))).scalar() or 0
+    active_rules = (await db.execute(
+        select(func.count(Rule.id)).where(Rule.is_active == True)
+    )).scalar() or 0
+    violating_employees = (await db.execute(
+        select(func.count(distinct(Violation.employee_id)))
+    )).scalar() or 0
+
+    by_severity = await db.execute(
+        select(Violation.severity_code, Violation.legacy_severity, func.count(Violation.id))
+        .group_by(Violation.severity_code, Violation.legacy_severity)
+    )
+    severity_counts: Dict[str, int] = {}
+    for code, legacy, count in by_severity.all():
+        name = SEVERITY_NAMES.get(code) or legacy or "Medium"
+        severity_counts[name] = severity_counts.get(name, 0) + count
+
+    by_rule = await db.execute(
+        select(
+            Rule.id, Rule.description, Rule.field, Rule.severity, Rule.is_active,
+            func.count(Violation.id), func.count(distinct(Violation.employee_id)),
+        )
+        .join(Violation, Violation.rule_id == Rule.id)
+        .group_by(Rule.id)
+        .order_by(desc(func.count(Violation.id)))
+    )
+
+    by_department = await db.execute(
+        select(Employee.department, func.count(Violation.id), func.count(distinct(Employee.id)))
+        .join(Violation, Violation.employee_id == Employee.id)
+        .group_by(Employee.department)
+        .order_by(desc(func.count(Violation.id)))
+    )
+
+    by_month = await db.execute(
+        select(Employee.month, func.count(Violation.id))
+        .join(Violation, Violation.employee_id == Employee.id)
+        .group_by(Employee.month)
+        .order_by(desc(func.count(Violation.id)))
+    )
+
+    top_employees = await db.execute(
+        select(
+            Employee.id, Employee.employee_id, Employee.name, Employee.department,
+            Employee.month, func.count(Violation.id),
+        )
+        .join(Violation, Violation.employee_id == Employee.id)
+        .group_by(Employee.id)
+        .order_by(desc(func.count(Violation.id)), Employee.id)
+        .limit(top_n)
+    )
+
+    return {
+        "total_violations": total_violations,
+        "total_employees": total_employees,
+        "violating_employees": violating_employees,
+        "active_rules": active_rules,
+        "compliance_rate": round(1 - violating_employees / total_employees, 4) if total_employees else 1.0,
+        "by_severity": severity_counts,
+        "by_rule": [
+            {
+                "rule_id": rule_id,
+                "description": description,
+                "field": field,
+                "severity": severity,
+                "is_active": is_active,
+                "violations": count,
+                "employees": employees,
+                "hit_rate": round(employees / total_employees, 4) if total_employees else 0.0,
+            }
+            for rule_id, description, field, severity, is_active, count, employees in by_rule.all()
+        ],
+        "by_department": [
+            {"department": department, "violations": count, "employees": employees}
+            for department, count, employees in by_department.all()
+        ],
+        "by_month": [
+            {"month": month, "violations": count}
+            for month, count in by_month.all()
+        ],
+        "top_employees": [
+            {
+                "id": emp_pk,
+                "employee_id": emp_id,
+                "name": name,
+                "department": department,
+                "month": month,
+                "violations": count,
+            }
+            for emp_pk, emp_id, name, department, month, count in top_employees.all()
+        ],
+    }
+
+
+@router.get("/summary", response_model=Dict[str, Any])
+async def dashboard_summary(
+    request: Request,
+    top_n: int = Query(10, ge=1, le=100),
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Aggregated violation counts computed with SQL GROUP BY.
+    Cached per workspace until the next scan, import or policy change.
+    """
+    async def load() -> bytes:
+        return dump_json(await _compute_summary(db, top_n))
+
+    return await cached_json_response(
+        request, workspace_key(user_id), f"summary:{top_n}",
+        ("violations", "employees", "rules"), load,
+    )
@@ -1,31 +1,121 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+import time
+from dataclasses import asdict
+
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List, Dict, Any
 
-from database import get_db
+from database import get_db, get_read_db, workspace_key
+from dependencies import get_current_user_id
 from models.models import Employee
-from schemas.schemas import Employee as EmployeeSchema, EmployeeCreate
+from schemas.schemas import Employee as EmployeeSchema, EmployeeCreate, EmployeeCheck, InlineFinding
 from services.dataset_loader import load_dataset_from_csv
+from services.employee_ingest import DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE, ingest_ndjson
+from services.inline_checker import get_rule_set, record_findings
+from services.json_buffers import update_json_buffers
+from services.query_cache import query_cache
+
+router = APIRouter(
+    prefix="/api/employees",
+    tags=["Employees"],
+    dependencies=[Depends(get_current_user_id)],
+)
+
+async def _check_employee(
+    employee: Employee,
+    check: bool,
+    record_violations: bool,
+    workspace: str,
+    db: AsyncSession,
+    replace: bool,
+) -> EmployeeCheck:
+    """Run the inline compliance check and stage violations when asked to."""
+    response = EmployeeCheck.model_validate(employee)
+    if not check:
+        return response
 
-router = APIRouter(prefix="/api/employees", tags=["Employees"])
+    rule_set = await get_rule_set(workspace, db)
+    t0 = time.perf_counter()
+    findings = rule_set.check(employee)
+    response.check_us = round((time.perf_counter() - t0) * 1e6, 1)
+    response.rules_checked = len(rule_set.rules)
+    response.compliant = not findings
+    response.findings = [InlineFinding(**vars(f)) for f in findings]
 
-@router.post("/", response_model=EmployeeSchema)
-async def create_employee(employee_in: EmployeeCreate, db: AsyncSession = Depends(get_db)):
+    if record_violations:
+        await record_findings(db, employee, findings, rule_set, replace=replace)
+        response.violations_recorded = True
+    return response
+
+
+@router.post("/", response_model=EmployeeCheck)
+async def create_employee(
+    employee_in: EmployeeCreate,
+    check: bool = True,
+    record_violations: bool = False,
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Create an employee and check it against the active rules in the same request.
+    With record_violations, findings are stored in the same transaction as the insert.
+    """
     # Check if employee_id exists
-    result = await db.execute(select(Employee).filter(Employee.employee_id == employee_in.employee_id))
-    existing = result.scalars().first()
-    if existing:
+    result = await db.execute(select(Employee.id).filter(Employee.employee_id == employee_in.employee_id))
+    if result.first():
         raise HTTPException(status_code=400, detail="Employee ID already exists.")
-        
+
+    workspace = workspace_key(user_id)
     new_employee = Employee(**employee_in.model_dump())
     db.add(new_employee)
+    await db.flush()
+    await update_json_buffers(db, [(new_employee.id, new_employee.data)])
+
+    response = await _check_employee(new_employee, check, record_violations, workspace, db, replace=False)
     await db.commit()
-    await db.refresh(new_employee)
-    return new_employee
+    query_cache.invalidate(workspace, *(("employees", "violations") if response.violations_recorded else ("employees",)))
+    return response
+
+
+@router.put("/{employee_id}", response_model=EmployeeCheck)
+async def update_employee(
+    employee_id: str,
+    employee_in: EmployeeCreate,
+    check: bool = True,
+    record_violations: bool = False,
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Replace an employee's record (looked up by its business employee_id) and re-check it.
+    With record_violations, the employee's violations are replaced by the new findings.
+    """
+    result = await db.execute(select(Employee).filter(Employee.employee_id == employee_id))
+    employee = result.scalars().first()
+    if employee is None:
+        raise HTTPException(status_code=404, detail="Employee not found.")
+    if employee_in.employee_id != employee_id:
+        raise HTTPException(status_code=400, detail="employee_id in the body does not match the URL.")
+
+    for key, value in employee_in.model_dump().items():
+        setattr(employee, key, value)
+    await db.flush()
+    await update_json_buffers(db, [(employee.id, employee.data)], replaced=[employee.id])
+
+    workspace = workspace_key(user_id)
+    response = await _check_employee(employee, check, record_violations, workspace, db, replace=True)
+    await db.commit()
+    query_cache.invalidate(workspace, *(("employees", "violations") if response.violations_recorded else ("employees",)))
+    return response
 
 @router.post("/batch", response_model=Dict[str, Any])
-async def batch_create_employees(file: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
+async def batch_create_employees(
+    file: UploadFile = File(...),
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
     """
     Upload a CSV dataset of employees and import them.
     Returns a summary payload.
@@ -38,10 +128,36 @@ async def batch_create_employees(file: UploadFile = File(...), db: AsyncSession
     
     if "error" in summary:
         raise HTTPException(status_code=500, detail=summary["error"])
-        
+
+    query_cache.invalidate(workspace_key(user_id), "employees")
     return summary
 
+@router.post("/ingest", response_model=Dict[str, Any])
+async def ingest_employees(
+    request: Request,
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=MAX_BATCH_SIZE),
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Stream employees as NDJSON (one JSON object per line) and upsert them by
+    employee_id in batches. Each batch commits on its own; the response lists
+    per-batch counts, timings and the first validation errors of each batch.
+    """
+    summary = await ingest_ndjson(request.stream(), db, batch_size)
+    if summary.batches:
+        query_cache.invalidate(workspace_key(user_id), "employees", "violations")
+
+    body = {
+        "batch_size": batch_size,
+        "totals": summary.totals(),
+        "batches": [asdict(b) for b in summary.batches],
+    }
+    if summary.error:
+        return JSONResponse(status_code=413, content={**body, "detail": summary.error})
+    return body
+
 @router.get("/", response_model=List[EmployeeSchema])
-async def list_employees(db: AsyncSession = Depends(get_db)):
+async def list_employees(db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(select(Employee))
     return result.scalars().all()
@@ -1,76 +1,167 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Request, Query
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List
+from sqlalchemy import select, delete, update
+from sqlalchemy.orm import selectinload
+from typing import Any, Dict, List, Optional
 
-from database import get_db
-from models.models import Policy, Rule
-from schemas.schemas import Policy as PolicySchema
-from services.pdf_extractor import extract_text_from_pdf
-from services.regex_rule_extractor import extract_rules_from_text as regex_extract
-from services.gemini_service import generate_rules_from_text as gemini_extract
+from database import get_db, get_read_db, workspace_key
+from dependencies import get_current_user_id
+from models.models import Policy, Rule, Violation
+from schemas.schemas import Policy as PolicySchema, PolicyUpload as PolicyUploadSchema
+from config import settings
+from services.rule_extraction import extract_policy_rules
+from services.batch_upload import BatchFile, upload_batch
+from services.policy_versioning import save_policy_version
+from services.policy_search import search
+from services.query_cache import query_cache, cached_json_response, dump_json
+from services.profiling import profiled
 
-router = APIRouter(prefix="/api/policies", tags=["Policies"])
+router = APIRouter(
+    prefix="/api/policies",
+    tags=["Policies"],
+    dependencies=[Depends(get_current_user_id)],
+)
 
-@router.post("/upload", response_model=PolicySchema)
-async def upload_policy(file: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
+@router.post("/upload", response_model=PolicyUploadSchema)
+@profiled("upload")
+async def upload_policy(
+    file: UploadFile = File(...),
+    policy_name: Optional[str] = Form(None),
+    rescan: bool = Form(True),
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Upload a policy PDF. When a previous version of the same policy exists
+    (matched by `policy_name`, or the filename without its version suffix),
+    the new rules are diffed against it and only added/changed rules are rescanned.
+    """
     if not file.filename.endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are supported.")
 
     pdf_bytes = await file.read()
 
-    # 1. Extract text from PDF
-    extracted_text = extract_text_from_pdf(pdf_bytes)
-    if not extracted_text:
+    # 1. Stream pages out of the PDF and extract rules as they arrive:
+    #    Tier 1 — Gemini AI (richer NLP, column-aware when CSV headers provided)
+    #    Tier 2 — Regex fallback (deterministic, only run when Tier 1 cannot be used)
+    extraction = await extract_policy_rules(pdf_bytes)
+    if not extraction.text:
         raise HTTPException(status_code=400, detail="Could not extract text from PDF.")
 
-    # 2. Save Policy to DB
-    new_policy = Policy(filename=file.filename, extracted_text=extracted_text)
-    db.add(new_policy)
+    # 2. Save Policy and its Rules (plus any version diff and targeted rescan)
+    #    to DB in a single transaction
+    new_policy, rules, diff = await save_policy_version(
+        db, file.filename, extraction.text, extraction.rules,
+        name=policy_name, rescan=rescan,
+    )
     await db.commit()
-    await db.refresh(new_policy)
-
-    # 3. Two-Tier Rule Extraction:
-    #    Tier 1 — Gemini AI (richer NLP, column-aware when CSV headers provided)
-    #    Tier 2 — Regex fallback (deterministic, always works, no API needed)
-    extracted_rules = regex_extract(extracted_text)  # pre-compute fallback
-    print(f"[policies] Regex fallback: {len(extracted_rules)} rules")
-
-    try:
-        ai_rules = await gemini_extract(extracted_text)
-        if ai_rules:
-            extracted_rules = ai_rules
-            print(f"[policies] Gemini extracted {len(ai_rules)} rules (Tier 1 used).")
-    except Exception as e:
-        print(f"[policies] Gemini unavailable ({type(e).__name__}: {e}), using regex fallback.")
-
-    # 4. Save Rules to DB
-    created_rules = []
-    for r in extracted_rules:
-        rule = Rule(
-            policy_id=new_policy.id,
-            field=r.get("field"),
-            description=r.get("description", ""),
-            condition=r.get("condition"),
-            severity=r.get("severity", "Medium")
-        )
-        db.add(rule)
-        created_rules.append(rule)
-
-    if created_rules:
-        await db.commit()
+    query_cache.invalidate(workspace_key(user_id), "policies", "rules", "violations")
 
     return {
         "id": new_policy.id,
         "filename": new_policy.filename,
+        "name": new_policy.name,
+        "version": new_policy.version,
         "uploaded_at": new_policy.uploaded_at,
-        "rules": created_rules
+        "rules": rules,
+        "diff": diff,
     }
 
+@router.post("/upload/batch", response_model=Dict[str, Any])
+async def upload_policy_batch(
+    files: List[UploadFile] = File(...),
+    rescan: bool = Form(True),
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Upload many policy PDFs at once. Text is extracted in parallel worker
+    processes and rules with bounded concurrency; everything is written in one
+    transaction. Each file reports its own status, so one unreadable PDF does
+    not fail the batch. Files of the same policy become consecutive versions
+    in the order given.
+    """
+    if len(files) > settings.POLICY_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.POLICY_BATCH_MAX_FILES} files per batch.",
+        )
+
+    batch = [BatchFile(filename=f.filename or "", data=await f.read()) for f in files]
+    result = await upload_batch(db, batch, rescan=rescan)
+    if result["saved"]:
+        query_cache.invalidate(workspace_key(user_id), "policies", "rules", "violations")
+    return result
+
+_policies_adapter = TypeAdapter(List[PolicySchema])
+
 @router.get("/", response_model=List[PolicySchema])
-async def list_policies(db: AsyncSession = Depends(get_db)):
-    from sqlalchemy.orm import selectinload
-    result = await db.execute(
-        select(Policy).options(selectinload(Policy.rules)).order_by(Policy.uploaded_at.desc())
+async def list_policies(
+    request: Request,
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_read_db),
+):
+    async def load() -> bytes:
+        result = await db.execute(
+            select(Policy).options(selectinload(Policy.rules)).order_by(Policy.uploaded_at.desc())
+        )
+        return _policies_adapter.dump_json(result.scalars().all())
+
+    return await cached_json_response(
+        request, workspace_key(user_id), "policies", ("policies", "rules"), load
     )
-    return result.scalars().all()
+
+
+@router.get("/search", response_model=Dict[str, Any])
+async def search_policies(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=500),
+    kind: Optional[str] = Query(None, pattern="^(policy|rule)$"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Full-text search over policy text and rule descriptions, best matches
+    first, each with a highlighted snippet. Quote phrases ("sales target");
+    end a word with * to match prefixes.
+    """
+    async def load() -> bytes:
+        return dump_json(await search(db, q, kind=kind, limit=limit, offset=offset))
+
+    return await cached_json_response(
+        request, workspace_key(user_id), f"search:{request.url.query}", ("policies", "rules"), load
+    )
+
+
+@router.delete("/{policy_id}", response_model=Dict[str, Any])
+async def delete_policy(
+    policy_id: int,
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Delete a policy with its rules and their violations. Rules carried over to
+    a later version belong to that version and are kept; a later version that
+    pointed at this one simply loses its previous-version link.
+    """
+    if await db.get(Policy, policy_id) is None:
+        raise HTTPException(status_code=404, detail="Policy not found.")
+
+    rule_ids = select(Rule.id).where(Rule.policy_id == policy_id).scalar_subquery()
+    violations = await db.execute(delete(Violation).where(Violation.rule_id.in_(rule_ids)))
+    rules = await db.execute(delete(Rule).where(Rule.policy_id == policy_id))
+    await db.execute(
+        update(Policy).where(Policy.previous_version_id == policy_id).values(previous_version_id=None)
+    )
+    await db.execute(delete(Policy).where(Policy.id == policy_id))
+    await db.commit()
+    query_cache.invalidate(workspace_key(user_id), "policies", "rules", "violations")
+
+    return {
+        "deleted": policy_id,
+        "rules_deleted": rules.rowcount or 0,
+        "violations_deleted": violations.rowcount or 0,
+    }
@@ -1,21 +1,99 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func
 from typing import List
 
-from database import get_db
-from models.models import Rule
-from schemas.schemas import Rule as RuleSchema
+from database import get_db, get_read_db, workspace_key
+from dependencies import get_current_user_id
+from models.models import Employee, Policy, Rule
+from schemas.schemas import Rule as RuleSchema, RuleCreate, RuleExpressionCheck, RuleExpressionResult
+from services.compliance_engine import normalize_rule, evaluate_employees_against_rules
+from services.query_cache import query_cache, cached_json_response
+from services.rule_expressions import ExpressionError, compile_expression, rule_source
 
-router = APIRouter(prefix="/api/rules", tags=["Rules"])
+router = APIRouter(
+    prefix="/api/rules",
+    tags=["Rules"],
+    dependencies=[Depends(get_current_user_id)],
+)
+
+_rules_adapter = TypeAdapter(List[RuleSchema])
 
 @router.get("/", response_model=List[RuleSchema])
-async def list_rules(policy_id: int = None, active_only: bool = True, db: AsyncSession = Depends(get_db)):
-    query = select(Rule)
-    if policy_id:
-        query = query.filter(Rule.policy_id == policy_id)
-    if active_only:
-        query = query.filter(Rule.is_active == True)
-        
-    result = await db.execute(query)
-    return result.scalars().all()
+async def list_rules(
+    request: Request,
+    policy_id: int = None,
+    active_only: bool = True,
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_read_db),
+):
+    async def load() -> bytes:
+        query = select(Rule)
+        if policy_id:
+            query = query.filter(Rule.policy_id == policy_id)
+        if active_only:
+            query = query.filter(Rule.is_active == True)
+
+        result = await db.execute(query)
+        return _rules_adapter.dump_json(result.scalars().all())
+
+    return await cached_json_response(
+        request, workspace_key(user_id), f"rules:{policy_id}:{active_only}", ("rules",), load
+    )
+
+
+@router.post("/validate", response_model=RuleExpressionResult)
+async def validate_rule_expression(payload: RuleExpressionCheck, db: AsyncSession = Depends(get_read_db)):
+    """
+    Parse and type-check a rule expression without saving it.
+    Valid expressions also report how many current employees would violate them.
+    """
+    try:
+        compiled = compile_expression(payload.expression)
+    except ExpressionError as e:
+        return RuleExpressionResult(valid=False, error=e.message, position=e.position)
+
+    result = await db.execute(select(func.count(Employee.id)).where(compiled.violation_sql()))
+    return RuleExpressionResult(
+        valid=True,
+        normalized=str(compiled),
+        columns=list(compiled.columns) + [str(path) for path in compiled.paths],
+        violating_employees=result.scalar() or 0,
+    )
+
+
+@router.post("/", response_model=RuleSchema, status_code=201)
+async def create_rule(
+    rule_in: RuleCreate,
+    rescan: bool = True,
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Add a rule to a policy, either as a single field/condition or as a compound
+    expression. With rescan, only the new rule is evaluated against employees.
+    """
+    if await db.get(Policy, rule_in.policy_id) is None:
+        raise HTTPException(status_code=404, detail="Policy not found.")
+
+    rule = Rule(**rule_in.model_dump())
+    source = rule_source(rule)
+    if source:
+        try:
+            compile_expression(source)
+        except ExpressionError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    elif normalize_rule(rule) is None:
+        raise HTTPException(status_code=400, detail="Rule needs an expression or a valid field and condition.")
+
+    db.add(rule)
+    await db.flush()
+
+    if rescan and rule.is_active:
+        employees = (await db.execute(select(Employee))).scalars().all()
+        await evaluate_employees_against_rules(db, [rule], employees)
+
+    await db.commit()
+    query_cache.invalidate(workspace_key(user_id), "rules", "violations")
+    return rule
@@ -1,100 +1,186 @@
-import secrets
-from fastapi import APIRouter, Depends, Request
+import asyncio
+import time
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete
-from typing import List
-
-from database import get_db
-from models.models import Employee, Rule, Violation, Policy, ScanLog
-from schemas.schemas import Violation as ViolationSchema
-from services.compliance_engine import evaluate_employees_against_rules
-from services.auth_service import decode_token
+from typing import Any, Dict, List, Optional
+
+from database import (
+    get_db, get_read_db, get_control_db, get_workspace, reset_workspace, clear_workspace, workspace_key,
+)
+from dependencies import get_current_user_id
+from models.models import ScanLog
+from schemas.schemas import Violation as ViolationSchema, PipelineRun as PipelineRunSchema
+from services import scheduler
+from services.scan_service import run_scan, build_scan_log
+from services.preview_scan import DEFAULT_SAMPLE_SIZE, MAX_SAMPLE_SIZE, preview_scan
+from services.rule_extraction import extract_policy_rules
+from services.policy_versioning import save_policy_version
+from services.dataset_loader import parse_dataset_csv, insert_employee_records
+from services.query_cache import query_cache
 
 router = APIRouter(prefix="/api/scan", tags=["Scan"])
 
 
-def _get_user_id(request: Request) -> int | None:
-    """Extract user_id from the Bearer JWT, or return None if missing/invalid."""
-    auth = request.headers.get("Authorization", "")
-    if auth.startswith("Bearer "):
-        payload = decode_token(auth[7:])
-        if payload:
-            try:
-                return int(payload.get("sub"))
-            except (TypeError, ValueError):
-                pass
-    return None
-
-
 @router.post("/reset")
-async def reset_system(db: AsyncSession = Depends(get_db)):
-    """Wipes employee/rule/violation/policy data for a fresh, isolated scan.
-    Scan logs are intentionally preserved so history survives across resets."""
-    await db.execute(delete(Violation))
-    await db.execute(delete(Rule))
-    await db.execute(delete(Employee))
-    await db.execute(delete(Policy))
-    await db.commit()
+async def reset_system(user_id: int | None = Depends(get_current_user_id)):
+    """Wipes the caller's workspace (employees/rules/violations/policies) for a fresh,
+    isolated scan. Scan logs live in the control database, so history survives resets."""
+    key = workspace_key(user_id)
+    await reset_workspace(key)
+    query_cache.invalidate(key)
     return {"message": "System reset."}
 
 @router.post("/trigger", response_model=List[ViolationSchema])
-async def trigger_scan(request: Request, employee_id: int = None, db: AsyncSession = Depends(get_db)):
-    """Triggers a batch compliance scan and saves a persistent ScanLog entry."""
-    user_id = _get_user_id(request)
-
-    # 1. Fetch active rules
-    rules_result = await db.execute(select(Rule).filter(Rule.is_active == True))
-    active_rules = rules_result.scalars().all()
-
-    if not active_rules:
+async def trigger_scan(
+    response: Response,
+    employee_id: int = None,
+    mode: str = Query("standard", pattern="^(standard|fused)$"),
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+    control_db: AsyncSession = Depends(get_control_db),
+):
+    """
+    Triggers a batch compliance scan and saves a persistent ScanLog entry.
+    mode=fused groups threshold rules by field across all active policies.
+    When neither the active rules nor the data changed since the last scan,
+    nothing is re-evaluated: X-Scan-Cache is "hit" and X-Scan-Cached-From
+    names that scan (its violations: GET /api/violations/?scan_id=...).
+    Waits for a scheduled scan of the same workspace that is already running.
+    """
+    key = workspace_key(user_id)
+    async with scheduler.workspace_scan(key, user_id, "manual", mode):
+        result = await run_scan(db, employee_id=employee_id, mode=mode, workspace=key)
+    if not result.ran:
         return []
-
-    # 2. Fetch employees to scan
-    employees_query = select(Employee)
-    if employee_id:
-        employees_query = employees_query.filter(Employee.id == employee_id)
-
-    employees_result = await db.execute(employees_query)
-    employees_to_scan = employees_result.scalars().all()
-
-    if not employees_to_scan:
-        return []
-
-    # 3. Evaluate
-    new_violations = await evaluate_employees_against_rules(db, active_rules, employees_to_scan)
-
-    if new_violations:
-        await db.commit()
-        for v in new_violations:
-            await db.refresh(v)
-
-    # 4. Count total violations for this scan
-    total_violations_result = await db.execute(select(Violation))
-    total_violations = len(total_violations_result.scalars().all())
-
-    # 5. Fetch policy filename for the log
-    policy_result = await db.execute(select(Policy).order_by(Policy.id.desc()).limit(1))
-    latest_policy = policy_result.scalars().first()
-    policy_filename = latest_policy.filename if latest_policy else "Unknown Policy"
-
-    # 6. Save ScanLog scoped to this user
-    log = ScanLog(
-        user_id=user_id,
-        scan_id=secrets.token_hex(4),
-        policy_filename=policy_filename,
-        dataset_filename="Policy_Compliance_Dataset_Updated.csv",
-        violation_count=total_violations,
-        employee_count=len(employees_to_scan),
+    response.headers["X-Scan-Id"] = result.scan_id
+    response.headers["X-Scan-Cache"] = "hit" if result.cached else "miss"
+    if result.cached:
+        response.headers["X-Scan-Cached-From"] = result.cached_scan_id
+
+    # Save ScanLog scoped to this user
+    control_db.add(build_scan_log(result, user_id))
+    await control_db.commit()
+
+    return result.new_violations
+
+@router.get("/preview", response_model=Dict[str, Any])
+async def preview_scan_estimate(
+    sample_size: int = Query(DEFAULT_SAMPLE_SIZE, ge=1, le=MAX_SAMPLE_SIZE),
+    seed: int = 0,
+    stratify: Optional[str] = Query(None, pattern="^(department|month)$"),
+    confidence: float = Query(0.95, gt=0.5, lt=1.0),
+    mode: str = Query("standard", pattern="^(standard|fused)$"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Estimate violation rates of the active rules from a reproducible sample
+    (optionally stratified by department or month), with confidence intervals.
+    Nothing is written; run POST /api/scan/trigger for the real scan.
+    """
+    return await preview_scan(
+        db, sample_size=sample_size, seed=seed, stratify=stratify,
+        confidence=confidence, fused=(mode == "fused"),
     )
-    db.add(log)
-    await db.commit()
 
-    return new_violations
+@router.post("/run", response_model=PipelineRunSchema)
+async def run_pipeline(
+    policy: UploadFile = File(...),
+    dataset: UploadFile = File(...),
+    reset: bool = Form(True),
+    mode: str = Form("standard", pattern="^(standard|fused)$"),
+    user_id: int | None = Depends(get_current_user_id),
+    control_db: AsyncSession = Depends(get_control_db),
+):
+    """
+    One-shot compliance run: policy PDF + employee CSV in, violations out.
+    Rule extraction and CSV parsing run concurrently; the scan starts once both
+    are ready and the reset, policy, rules, employees and violations commit
+    together. A bad PDF or CSV is rejected before anything is touched.
+    Returns a per-stage timing breakdown in milliseconds.
+    """
+    if not policy.filename.endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF files are supported.")
+    if not dataset.filename.endswith(".csv"):
+        raise HTTPException(status_code=400, detail="Only CSV files are supported.")
+
+    timings: dict = {}
+    started = time.perf_counter()
+
+    async def timed(stage: str, awaitable):
+        t0 = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            timings[stage] = round((time.perf_counter() - t0) * 1000, 1)
+
+    key = workspace_key(user_id)
+    pdf_bytes, csv_bytes = await asyncio.gather(policy.read(), dataset.read())
+
+    # 1. Extract rules from the PDF and parse the CSV side by side
+    try:
+        extraction, records = await asyncio.gather(
+            timed("policy_extraction", extract_policy_rules(pdf_bytes)),
+            timed("dataset_parse", asyncio.to_thread(parse_dataset_csv, csv_bytes)),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not extraction.text:
+        raise HTTPException(status_code=400, detail="Could not extract text from PDF.")
+    if not records or "employee_id" not in records[0]:
+        raise HTTPException(status_code=400, detail="The CSV has no employee rows (missing Employee_ID column?).")
+
+    # 2. Only now that both inputs are good: reset, persist everything and scan
+    #    in a single writer transaction, so a failure leaves the workspace as it was.
+    #    A scheduled scan of the workspace is never interleaved with it.
+    ws = await get_workspace(key)
+    async with scheduler.workspace_scan(key, user_id, "pipeline", mode), ws.sessionmaker() as db:
+        if reset:
+            await timed("reset", clear_workspace(db))
+        t0 = time.perf_counter()
+        new_policy, rules, diff = await save_policy_version(
+            db, policy.filename, extraction.text, extraction.rules, rescan=False,
+        )
+        dataset_summary = await insert_employee_records(records, db, commit=False)
+        await db.flush()
+        timings["persist"] = round((time.perf_counter() - t0) * 1000, 1)
+
+        result = await timed("scan", run_scan(db, commit=False, mode=mode))
+        await timed("commit", db.commit())
+    query_cache.invalidate(key)
+
+    log = build_scan_log(result, user_id, dataset_filename=dataset.filename, trigger_type="pipeline")
+    control_db.add(log)
+    await control_db.commit()
+
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+    print(f"[pipeline] {timings}")
+
+    return {
+        "scan_id": log.scan_id,
+        "policy": {
+            "id": new_policy.id,
+            "filename": new_policy.filename,
+            "name": new_policy.name,
+            "version": new_policy.version,
+            "uploaded_at": new_policy.uploaded_at,
+            "rules": rules,
+            "diff": diff,
+        },
+        "dataset": dataset_summary,
+        "violations": result.new_violations,
+        "violation_count": result.total_violations,
+        "violations_by_policy": result.violations_by_policy,
+        "employee_count": result.employee_count,
+        "timings_ms": timings,
+    }
 
 @router.get("/logs")
-async def get_scan_logs(request: Request, db: AsyncSession = Depends(get_db)):
+async def get_scan_logs(
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_control_db),
+):
     """Returns scan logs for the current user (or all if not authenticated)."""
-    user_id = _get_user_id(request)
 
     query = select(ScanLog).order_by(ScanLog.scanned_at.desc())
     if user_id is not None:
@@ -112,14 +198,19 @@ async def get_scan_logs(request: Request, db: AsyncSession = Depends(get_db)):
             "employee_count":   log.employee_count,
             "scanned_at":       log.scanned_at.strftime("%H:%M") if log.scanned_at else "",
             "scanned_at_full":  log.scanned_at.isoformat() if log.scanned_at else "",
+            "trigger_type":     log.trigger_type or "manual",
+            "duration_ms":      log.duration_ms,
+            "cached_from":      log.cached_from,
         }
         for log in logs
     ]
 
 @router.delete("/logs")
-async def clear_scan_logs(request: Request, db: AsyncSession = Depends(get_db)):
+async def clear_scan_logs(
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_control_db),
+):
     """Deletes scan history logs for the current user only."""
-    user_id = _get_user_id(request)
 
     if user_id is not None:
         await db.execute(delete(ScanLog).where(ScanLog.user_id == user_id))
@@ -0,0 +1,104 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import Any, Dict, List
+
+from database import get_control_db
+from dependencies import get_current_user_id
+from models.models import ScanSchedule
+from schemas.schemas import (
+    ScanSchedule as ScanScheduleSchema, ScanScheduleCreate, ScanScheduleUpdate,
+)
+from services import scheduler
+
+router = APIRouter(
+    prefix="/api/schedules",
+    tags=["Schedules"],
+    dependencies=[Depends(get_current_user_id)],
+)
+
+
+def _next_run(cron: str):
+    try:
+        return scheduler.next_run(cron)
+    except scheduler.CronError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cron expression: {e}")
+
+
+async def _own_schedule(db: AsyncSession, schedule_id: int, user_id: int | None) -> ScanSchedule:
+    schedule = await db.get(ScanSchedule, schedule_id)
+    if schedule is None or schedule.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Schedule not found.")
+    return schedule
+
+
+@router.get("/", response_model=List[ScanScheduleSchema])
+async def list_schedules(
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_control_db),
+):
+    owner = ScanSchedule.user_id.is_(None) if user_id is None else ScanSchedule.user_id == user_id
+    result = await db.execute(select(ScanSchedule).where(owner).order_by(ScanSchedule.id))
+    return result.scalars().all()
+
+
+@router.post("/", response_model=ScanScheduleSchema, status_code=201)
+async def create_schedule(
+    schedule_in: ScanScheduleCreate,
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_control_db),
+):
+    """
+    Scan the caller's workspace on a cron schedule (UTC): five fields, or
+    @hourly, @daily, @nightly (02:00), @weekly, @monthly.
+    """
+    schedule = ScanSchedule(**schedule_in.model_dump(), user_id=user_id)
+    schedule.next_run_at = _next_run(schedule.cron) if schedule.enabled else None
+    db.add(schedule)
+    await db.commit()
+    await db.refresh(schedule)
+    return schedule
+
+
+@router.get("/status", response_model=Dict[str, Any])
+async def schedule_status(user_id: int | None = Depends(get_current_user_id)):
+    """Scheduled scans of the caller's workspace: running, queued and recently finished."""
+    return scheduler.status(user_id)
+
+
+@router.patch("/{schedule_id}", response_model=ScanScheduleSchema)
+async def update_schedule(
+    schedule_id: int,
+    schedule_in: ScanScheduleUpdate,
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_control_db),
+):
+    schedule = await _own_schedule(db, schedule_id, user_id)
+    for key, value in schedule_in.model_dump(exclude_unset=True).items():
+        if value is not None:
+            setattr(schedule, key, value)
+    schedule.next_run_at = _next_run(schedule.cron) if schedule.enabled else None
+    await db.commit()
+    await db.refresh(schedule)
+    return schedule
+
+
+@router.delete("/{schedule_id}", status_code=204)
+async def delete_schedule(
+    schedule_id: int,
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_control_db),
+):
+    await db.delete(await _own_schedule(db, schedule_id, user_id))
+    await db.commit()
+
+
+@router.post("/{schedule_id}/run", status_code=202, response_model=Dict[str, Any])
+async def run_schedule_now(
+    schedule_id: int,
+    user_id: int | None = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_control_db),
+):
+    """Queue the schedule's scan now; merges into a run of the same workspace that is still waiting."""
+    schedule = await _own_schedule(db, schedule_id, user_id)
+    return scheduler.enqueue(schedule.id, schedule.user_id, schedule.mode or "standard", trigger="manual")
@@ -1,19 +1,61 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from sqlalchemy.orm import selectinload
+from typing import List, Optional
 
-from database import get_db
+from database import get_read_db, workspace_key
+from dependencies import get_current_user_id
 from models.models import Violation
 from schemas.schemas import Violation as ViolationSchema
+from services.violation_export import stream_csv, stream_xlsx, xlsx_available
 
-router = APIRouter(prefix="/api/violations", tags=["Violations"])
+router = APIRouter(
+    prefix="/api/violations",
+    tags=["Violations"],
+    dependencies=[Depends(get_current_user_id)],
+)
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
 
 @router.get("/", response_model=List[ViolationSchema])
-async def list_violations(employee_id: int = None, db: AsyncSession = Depends(get_db)):
-    query = select(Violation).order_by(Violation.timestamp.desc())
+async def list_violations(
+    employee_id: int = None,
+    scan_id: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    # Descriptions are rendered from the rule, so load rules alongside
+    query = select(Violation).options(selectinload(Violation.rule)).order_by(Violation.timestamp.desc())
     if employee_id:
         query = query.filter(Violation.employee_id == employee_id)
-        
+    if scan_id:
+        query = query.filter(Violation.scan_id == scan_id)
+
     result = await db.execute(query)
     return result.scalars().all()
+
+
+@router.get("/export")
+async def export_violations(
+    format: str = Query("csv", pattern="^(csv|xlsx)$"),
+    employee_id: int = None,
+    user_id: int | None = Depends(get_current_user_id),
+):
+    """
+    Stream violations joined with their employee and rule as CSV or XLSX.
+    Rows are read from a server-side cursor in partitions, never all at once.
+    """
+    if format == "xlsx" and not xlsx_available():
+        raise HTTPException(status_code=501, detail="XLSX export requires the xlsxwriter package")
+
+    workspace = workspace_key(user_id)
+    body = stream_csv(workspace, employee_id) if format == "csv" else stream_xlsx(workspace, employee_id)
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="violations.{format}"'},
+    )
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
@@ -7,11 +7,23 @@ class RuleBase(BaseModel):
     description: str
     field: Optional[str] = None
     condition: Optional[str] = None
+    expression: Optional[str] = None
     severity: str = "Medium"
     is_active: bool = True
 
 class RuleCreate(RuleBase):
-    pass
+    policy_id: int
+
+class RuleExpressionCheck(BaseModel):
+    expression: str
+
+class RuleExpressionResult(BaseModel):
+    valid: bool
+    normalized: Optional[str] = None
+    columns: List[str] = []
+    violating_employees: Optional[int] = None
+    error: Optional[str] = None
+    position: Optional[int] = None
 
 class Rule(RuleBase):
     id: int
@@ -29,12 +41,36 @@ class PolicyCreate(PolicyBase):
 
 class Policy(PolicyBase):
     id: int
+    name: Optional[str] = None
+    version: int = 1
     uploaded_at: datetime
     rules: List[Rule] = []
 
     class Config:
         from_attributes = True
 
+class RuleChange(BaseModel):
+    field: Optional[str] = None
+    old_rule_id: int
+    new_rule_id: int
+    old_condition: Optional[str] = None
+    new_condition: Optional[str] = None
+    old_severity: Optional[str] = None
+    new_severity: Optional[str] = None
+
+class PolicyDiff(BaseModel):
+    previous_policy_id: int
+    added: List[int] = []
+    removed: List[int] = []
+    changed: List[RuleChange] = []
+    unchanged: List[int] = []
+    violations_retired: int = 0
+    violations_added: int = 0
+    rescanned: bool = False
+
+class PolicyUpload(Policy):
+    diff: Optional[PolicyDiff] = None
+
 # Employee Schemas
 class EmployeeBase(BaseModel):
     employee_id: str
@@ -62,6 +98,18 @@ class Employee(EmployeeBase):
     class Config:
         from_attributes = True
 
+class InlineFinding(BaseModel):
+    rule_id: int
+    severity: str
+    description: str
+
+class EmployeeCheck(Employee):
+    compliant: Optional[bool] = None  # None when the check was skipped
+    findings: List[InlineFinding] = []
+    rules_checked: int = 0
+    check_us: float = 0.0
+    violations_recorded: bool = False
+
 # Violation Schemas
 class ViolationBase(BaseModel):
     description: str
@@ -79,3 +127,42 @@ class Violation(ViolationBase):
 
     class Config:
         from_attributes = True
+
+# Pipeline Schemas
+class PipelineRun(BaseModel):
+    scan_id: str
+    policy: PolicyUpload
+    dataset: Dict[str, Any]
+    violations: List[Violation] = []
+    violation_count: int = 0
+    violations_by_policy: Dict[int, int] = {}
+    employee_count: int = 0
+    timings_ms: Dict[str, float] = {}
+
+# Scan Schedule Schemas
+class ScanScheduleBase(BaseModel):
+    cron: str                    # "0 2 * * *", "@hourly", ... (UTC)
+    name: Optional[str] = None
+    mode: str = Field("standard", pattern="^(standard|fused)$")
+    enabled: bool = True
+
+class ScanScheduleCreate(ScanScheduleBase):
+    pass
+
+class ScanScheduleUpdate(BaseModel):
+    cron: Optional[str] = None
+    name: Optional[str] = None
+    mode: Optional[str] = Field(None, pattern="^(standard|fused)$")
+    enabled: Optional[bool] = None
+
+class ScanSchedule(ScanScheduleBase):
+    id: int
+    user_id: Optional[int] = None
+    created_at: datetime
+    next_run_at: Optional[datetime] = None
+    last_run_at: Optional[datetime] = None
+    last_status: Optional[str] = None
+    last_scan_id: Optional[str] = None
+
+    class Config:
+        from_attributes = True
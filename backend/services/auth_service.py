@@ -1,19 +1,63 @@
 """
 auth_service.py — Password hashing and JWT token utilities
 Uses bcrypt directly (passlib has Python 3.14 compatibility issues)
+
+bcrypt is deliberately slow, so the async helpers run it in a dedicated,
+bounded thread pool instead of on the event loop. When more than
+PASSWORD_HASH_MAX_PENDING operations are in flight, new ones fail fast with
+PasswordHasherBusy so callers can answer 503 rather than queueing forever.
+
+decode_token_cached keeps a bounded LRU of verified token → claims so routes
+polled by the dashboard skip signature verification on repeat requests.
 """
+import asyncio
 import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import bcrypt
 from jose import JWTError, jwt
 
+from config import settings
+
 SECRET_KEY = os.getenv("SECRET_KEY", "changeme-use-a-long-random-string-in-production")
 ALGORITHM  = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
 
+class PasswordHasherBusy(Exception):
+    """Too many password operations are already queued."""
+
+
+_executor: ThreadPoolExecutor | None = None
+_pending = 0  # only touched from the event loop thread
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            thread_name_prefix="bcrypt",
+        )
+    return _executor
+
+
+async def _run_bounded(fn, *args):
+    global _pending
+    if _pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise PasswordHasherBusy()
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), fn, *args)
+    finally:
+        _pending -= 1
+
+
 def hash_password(password: str) -> str:
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
     return bcrypt.hashpw(password.encode("utf-8"), salt).decode("utf-8")
 
 
@@ -21,6 +65,23 @@ def verify_password(plain: str, hashed: str) -> bool:
     return bcrypt.checkpw(plain.encode("utf-8"), hashed.encode("utf-8"))
 
 
+def needs_rehash(hashed: str) -> bool:
+    """True when a stored hash was made with a different work factor than configured."""
+    try:
+        # Modular crypt format: $2b$<cost>$<salt+hash>
+        return int(hashed.split("$")[2]) != settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_bounded(hash_password, password)
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await _run_bounded(verify_password, plain, hashed)
+
+
 def create_access_token(data: dict) -> str:
     payload = data.copy()
     payload["exp"] = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -32,3 +93,38 @@ def decode_token(token: str) -> dict | None:
         return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
         return None
+
+
+# token → (expires_at, claims); insertion order doubles as LRU order
+_token_cache: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+
+
+def decode_token_cached(token: str) -> dict | None:
+    """
+    decode_token with a bounded TTL cache of successfully verified tokens.
+    An entry expires after TOKEN_CACHE_TTL_SECONDS or at the token's `exp`,
+    whichever comes first. Invalid tokens are never cached.
+    """
+    now = time.time()
+    hit = _token_cache.get(token)
+    if hit is not None:
+        expires_at, claims = hit
+        if expires_at > now:
+            _token_cache.move_to_end(token)
+            return claims
+        del _token_cache[token]
+
+    claims = decode_token(token)
+    if claims is None:
+        return None
+
+    expires_at = now + settings.TOKEN_CACHE_TTL_SECONDS
+    exp = claims.get("exp")
+    if isinstance(exp, (int, float)):
+        expires_at = min(expires_at, exp)
+
+    if expires_at > now and settings.TOKEN_CACHE_SIZE > 0:
+        _token_cache[token] = (expires_at, claims)
+        while len(_token_cache) > settings.TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return claims
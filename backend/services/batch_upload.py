@@ -0,0 +1,194 @@
+"""
+batch_upload.py — Concurrent Batch Policy Upload
+=================================================
+Onboarding a business unit means dozens of policy PDFs. Uploaded one request
+at a time, each waits for pdfplumber, then the model, then two commits. A
+batch overlaps the slow parts and writes once:
+
+- TEXT    : pdfplumber is CPU-bound, so every file is parsed in a process
+            pool (PDF_EXTRACT_WORKERS) instead of a thread that holds the GIL.
+- RULES   : as soon as a file's text is back, its rules are extracted with the
+            usual two tiers; at most RULE_EXTRACTION_CONCURRENCY files talk to
+            the model at once.
+- WRITE   : first versions of new policies are staged together and flushed
+            once, so policies and rules go in as batched multi-row INSERTs.
+            Files that continue an existing policy (or one earlier in the same
+            batch) go through save_policy_version for the rule diff and
+            targeted rescan. One commit covers the whole batch.
+
+A file that fails to parse or has no text is reported and skipped; the rest
+of the batch is still saved.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models.models import Policy
+from services.pdf_extractor import extract_pdf_pages
+from services.policy_versioning import _new_rule, policy_family_name, save_policy_version
+from services.rule_extraction import PolicyExtraction, extract_rules_from_pages
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: forking a process that owns an event loop and open database
+        # connections is not safe
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.PDF_EXTRACT_WORKERS or os.cpu_count() or 1,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.RULE_EXTRACTION_CONCURRENCY)
+    return _semaphore
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+@dataclass
+class BatchFile:
+    filename: str
+    data: bytes
+    status: str = "pending"       # saved | rejected | failed
+    error: Optional[str] = None
+    extraction: Optional[PolicyExtraction] = None
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+    result: Dict[str, Any] = field(default_factory=dict)
+
+    def report(self) -> Dict[str, Any]:
+        return {"filename": self.filename, "status": self.status, "error": self.error,
+                **self.result, "timings_ms": self.timings_ms}
+
+
+def _ms(since: float) -> float:
+    return round((time.perf_counter() - since) * 1000, 1)
+
+
+async def _extract(item: BatchFile) -> None:
+    loop = asyncio.get_running_loop()
+    t0 = time.perf_counter()
+    try:
+        pages = await loop.run_in_executor(_get_executor(), extract_pdf_pages, item.data)
+    except Exception as e:
+        if isinstance(e, BrokenProcessPool):
+            shutdown()  # a worker died; start a fresh pool for the next batch
+        item.status, item.error = "failed", f"text extraction failed: {type(e).__name__}: {e}"
+        return
+    finally:
+        item.timings_ms["text"] = _ms(t0)
+    item.data = b""  # the bytes are no longer needed; free them while the batch runs
+
+    t1 = time.perf_counter()
+    async with _get_semaphore():
+        item.timings_ms["queued"] = _ms(t1)
+        t2 = time.perf_counter()
+        extraction = await extract_rules_from_pages(pages)
+        item.timings_ms["rules"] = _ms(t2)
+    if not extraction.text:
+        item.status, item.error = "rejected", "Could not extract text from PDF."
+        return
+    item.extraction = extraction
+
+
+def _summary(policy: Policy, rules, diff, tier: str) -> Dict[str, Any]:
+    return {
+        "policy_id": policy.id,
+        "name": policy.name,
+        "version": policy.version,
+        "rules": len(rules),
+        "tier": tier,
+        "diff": diff,
+    }
+
+
+async def _save(db: AsyncSession, items: List[BatchFile], rescan: bool) -> None:
+    names = [policy_family_name(item.filename) for item in items]
+    existing = set((await db.execute(
+        select(Policy.name).where(Policy.name.in_(set(names))).distinct()
+    )).scalars().all())
+
+    # New families: stage every first version, then one flush inserts them in bulk
+    fresh, versions, seen = [], [], set(existing)
+    for item, name in zip(items, names):
+        (versions if name in seen else fresh).append((item, name))
+        seen.add(name)
+
+    t0 = time.perf_counter()
+    staged = []
+    for item, name in fresh:
+        policy = Policy(filename=item.filename, name=name, version=1,
+                        extracted_text=item.extraction.text)
+        policy.rules = [_new_rule(r) for r in item.extraction.rules]
+        staged.append((item, policy))
+    db.add_all([policy for _, policy in staged])
+    await db.flush()
+    for item, policy in staged:
+        item.result = _summary(policy, policy.rules, None, item.extraction.tier)
+        item.timings_ms["save"] = _ms(t0)
+
+    # Later versions need the previous version's rules: diff them one by one
+    for item, name in versions:
+        t1 = time.perf_counter()
+        policy, rules, diff = await save_policy_version(
+            db, item.filename, item.extraction.text, item.extraction.rules, name=name, rescan=rescan,
+        )
+        await db.flush()
+        item.result = _summary(policy, rules, diff, item.extraction.tier)
+        item.timings_ms["save"] = _ms(t1)
+
+    for item, _ in fresh + versions:
+        item.status = "saved"
+
+
+async def upload_batch(db: AsyncSession, files: List[BatchFile], rescan: bool = True) -> Dict[str, Any]:
+    """
+    Extract and save many policy PDFs. Files are saved in the order given, so
+    V2 and V3 of one policy in the same batch become consecutive versions.
+    Commits; returns per-file status and timings.
+    """
+    t0 = time.perf_counter()
+    for item in files:
+        if not item.filename.lower().endswith(".pdf"):
+            item.status, item.error = "rejected", "Only PDF files are supported."
+
+    await asyncio.gather(*(_extract(item) for item in files if item.status == "pending"))
+    extract_ms = _ms(t0)
+
+    ready = [item for item in files if item.status == "pending"]
+    t1 = time.perf_counter()
+    if ready:
+        await _save(db, ready, rescan)
+        await db.commit()
+    save_ms = _ms(t1)
+
+    return {
+        "files": len(files),
+        "saved": sum(1 for item in files if item.status == "saved"),
+        "failed": sum(1 for item in files if item.status != "saved"),
+        "results": [item.report() for item in files],
+        "timings_ms": {"extract": extract_ms, "save": save_ms, "total": _ms(t0)},
+    }
@@ -0,0 +1,139 @@
+"""
+column_store.py — Columnar View of Employee Records
+====================================================
+Rules are evaluated over whole columns at once instead of employee by employee.
+A ColumnStore turns each COLUMN_SCHEMA column into a NumPy array the first
+time a rule references it, and keeps it for every later rule in the same scan.
+
+- NUMERIC : int / float / ref columns become float64 arrays, NaN where missing.
+- STRING  : string and flag columns become object arrays of stripped strings
+            (flags render as 'True' / 'False'), None where missing.
+- VALID   : a boolean mask per column marking rows whose value is present.
+- JSON    : a path into Employee.data becomes an element buffer plus the row
+            each element came from, so comparing `data.recent_trades[].amount`
+            is a single vectorized pass. Scans hand in the buffers flattened
+            when the employees were written (json_buffers.py) and only map
+            employee ids to rows; without them the data is walked once per store.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from services.compliance_engine import COLUMN_SCHEMA, ColumnType
+
+
+def _to_float_array(values: List[Any]):
+    import numpy as np
+
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        out = np.full(len(values), np.nan)
+        for i, value in enumerate(values):
+            try:
+                out[i] = float(value)
+            except (TypeError, ValueError):
+                pass
+        return out
+
+
+class ColumnStore:
+    def __init__(
+        self,
+        ids: Sequence[int],
+        source: Callable[[str], List[Any]],
+        json_buffers: Optional[Dict[Any, Any]] = None,
+    ):
+        self.ids = list(ids)
+        self.size = len(self.ids)
+        self._source = source
+        self._columns: Dict[str, Any] = {}
+        self._valid: Dict[str, Any] = {}
+        self._elements: Dict[Any, Any] = {}
+        self._json_buffers = json_buffers
+        self._id_order = None
+
+    @classmethod
+    def from_objects(cls, objects: Sequence[Any], json_buffers: Optional[Dict[Any, Any]] = None) -> "ColumnStore":
+        """
+        Columns read lazily from ORM objects (or anything with matching attributes).
+        json_buffers, from json_buffers.load_json_buffers(), covers every JSON
+        path the rules use; paths it lacks have no elements.
+        """
+        return cls([o.id for o in objects], lambda name: [getattr(o, name, None) for o in objects], json_buffers)
+
+    def _load(self, name: str) -> None:
+        import numpy as np
+
+        raw = self._source(name)
+        if COLUMN_SCHEMA[name]["type"] == ColumnType.STRING:
+            self._columns[name] = np.array(
+                [None if v is None else str(v).strip() for v in raw], dtype=object
+            )
+            self._valid[name] = np.array([v is not None for v in raw], dtype=bool)
+        else:
+            column = _to_float_array(raw)
+            self._columns[name] = column
+            self._valid[name] = ~np.isnan(column)
+
+    def column(self, name: str):
+        if name not in self._columns:
+            self._load(name)
+        return self._columns[name]
+
+    def take(self, name: str, rows=None):
+        """The column restricted to `rows` (an index array), or all of it."""
+        column = self.column(name)
+        return column if rows is None else column[rows]
+
+    def valid(self, names: Iterable[str]):
+        """Rows where every named column has a value."""
+        import numpy as np
+
+        mask = np.ones(self.size, dtype=bool)
+        for name in names:
+            self.column(name)
+            mask &= self._valid[name]
+        return mask
+
+    def json_elements(self, path, text: bool = False):
+        """
+        (parent_rows, values) for every value `path` selects, in row order.
+        Numeric buffers keep only JSON numbers, text buffers only JSON strings.
+        """
+        import numpy as np
+        from services.rule_expressions import json_element, json_path_values
+
+        key = (path, text)
+        dtype = object if text else np.float64
+        if key in self._elements:
+            return self._elements[key]
+        if self._json_buffers is not None:
+            empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=dtype))
+            self._elements[key] = self._rows_of(*self._json_buffers.get(key, empty))
+        else:
+            parents, values = [], []
+            for row, data in enumerate(self._source("data")):
+                for value in json_path_values(data, path):
+                    value = json_element(value, text)
+                    if value is not None:
+                        parents.append(row)
+                        values.append(value)
+            self._elements[key] = (np.array(parents, dtype=np.int64), np.array(values, dtype=dtype))
+        return self._elements[key]
+
+    def _rows_of(self, employee_ids, values):
+        """A buffer's elements restricted to this store's employees, as (rows, values) in row order."""
+        import numpy as np
+
+        if self._id_order is None:
+            ids = np.asarray(self.ids, dtype=np.int64)
+            order = np.argsort(ids, kind="stable")
+            self._id_order = (order, ids[order])
+        order, sorted_ids = self._id_order
+        if not self.size or not len(employee_ids):
+            return np.zeros(0, dtype=np.int64), values[:0]
+        at = np.minimum(np.searchsorted(sorted_ids, employee_ids), self.size - 1)
+        hit = sorted_ids[at] == employee_ids
+        rows = order[at[hit]]
+        by_row = np.argsort(rows, kind="stable")
+        return rows[by_row], values[hit][by_row]
@@ -11,16 +11,28 @@ Architecture
 3. TYPED EVALUATOR : performs the final comparison using direct Python operator functions.
                      No eval(), no Pandas query strings, no string-vs-boolean confusion.
 4. BATCH WRITER    : collects violations and bulk-inserts them in a single transaction.
+                     A violation stores only what was observed (value, ref value or
+                     text) and a severity code; its description is rendered from the
+                     rule when it is read (render_description).
+
+Rules with an `expression` (see rule_expressions.py) and plain conditions alike
+are compiled to vectorized masks over a ColumnStore; the typed evaluator only
+renders descriptions for the rows a mask flags. Rules over JSON paths in
+Employee.data (e.g. field `data.recent_trades[].amount`) compare flattened
+element buffers the same way.
 """
 
 import re
 import operator
-from typing import List, Optional, Any
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import List, NamedTuple, Optional, Any
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from datetime import datetime
 
-from models.models import Employee, Rule, Violation
+from models.models import Employee, Rule, Violation, SEVERITY_CODES
+from services.profiling import profiled
 
 
 # ─── 1. COLUMN SCHEMA ──────────────────────────────────────────────────────────
@@ -148,10 +160,17 @@ def normalize_rule(rule: Rule) -> Optional[dict]:
 
 # ─── 3. TYPED EVALUATOR ────────────────────────────────────────────────────────
 
-def is_violating(emp: Employee, norm: dict) -> Optional[str]:
+class Observation(NamedTuple):
+    """What a violating record held: the compact form a Violation row stores."""
+    observed_value: Optional[float] = None   # numeric / ref columns
+    ref_value: Optional[float] = None        # the ref column (REF rules)
+    observed_text: Optional[str] = None      # string columns, or an expression's observed values
+
+
+def observe(emp: Employee, norm: dict) -> Optional[Observation]:
     """
     Check whether one employee violates one normalised rule.
-    Returns a human-readable violation description or None if compliant.
+    Returns what was observed when it does, None if compliant.
     """
     field    = norm["field"]
     op_str   = norm["op"]
@@ -176,7 +195,7 @@ def is_violating(emp: Employee, norm: dict) -> Optional[str]:
             return None
         compliant = op_fn(a, r)
         if not compliant:
-            return (f"{field} ({actual}) is not {op_str} {ref_col} ({ref_val})")
+            return Observation(observed_value=a, ref_value=r)
         return None
 
     # ── STRING comparison ──────────────────────────────────────────────────────
@@ -184,7 +203,7 @@ def is_violating(emp: Employee, norm: dict) -> Optional[str]:
         actual_str = str(actual).strip()
         compliant  = op_fn(actual_str, str(typed_val))
         if not compliant:
-            return (f"{field} is '{actual_str}', must be {op_str} '{typed_val}'")
+            return Observation(observed_text=actual_str)
         return None
 
     # ── NUMERIC comparison ─────────────────────────────────────────────────────
@@ -198,21 +217,152 @@ def is_violating(emp: Employee, norm: dict) -> Optional[str]:
 
     compliant = op_fn(a, typed_val)
     if not compliant:
-        return (f"{field} ({a}) is not {op_str} {typed_val}")
+        return Observation(observed_value=float(a))
     return None
 
 
+def _plain(value: float):
+    """Integer-valued floats print as the integers the employee columns hold."""
+    return int(value) if value is not None and float(value).is_integer() else value
+
+
+def describe_observation(norm: dict, obs: Observation) -> str:
+    """The human-readable violation description for an observation."""
+    field, op_str, typed_val = norm["field"], norm["op"], norm["typed_value"]
+    if norm["col_type"] == ColumnType.REF and norm["ref_col"]:
+        return (f"{field} ({_plain(obs.observed_value)}) is not {op_str} "
+                f"{norm['ref_col']} ({_plain(obs.ref_value)})")
+    if norm["col_type"] == ColumnType.STRING:
+        return f"{field} is '{obs.observed_text}', must be {op_str} '{typed_val}'"
+    a = obs.observed_value
+    if a is not None and norm["col_type"] == ColumnType.INT:
+        a = int(a)
+    return f"{field} ({a}) is not {op_str} {typed_val}"
+
+
+def violation_fields(severity: Optional[str], obs: Observation) -> dict:
+    """Compact Violation columns for an observation: severity as its code plus the observed values."""
+    severity = severity or "Medium"
+    code = SEVERITY_CODES.get(severity)
+    return {
+        "severity_code": code,
+        "legacy_severity": None if code else severity,  # free-form severities keep their text
+        "observed_value": obs.observed_value,
+        "ref_value": obs.ref_value,
+        "observed_text": obs.observed_text,
+    }
+
+
+def is_violating(emp: Employee, norm: dict) -> Optional[str]:
+    """
+    Check whether one employee violates one normalised rule.
+    Returns a human-readable violation description or None if compliant.
+    """
+    obs = observe(emp, norm)
+    return describe_observation(norm, obs) if obs else None
+
+
+@lru_cache(maxsize=1024)
+def _description_plan(field: Optional[str], condition: Optional[str], expression: Optional[str]):
+    """(norm, compiled expression) for rendering a rule's violations; cached per rule text."""
+    from services.rule_expressions import ExpressionError, compile_expression, rule_source
+
+    rule = SimpleNamespace(field=field, condition=condition, expression=expression)
+    source = rule_source(rule)
+    if source:
+        try:
+            return None, compile_expression(source)
+        except ExpressionError:
+            return None
+    norm = normalize_rule(rule)
+    return (norm, None) if norm else None
+
+
+def render_description(
+    field: Optional[str],
+    condition: Optional[str],
+    expression: Optional[str],
+    obs: Observation,
+) -> str:
+    """
+    Description of a stored violation, rendered from its rule and observation.
+    A rule that no longer normalises falls back to its raw condition.
+    """
+    plan = _description_plan(field, condition, expression)
+    if plan is None:
+        return f"{field} violates {expression or condition}"
+    norm, compiled = plan
+    if compiled is not None:
+        return compiled.describe_observed(obs.observed_text or "")
+    return describe_observation(norm, obs)
+
+
 # ─── 4. MAIN ENGINE ────────────────────────────────────────────────────────────
 
+def compile_rules(rules: List[Rule], log: bool = True) -> list:
+    """
+    (rule, norm, compiled) for every rule that can be evaluated — norm is None
+    for expression rules. Skips rules that cannot be safely normalised (bad AI output).
+    """
+    from services.rule_expressions import ExpressionError, compile_condition, compile_expression, rule_source
+
+    compiled_rules: list = []
+    for rule in rules:
+        source = rule_source(rule)
+        if source:
+            try:
+                compiled = compile_expression(source)
+            except ExpressionError as e:
+                if log:
+                    print(f"[engine] Skipping rule id={rule.id} expression='{source}' — {e}")
+                continue
+            if log:
+                print(f"[engine] Rule id={rule.id}: {compiled}")
+            compiled_rules.append((rule, None, compiled))
+            continue
+
+        norm = normalize_rule(rule)
+        if norm is None:
+            if log:
+                print(f"[engine] Skipping rule id={rule.id} field='{rule.field}' "
+                      f"condition='{rule.condition}' — could not be normalised.")
+        else:
+            if log:
+                print(f"[engine] Rule id={rule.id}: {rule.field} {norm['op']} "
+                      f"{norm['typed_value'] if norm['ref_col'] is None else norm['ref_col']}")
+            compiled_rules.append((rule, norm, compile_condition(norm)))
+    return compiled_rules
+
+
+def violating_rows(compiled_rules: list, store, fused: bool = False):
+    """
+    (compiled rule, rows) for every compiled rule, rows being indices into the
+    store. Fused mode answers all threshold rules on a field with one search
+    per employee (see fused_scan.py); the rest run one mask per rule.
+    """
+    if fused:
+        from services.fused_scan import fused_violating_rows
+        yield from fused_violating_rows(compiled_rules, store)
+        return
+    for item in compiled_rules:
+        yield item, item[2].violating_rows(store)
+
+
+@profiled("scan")
 async def evaluate_employees_against_rules(
     db: AsyncSession,
     rules: List[Rule],
-    employees: List[Employee]
+    employees: List[Employee],
+    scan_id: Optional[str] = None,
+    fused: bool = False,
 ) -> List[Violation]:
     """
     Evaluate every employee against every active rule using the typed schema.
     Skips rules that cannot be safely normalised (bad AI output).
     """
+    from services.column_store import ColumnStore
+    from services.json_buffers import load_json_buffers, rule_paths
+
     if not rules or not employees:
         return []
 
@@ -220,41 +370,44 @@ async def evaluate_employees_against_rules(
     if not active_rules:
         return []
 
-    # Fetch existing (employee_id, rule_id) pairs to avoid duplicates
-    result = await db.execute(select(Violation.employee_id, Violation.rule_id))
+    # Fetch existing (employee_id, rule_id) pairs to avoid duplicates —
+    # only for the rules being evaluated, so targeted rescans stay cheap
+    result = await db.execute(
+        select(Violation.employee_id, Violation.rule_id)
+        .where(Violation.rule_id.in_([r.id for r in active_rules]))
+    )
     existing_pairs: set = set(result.all())
 
     new_violations: List[Violation] = []
 
-    # Pre-normalise rules once — skipping any the AI output incorrectly
-    normalised: list = []
-    for rule in active_rules:
-        norm = normalize_rule(rule)
-        if norm is None:
-            print(f"[engine] Skipping rule id={rule.id} field='{rule.field}' "
-                  f"condition='{rule.condition}' — could not be normalised.")
-        else:
-            print(f"[engine] Rule id={rule.id}: {rule.field} {norm['op']} "
-                  f"{norm['typed_value'] if norm['ref_col'] is None else norm['ref_col']}")
-            normalised.append((rule, norm))
+    # Compile rules once — skipping any the AI output incorrectly
+    compiled_rules = compile_rules(active_rules)
 
     print(f"[engine] Evaluating {len(employees)} employees against "
-          f"{len(normalised)}/{len(active_rules)} valid rules …")
-
-    for emp in employees:
-        for rule, norm in normalised:
+          f"{len(compiled_rules)}/{len(active_rules)} valid rules"
+          f"{' (fused)' if fused else ''} …")
+
+    # Each rule is one vectorized pass over the columns it references; Python
+    # only runs for the rows it flags, to record what they held. JSON paths
+    # come pre-flattened from the buffers kept up to date on employee writes.
+    paths = rule_paths(compiled_rules)
+    store = ColumnStore.from_objects(employees, await load_json_buffers(db, paths) if paths else None)
+    now = datetime.utcnow()
+    for (rule, norm, compiled), rows in violating_rows(compiled_rules, store, fused):
+        for row in rows:
+            emp = employees[row]
             pair = (emp.id, rule.id)
             if pair in existing_pairs:
                 continue
 
-            description = is_violating(emp, norm)
-            if description is not None:
+            obs = observe(emp, norm) if norm else Observation(observed_text=compiled.observed(emp))
+            if obs is not None:
                 v = Violation(
                     employee_id=emp.id,
-                    rule_id=rule.id,
-                    description=description,
-                    severity=rule.severity or "Medium",
-                    timestamp=datetime.utcnow(),
+                    rule=rule,
+                    scan_id=scan_id,
+                    timestamp=now,
+                    **violation_fields(rule.severity, obs),
                 )
                 new_violations.append(v)
                 existing_pairs.add(pair)
@@ -1,20 +1,25 @@
-import pandas as pd
+import asyncio
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 import io
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 from models.models import Employee
+from services.json_buffers import update_json_buffers
+from services.profiling import profiled
 
-async def load_dataset_from_csv(csv_bytes: bytes, db: AsyncSession) -> Dict[str, Any]:
+def parse_dataset_csv(csv_bytes: bytes) -> List[Dict[str, Any]]:
     """
-    Reads a CSV dataset from bytes, parses it using pandas, and inserts new records into the employees table.
-    Returns a summary of the operation.
+    Parses and normalizes a CSV dataset into employee record dicts.
+    CPU-bound and DB-free, so callers can run it in a worker thread.
+    Raises ValueError if the CSV cannot be parsed.
     """
+    import pandas as pd  # heavy; imported on first use to keep startup fast
+
     try:
         df = pd.read_csv(io.BytesIO(csv_bytes))
     except Exception as e:
-        return {"error": f"Failed to parse CSV: {e}", "records_imported": 0, "duplicates_skipped": 0}
+        raise ValueError(f"Failed to parse CSV: {e}") from e
 
     # Normalize column names to match model fields exactly
     column_mapping = {
@@ -59,8 +64,19 @@ async def load_dataset_from_csv(csv_bytes: bytes, db: AsyncSession) -> Dict[str,
             df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
 
     # Convert the DataFrame to a list of dictionaries for batch insertion
-    records = df.to_dict('records')
-    
+    return df.to_dict('records')
+
+
+async def insert_employee_records(
+    records: List[Dict[str, Any]],
+    db: AsyncSession,
+    commit: bool = True,
+) -> Dict[str, Any]:
+    """
+    Inserts parsed employee records, skipping employee_ids already present.
+    With commit=False the rows are only staged so the caller can commit them
+    together with other work.
+    """
     records_imported = 0
     duplicates_skipped = 0
     
@@ -94,7 +110,12 @@ async def load_dataset_from_csv(csv_bytes: bytes, db: AsyncSession) -> Dict[str,
         
     if new_employees:
         db.add_all(new_employees)
-        await db.commit()
+        with_data = [e for e in new_employees if e.data]
+        if with_data:
+            await db.flush()
+            await update_json_buffers(db, [(e.id, e.data) for e in with_data])
+        if commit:
+            await db.commit()
         records_imported = len(new_employees)
         
     return {
@@ -102,3 +123,17 @@ async def load_dataset_from_csv(csv_bytes: bytes, db: AsyncSession) -> Dict[str,
         "duplicates_skipped": duplicates_skipped,
         "total_processed": len(records)
     }
+
+
+@profiled("dataset")
+async def load_dataset_from_csv(csv_bytes: bytes, db: AsyncSession) -> Dict[str, Any]:
+    """
+    Reads a CSV dataset from bytes, parses it using pandas, and inserts new records into the employees table.
+    Returns a summary of the operation.
+    """
+    try:
+        records = await asyncio.to_thread(parse_dataset_csv, csv_bytes)
+    except ValueError as e:
+        return {"error": str(e), "records_imported": 0, "duplicates_skipped": 0}
+
+    return await insert_employee_records(records, db)
@@ -0,0 +1,179 @@
+"""
+employee_ingest.py — Streaming NDJSON Employee Ingestion
+=========================================================
+HR feeds push tens of thousands of employee records. Posting them one by one
+costs a SELECT, an INSERT and a commit per row; this path takes an NDJSON body
+(one employee object per line) and writes it in batches.
+
+1. STREAM   : the request body is consumed chunk by chunk and split on newlines,
+              so memory is bounded by one batch, not by the upload.
+2. VALIDATE : each line is validated against EmployeeCreate; bad lines are
+              reported by line number and skipped, the rest of the batch goes on.
+3. UPSERT   : each batch is written as INSERT ... VALUES (...), (...), ...
+              ON CONFLICT (employee_id) DO UPDATE ... RETURNING statements of
+              up to a thousand rows each, and committed on its own.
+              Updated employees lose their old violations so the next scan
+              re-derives them from the new values, and the JSON path buffers
+              (json_buffers.py) are brought up to date in the same transaction.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import Employee, Violation
+from schemas.schemas import EmployeeCreate
+from services.json_buffers import update_json_buffers
+
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_BATCH_SIZE = 10000
+MAX_LINE_BYTES = 1 << 20
+MAX_ERRORS_PER_BATCH = 20
+
+
+class LineTooLong(ValueError):
+    def __init__(self, line_no: int):
+        super().__init__(f"line {line_no} exceeds {MAX_LINE_BYTES} bytes")
+        self.line_no = line_no
+
+
+@dataclass
+class BatchResult:
+    batch: int
+    first_line: int
+    last_line: int
+    received: int = 0
+    inserted: int = 0
+    updated: int = 0
+    invalid: int = 0
+    violations_cleared: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    ms: float = 0.0
+
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """(line_no, line) for every non-blank line of an NDJSON byte stream."""
+    buffer = b""
+    line_no = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield line_no, line
+        if len(buffer) > MAX_LINE_BYTES:
+            raise LineTooLong(line_no + 1)
+    if buffer.strip():
+        yield line_no + 1, buffer
+
+
+async def iter_batches(
+    chunks: AsyncIterator[bytes], batch_size: int
+) -> AsyncIterator[List[Tuple[int, bytes]]]:
+    batch = []
+    async for item in iter_ndjson_lines(chunks):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def validate_batch(lines: List[Tuple[int, bytes]], result: BatchResult) -> List[Dict[str, Any]]:
+    """Validated rows of a batch; within a batch the last line for an employee_id wins."""
+    rows: Dict[str, Dict[str, Any]] = {}
+    for line_no, line in lines:
+        try:
+            record = EmployeeCreate.model_validate_json(line)
+        except ValidationError as e:
+            result.invalid += 1
+            if len(result.errors) < MAX_ERRORS_PER_BATCH:
+                first = e.errors(include_url=False)[0]
+                location = ".".join(str(part) for part in first["loc"])
+                result.errors.append({"line": line_no, "error": f"{location}: {first['msg']}" if location else first["msg"]})
+            continue
+        rows[record.employee_id] = record.model_dump()
+    return list(rows.values())
+
+
+def _insert_for(db: AsyncSession):
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+async def upsert_employees(db: AsyncSession, rows: List[Dict[str, Any]], result: BatchResult) -> None:
+    """Multi-row upsert keyed on employee_id. Does not commit."""
+    if not rows:
+        return
+    ids = [row["employee_id"] for row in rows]
+    existing = (await db.execute(
+        select(Employee.id).where(Employee.employee_id.in_(ids))
+    )).scalars().all()
+    result.updated = len(existing)
+    result.inserted = len(rows) - len(existing)
+
+    if existing:
+        cleared = await db.execute(delete(Violation).where(Violation.employee_id.in_(existing)))
+        result.violations_cleared = cleared.rowcount or 0
+
+    # With RETURNING, SQLAlchemy's insertmanyvalues sends the parameter sets as
+    # multi-row VALUES pages (insertmanyvalues_page_size rows, within the
+    # dialect's bound-parameter limit) and the compiled statement stays cached.
+    # Without it this would be an executemany, one row per statement. The
+    # returned ids also spare a lookup for the JSON path buffers.
+    insert = _insert_for(db)
+    stmt = insert(Employee.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Employee.employee_id],
+        set_={c: stmt.excluded[c] for c in rows[0] if c != "employee_id"},
+    ).returning(Employee.employee_id, Employee.id)
+    written = dict((await db.execute(stmt, rows)).all())
+
+    if existing or any(row.get("data") for row in rows):
+        await update_json_buffers(
+            db, [(written[row["employee_id"]], row.get("data")) for row in rows], replaced=existing,
+        )
+
+
+@dataclass
+class IngestSummary:
+    batches: List[BatchResult] = field(default_factory=list)
+    error: Optional[str] = None  # set when the stream was aborted; earlier batches stay committed
+
+    def totals(self) -> Dict[str, int]:
+        keys = ("received", "inserted", "updated", "invalid", "violations_cleared")
+        return {k: sum(getattr(b, k) for b in self.batches) for k in keys}
+
+
+async def ingest_ndjson(
+    chunks: AsyncIterator[bytes], db: AsyncSession, batch_size: int = DEFAULT_BATCH_SIZE
+) -> IngestSummary:
+    """Validate and upsert an NDJSON stream batch by batch, committing after each batch."""
+    summary = IngestSummary()
+    try:
+        async for lines in iter_batches(chunks, batch_size):
+            t0 = time.perf_counter()
+            result = BatchResult(
+                batch=len(summary.batches) + 1,
+                first_line=lines[0][0],
+                last_line=lines[-1][0],
+                received=len(lines),
+            )
+            rows = validate_batch(lines, result)
+            await upsert_employees(db, rows, result)
+            await db.commit()
+            result.ms = round((time.perf_counter() - t0) * 1000, 1)
+            summary.batches.append(result)
+    except LineTooLong as e:
+        summary.error = str(e)
+    return summary
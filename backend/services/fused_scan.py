@@ -0,0 +1,190 @@
+"""
+fused_scan.py — Fused Multi-Policy Evaluation
+==============================================
+Several active policies (or versions kept side by side) tend to restate the
+same checks with different thresholds: `working_days >= 15`, `>= 20`, `>= 25`.
+Evaluated one by one, each rule is another pass over the employees. Fused
+evaluation groups threshold rules by field instead:
+
+- GROUP  : plain `field op literal` rules on numeric columns, bucketed by field
+           and operator, thresholds sorted ascending.
+- SEARCH : each employee's value is located among the sorted thresholds once
+           (searchsorted). For `>=` an employee at position p violates exactly
+           the rules at p and above, so every rule's violators are a prefix of
+           the employees ordered by position.
+- REST   : ref comparisons, string equality and expressions keep their own
+           vectorized mask (CompiledExpression.violating_rows).
+
+Scan cost grows with the number of distinct (field, operator) pairs, not the
+number of rules. compare_policies() runs the same evaluation over several
+policies' rules without writing anything and reports them side by side.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import Employee, Policy, Rule
+from services.compliance_engine import ColumnType, compile_rules
+
+
+FUSABLE_OPS = ("<", "<=", ">", ">=")
+
+# Operators violated by thresholds above the employee's value ("at or above position")
+_UPPER_OPS = (">=", ">")
+# Thresholds that count as "at or below" the value when locating it
+_SEARCH_SIDE = {">=": "right", ">": "left", "<=": "left", "<": "right"}
+
+
+def is_fusable(norm: Optional[dict]) -> bool:
+    return (
+        norm is not None
+        and norm["ref_col"] is None
+        and norm["col_type"] in (ColumnType.INT, ColumnType.FLOAT)
+        and norm["op"] in FUSABLE_OPS
+    )
+
+
+@dataclass
+class ThresholdGroup:
+    field: str
+    op: str
+    members: List[tuple] = field(default_factory=list)  # compiled rules, sorted by threshold
+
+    def thresholds(self):
+        import numpy as np
+        return np.array([float(m[1]["typed_value"]) for m in self.members], dtype=np.float64)
+
+
+def group_rules(compiled_rules: Sequence[tuple]) -> Tuple[Dict[str, List[ThresholdGroup]], List[tuple]]:
+    """Threshold groups per field, plus the compiled rules that cannot be fused."""
+    buckets: Dict[Tuple[str, str], ThresholdGroup] = {}
+    rest = []
+    for item in compiled_rules:
+        norm = item[1]
+        if not is_fusable(norm):
+            rest.append(item)
+            continue
+        key = (norm["field"], norm["op"])
+        buckets.setdefault(key, ThresholdGroup(*key)).members.append(item)
+
+    by_field: Dict[str, List[ThresholdGroup]] = defaultdict(list)
+    for group in buckets.values():
+        group.members.sort(key=lambda m: m[1]["typed_value"])
+        by_field[group.field].append(group)
+    return dict(by_field), rest
+
+
+def _group_rows(group: ThresholdGroup, values, rows) -> Iterator[Any]:
+    """Violating rows of each member, in member order, from one search per employee."""
+    import numpy as np
+
+    thresholds = group.thresholds()
+    positions = np.searchsorted(thresholds, values, side=_SEARCH_SIDE[group.op])
+    order = np.argsort(positions, kind="stable")
+    sorted_positions = positions[order]
+    for k in range(len(thresholds)):
+        split = np.searchsorted(sorted_positions, k, side="right")  # employees at positions <= k
+        taken = order[:split] if group.op in _UPPER_OPS else order[split:]
+        yield rows[taken]
+
+
+def fused_violating_rows(compiled_rules: Sequence[tuple], store) -> Iterator[Tuple[tuple, List[int]]]:
+    """(compiled rule, violating rows) for every rule, threshold rules fused per field."""
+    import numpy as np
+
+    groups, rest = group_rules(compiled_rules)
+    fused = sum(len(g.members) for gs in groups.values() for g in gs)
+    print(f"[engine] Fused {fused} threshold rules into {len(groups)} field passes, "
+          f"{len(rest)} evaluated individually.")
+
+    for field_name, field_groups in groups.items():
+        rows = np.flatnonzero(store.valid([field_name]))
+        values = store.column(field_name)[rows]
+        for group in field_groups:
+            for member, member_rows in zip(group.members, _group_rows(group, values, rows)):
+                yield member, member_rows.tolist()
+
+    for item in rest:
+        yield item, item[2].violating_rows(store)
+
+
+# ─── Policy comparison ─────────────────────────────────────────────────────────
+
+async def compare_policies(db: AsyncSession, policy_ids: List[int]) -> Dict[str, Any]:
+    """
+    Evaluate every rule of the given policies (active or retired) against the
+    current employees in one fused pass and report the policies side by side.
+    Writes nothing.
+    """
+    from services.column_store import ColumnStore
+    from services.json_buffers import load_json_buffers, rule_paths
+
+    policies = (await db.execute(select(Policy).where(Policy.id.in_(policy_ids)))).scalars().all()
+    missing = sorted(set(policy_ids) - {p.id for p in policies})
+    if missing:
+        raise LookupError(f"policies not found: {missing}")
+    policies = sorted(policies, key=lambda p: policy_ids.index(p.id))
+
+    rules = (await db.execute(
+        select(Rule).where(Rule.policy_id.in_(policy_ids)).order_by(Rule.id)
+    )).scalars().all()
+    employees = (await db.execute(select(Employee))).scalars().all()
+
+    compiled_rules = compile_rules(rules, log=False)
+    paths = rule_paths(compiled_rules)
+    store = ColumnStore.from_objects(employees, await load_json_buffers(db, paths) if paths else None)
+    violators: Dict[int, set] = {rule.id: set() for rule in rules}
+    for (rule, _, _), rows in fused_violating_rows(compiled_rules, store):
+        violators[rule.id] = {store.ids[row] for row in rows}
+    evaluated = {item[0].id for item in compiled_rules}
+
+    per_policy: Dict[int, set] = {p.id: set() for p in policies}
+    rule_rows = []
+    fields: Dict[str, list] = defaultdict(list)
+    for rule in rules:
+        per_policy[rule.policy_id] |= violators[rule.id]
+        entry = {
+            "rule_id": rule.id,
+            "policy_id": rule.policy_id,
+            "field": rule.field,
+            "condition": rule.condition,
+            "expression": rule.expression,
+            "severity": rule.severity,
+            "is_active": rule.is_active,
+            "evaluated": rule.id in evaluated,
+            "violations": len(violators[rule.id]),
+        }
+        rule_rows.append(entry)
+        fields[rule.field or "(expression)"].append(
+            {k: entry[k] for k in ("policy_id", "rule_id", "condition", "expression", "violations")}
+        )
+
+    total = len(employees)
+    sets = list(per_policy.values())
+    return {
+        "employees": total,
+        "policies": [
+            {
+                "policy_id": p.id,
+                "filename": p.filename,
+                "name": p.name,
+                "version": p.version,
+                "rules": sum(1 for r in rules if r.policy_id == p.id),
+                "evaluated": sum(1 for r in rules if r.policy_id == p.id and r.id in evaluated),
+                "violations": sum(len(violators[r.id]) for r in rules if r.policy_id == p.id),
+                "violating_employees": len(per_policy[p.id]),
+                "compliance_rate": round(1 - len(per_policy[p.id]) / total, 4) if total else 1.0,
+                # Employees flagged by this policy and by none of the others
+                "only_here": len(per_policy[p.id] - set().union(*(s for pid, s in per_policy.items() if pid != p.id))),
+            }
+            for p in policies
+        ],
+        "violating_in_all": len(set.intersection(*sets)) if sets else 0,
+        "violating_in_any": len(set.union(*sets)) if sets else 0,
+        "fields": [{"field": name, "rules": entries} for name, entries in fields.items()],
+        "rules": rule_rows,
+    }
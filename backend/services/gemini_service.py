@@ -11,14 +11,24 @@ import json
 import os
 from typing import List, Dict, Any
 
-import google.genai as genai
-from google.genai import types as genai_types
+# google.genai is heavy to import, so it is loaded inside the functions that
+# call the API rather than at application startup.
+
+
+# Only the first MAX_PROMPT_CHARS characters of a policy are sent to the model
+MAX_PROMPT_CHARS = 30000
+
+
+def is_configured() -> bool:
+    """True when an API key is present, i.e. Tier 1 is worth attempting."""
+    return bool(os.getenv("GEMINI_API_KEY", ""))
 
 
 def _get_client():
     api_key = os.getenv("GEMINI_API_KEY", "")
     if not api_key:
         raise ValueError("GEMINI_API_KEY is not set.")
+    import google.genai as genai
     return genai.Client(api_key=api_key)
 
 
@@ -75,12 +85,14 @@ JSON array of rule objects. Each object MUST have exactly these keys:
 Return ONLY a valid JSON array. No markdown, no explanation.
 
 Policy Text:
-{text[:30000]}
+{text[:MAX_PROMPT_CHARS]}
 """
 
     try:
+        from google.genai import types as genai_types
+
         client = _get_client()
-        response = client.models.generate_content(
+        response = await client.aio.models.generate_content(
             model="gemini-2.5-flash",
             contents=prompt,
             config=genai_types.GenerateContentConfig(
@@ -0,0 +1,143 @@
+"""
+inline_checker.py — Per-Record Compliance Checks
+=================================================
+HR systems push employees one at a time and want compliance feedback in the
+same request. A full scan reloads every rule and every existing violation
+pair; this module keeps each workspace's active rules compiled in memory and
+checks a single record against them.
+
+- RULE SET   : active rules are normalised / compiled once per workspace and
+               kept until the workspace's "rules" generation (see query_cache)
+               changes, so any upload, rule edit or reset triggers a reload.
+- CHECK      : plain conditions reuse the typed evaluator; expression and
+               JSON-path rules run as compiled closures — no SQL, no arrays.
+- RECORD     : findings become compact Violation rows (observed values and a
+               severity code) staged in the caller's session, so they commit in
+               the same transaction as the employee write.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import Employee, Rule, Violation
+from services.compliance_engine import (
+    Observation, describe_observation, normalize_rule, observe, violation_fields,
+)
+from services.query_cache import query_cache
+from services.rule_expressions import ExpressionError, CompiledExpression, compile_expression, rule_source
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    rule_id: int
+    severity: str
+    norm: Optional[dict]
+    compiled: Optional[CompiledExpression]
+
+    def check(self, employee) -> Optional["Finding"]:
+        """The finding for this rule, or None when the record complies."""
+        if self.compiled is None:
+            obs = observe(employee, self.norm)
+            if obs is None:
+                return None
+            description = describe_observation(self.norm, obs)
+        elif self.compiled.violates(employee):
+            obs = Observation(observed_text=self.compiled.observed(employee))
+            description = self.compiled.describe_observed(obs.observed_text)
+        else:
+            return None
+        return Finding(self.rule_id, self.severity, description, obs)
+
+
+@dataclass
+class Finding:
+    rule_id: int
+    severity: str
+    description: str
+    observation: Observation
+
+
+class CompiledRuleSet:
+    def __init__(self, rules: List[CompiledRule], generation: tuple):
+        self.rules = rules
+        self.generation = generation
+
+    def check(self, employee) -> List[Finding]:
+        findings = []
+        for rule in self.rules:
+            finding = rule.check(employee)
+            if finding is not None:
+                findings.append(finding)
+        return findings
+
+
+def compile_rule(rule: Rule) -> Optional[CompiledRule]:
+    severity = rule.severity or "Medium"
+    source = rule_source(rule)
+    if source:
+        try:
+            return CompiledRule(rule.id, severity, None, compile_expression(source))
+        except ExpressionError:
+            return None
+    norm = normalize_rule(rule)
+    return CompiledRule(rule.id, severity, norm, None) if norm else None
+
+
+_rule_sets: Dict[str, CompiledRuleSet] = {}
+_reload_locks: Dict[str, asyncio.Lock] = {}
+
+
+async def get_rule_set(workspace: str, db: AsyncSession) -> CompiledRuleSet:
+    """The workspace's compiled active rules, reloaded only after rules change."""
+    generation = query_cache.generations(workspace, ("rules",))
+    rule_set = _rule_sets.get(workspace)
+    if rule_set is not None and rule_set.generation == generation:
+        return rule_set
+
+    async with _reload_locks.setdefault(workspace, asyncio.Lock()):
+        generation = query_cache.generations(workspace, ("rules",))
+        rule_set = _rule_sets.get(workspace)
+        if rule_set is None or rule_set.generation != generation:
+            result = await db.execute(select(Rule).where(Rule.is_active == True))
+            compiled = [compile_rule(r) for r in result.scalars().all()]
+            # Tag with the generation read before loading: a rule change racing
+            # the load leaves this set already stale rather than silently wrong
+            rule_set = CompiledRuleSet([c for c in compiled if c is not None], generation)
+            _rule_sets[workspace] = rule_set
+    return rule_set
+
+
+async def record_findings(
+    db: AsyncSession,
+    employee: Employee,
+    findings: List[Finding],
+    rule_set: CompiledRuleSet,
+    replace: bool = False,
+) -> List[Violation]:
+    """
+    Stage findings as violations. With replace, the employee's existing
+    violations of the checked rules are cleared first (an update supersedes them).
+    Does not commit.
+    """
+    if replace:
+        await db.execute(
+            delete(Violation)
+            .where(Violation.employee_id == employee.id)
+            .where(Violation.rule_id.in_([r.rule_id for r in rule_set.rules]))
+        )
+    violations = [
+        Violation(
+            employee_id=employee.id,
+            rule_id=f.rule_id,
+            timestamp=datetime.utcnow(),
+            **violation_fields(f.severity, f.observation),
+        )
+        for f in findings
+    ]
+    db.add_all(violations)
+    return violations
@@ -0,0 +1,200 @@
+"""
+json_buffers.py — JSON Paths Flattened at Write Time
+=====================================================
+Rules can compare values inside Employee.data, e.g.
+`data.recent_trades[].amount <= 5000`. Walking every employee's JSON for that
+on each scan is a Python loop over every element; here the walk happens once,
+when employees are written, and scans only run the NumPy pass.
+
+- FLATTEN : every path an employee's data offers (identifier keys, at most one
+            `[]` level, as rule_expressions.JsonPath allows) is expanded into
+            its number elements and its string elements.
+- STORE   : one JsonPathBuffer row per (path, kind, block of BLOCK_SIZE
+            employee ids) packs the employee id and value of every element,
+            ordered by employee id. Employee writes replace the written
+            employees' elements in the same transaction (the one that bumps the
+            "employees" generation), so the buffers never disagree with the
+            employees table; only the blocks holding those employees are
+            rewritten. Databases that predate the table are backfilled when it
+            is created.
+- SCAN    : load_json_buffers() concatenates the blocks of the paths a rule
+            set uses; a ColumnStore maps their employee ids onto its rows.
+"""
+
+import json
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import Employee, JsonPathBuffer
+
+
+BLOCK_SIZE = 4096
+
+_KEY = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+# (path, is_text, block) -> (employee ids, values) while flattening
+_Elements = Dict[Tuple[str, bool, int], Tuple[List[int], List[Any]]]
+
+
+# ─── Flatten ───────────────────────────────────────────────────────────────────
+
+@lru_cache(maxsize=4096)
+def _child(prefix: str, key: str) -> str | None:
+    """Path of a dict member, or None when a rule could not name it."""
+    return f"{prefix}.{key}" if _KEY.fullmatch(key) else None
+
+
+def _walk(value, prefix: str, in_array: bool, employee_id: int, block: int, out: _Elements) -> None:
+    # Exact type checks: decoded JSON holds only these types, and bool is not int here
+    kind = type(value)
+    if kind is dict:
+        for key, item in value.items():
+            path = _child(prefix, key) if type(key) is str else None
+            if path is not None:
+                _walk(item, path, in_array, employee_id, block, out)
+    elif kind is list:
+        if not in_array:  # a path holds one '[]' at most
+            for item in value:
+                _walk(item, prefix + "[]", True, employee_id, block, out)
+    elif kind is str or kind is int or kind is float:
+        ids, values = out[(prefix, kind is str, block)]
+        ids.append(employee_id)
+        values.append(value)
+
+
+def flatten(employees: Iterable[Tuple[int, Any]]) -> _Elements:
+    """Elements of every path in the data of (employee id, data) pairs, in the order given."""
+    out: _Elements = defaultdict(lambda: ([], []))
+    for employee_id, data in employees:
+        if type(data) is dict:
+            _walk(data, "data", False, employee_id, employee_id // BLOCK_SIZE, out)
+    return out
+
+
+# ─── Encoding ──────────────────────────────────────────────────────────────────
+
+def _packed(is_text: bool, ids, values) -> Dict[str, Any]:
+    """JsonPathBuffer columns holding the given arrays."""
+    return {
+        "size": len(ids),
+        "employee_ids": ids.astype("<i8").tobytes(),
+        "elements": json.dumps(values.tolist()).encode("utf-8") if is_text else values.astype("<f8").tobytes(),
+    }
+
+
+def _decode(buffer: JsonPathBuffer) -> tuple:
+    import numpy as np
+
+    ids = np.frombuffer(buffer.employee_ids or b"", dtype="<i8").astype(np.int64)
+    if buffer.is_text:
+        values = np.array(json.loads(buffer.elements or b"[]"), dtype=object)
+    else:
+        values = np.frombuffer(buffer.elements or b"", dtype="<f8").astype(np.float64)
+    return ids, values
+
+
+def _arrays(is_text: bool, ids: list, values: list) -> tuple:
+    import numpy as np
+
+    return np.array(ids, dtype=np.int64), np.array(values, dtype=object if is_text else np.float64)
+
+
+# ─── Writes ────────────────────────────────────────────────────────────────────
+
+async def update_json_buffers(
+    db: AsyncSession,
+    employees: Sequence[Tuple[int, Any]],
+    replaced: Iterable[int] = (),
+) -> None:
+    """
+    Add the elements of freshly written employees ((id, data) pairs). Elements
+    the `replaced` employees had before the write are dropped first. Does not
+    commit.
+    """
+    import numpy as np
+
+    fresh = flatten(employees)
+    replaced = np.unique(np.fromiter(replaced, dtype=np.int64))
+    if not fresh and not len(replaced):
+        return
+
+    blocks = {block for _, _, block in fresh} | set((replaced // BLOCK_SIZE).tolist())
+    query = select(JsonPathBuffer).where(JsonPathBuffer.block.in_(blocks))
+    if not len(replaced):  # pure inserts only touch the paths they bring
+        query = query.where(JsonPathBuffer.path.in_({path for path, _, _ in fresh}))
+    buffers = {(b.path, b.is_text, b.block): b for b in (await db.execute(query)).scalars().all()}
+
+    for key in set(buffers) | set(fresh):
+        buffer = buffers.get(key)
+        if buffer is None:
+            buffer = JsonPathBuffer(path=key[0], is_text=key[1], block=key[2])
+            db.add(buffer)
+            ids, values = _arrays(key[1], [], [])
+        else:
+            ids, values = _decode(buffer)
+            if len(replaced):
+                keep = ~np.isin(ids, replaced)
+                ids, values = ids[keep], values[keep]
+        if key in fresh:
+            new_ids, new_values = _arrays(key[1], *fresh[key])
+            ids, values = np.concatenate([ids, new_ids]), np.concatenate([values, new_values])
+            order = np.argsort(ids, kind="stable")
+            ids, values = ids[order], values[order]
+        if len(ids):
+            for name, value in _packed(key[1], ids, values).items():
+                setattr(buffer, name, value)
+        else:
+            await db.delete(buffer)
+
+
+def backfill(connection) -> None:
+    """Build every buffer from the employees already stored (sync connection)."""
+    if not inspect(connection).has_table(Employee.__tablename__):
+        return
+    rows = connection.execute(
+        select(Employee.id, Employee.data).where(Employee.data.isnot(None)).order_by(Employee.id)
+    ).all()
+    packed = [
+        {"path": path, "is_text": is_text, "block": block, **_packed(is_text, *_arrays(is_text, ids, values))}
+        for (path, is_text, block), (ids, values) in flatten(rows).items()
+    ]
+    if packed:
+        connection.execute(JsonPathBuffer.__table__.insert(), packed)
+
+
+# ─── Scans ─────────────────────────────────────────────────────────────────────
+
+def rule_paths(compiled_rules: list) -> list:
+    """JSON paths referenced by (rule, norm, compiled) items, without repeats."""
+    paths: list = []
+    for _, _, compiled in compiled_rules:
+        for path in getattr(compiled, "paths", ()):
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+async def load_json_buffers(db: AsyncSession, paths: Sequence) -> Dict[tuple, tuple]:
+    """(JsonPath, is_text) -> (employee ids, values) for the given paths."""
+    import numpy as np
+
+    by_name = {str(path): path for path in paths}
+    if not by_name:
+        return {}
+    buffers = (await db.execute(
+        select(JsonPathBuffer)
+        .where(JsonPathBuffer.path.in_(by_name))
+        .order_by(JsonPathBuffer.path, JsonPathBuffer.is_text, JsonPathBuffer.block)
+    )).scalars().all()
+    parts: Dict[tuple, list] = defaultdict(list)
+    for buffer in buffers:
+        parts[(by_name[buffer.path], buffer.is_text)].append(_decode(buffer))
+    return {
+        key: (np.concatenate([ids for ids, _ in blocks]), np.concatenate([values for _, values in blocks]))
+        for key, blocks in parts.items()
+    }
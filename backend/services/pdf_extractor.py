@@ -1,18 +1,33 @@
-import pdfplumber
 import io
+from typing import Iterator, List
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> str:
+def iter_pdf_pages(pdf_bytes: bytes) -> Iterator[str]:
     """
-    Extracts text from a given PDF bytes object using pdfplumber.
+    Yields the text of each non-empty page as pdfplumber parses it, so callers
+    can start working on page 1 before the last page has been read.
     """
-    text = ""
+    import pdfplumber  # heavy; imported on first use to keep startup fast
+
     try:
         with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
             for page in pdf.pages:
                 page_text = page.extract_text()
                 if page_text:
-                    text += page_text + "\n"
+                    yield page_text
     except Exception as e:
         print(f"Error extracting text from PDF: {e}")
-        # Return what we've got so far or empty string
-    return text.strip()
+        # Stop here; the caller keeps whatever pages were already yielded
+
+def extract_text_from_pdf(pdf_bytes: bytes) -> str:
+    """
+    Extracts text from a given PDF bytes object using pdfplumber.
+    """
+    return "\n".join(iter_pdf_pages(pdf_bytes)).strip()
+
+
+def extract_pdf_pages(pdf_bytes: bytes) -> List[str]:
+    """
+    All non-empty page texts at once. A module-level function so it can run in
+    a worker process (see services.batch_upload).
+    """
+    return list(iter_pdf_pages(pdf_bytes))
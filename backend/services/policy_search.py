@@ -0,0 +1,150 @@
+"""
+policy_search.py — Full-Text Search over Policies and Rules
+============================================================
+Policy text and rule descriptions are indexed in an SQLite FTS5 table
+(models.SEARCH_INDEX) that triggers keep in sync with the policies and rules
+tables. A search is one MATCH query ranked by bm25, so it stays fast as the
+library grows instead of loading every policy body.
+
+- QUERY   : user input is turned into an FTS5 expression of quoted terms
+            ("double quoted" phrases stay phrases; a trailing * keeps its prefix
+            match), so punctuation can never raise a syntax error.
+- RANK    : bm25 with titles (filename / rule field and condition) weighted
+            above bodies; scores are returned negated so higher is better.
+- SNIPPET : FTS5 snippet() around the best-matching terms of the body.
+
+Non-SQLite deployments fall back to a case-insensitive LIKE scan without ranking.
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, text, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import Policy, Rule, SEARCH_INDEX
+
+
+TITLE_WEIGHT = 4.0
+BODY_WEIGHT = 1.0
+SNIPPET_TOKENS = 16
+MAX_QUERY_TERMS = 32
+HIGHLIGHT = ("[", "]")
+
+_TERM = re.compile(r'"([^"]+)"|(\w+\*?)', re.UNICODE)
+
+
+def match_expression(query: str) -> Optional[str]:
+    """FTS5 MATCH expression for free text: every term must appear (implicit AND)."""
+    terms = []
+    for phrase, word in _TERM.findall(query or ""):
+        if phrase:
+            words = re.findall(r"\w+", phrase, re.UNICODE)
+            if words:
+                terms.append('"' + " ".join(words) + '"')
+        elif word.endswith("*"):
+            terms.append(f'"{word[:-1]}"*')
+        else:
+            terms.append(f'"{word}"')
+    return " ".join(terms[:MAX_QUERY_TERMS]) or None
+
+
+async def _search_fts(db: AsyncSession, expression: str, kind: Optional[str], limit: int, offset: int):
+    kind_filter = "AND kind = :kind" if kind else ""
+    result = await db.execute(
+        text(f"""
+            SELECT kind, ref_id, policy_id,
+                   bm25({SEARCH_INDEX}, :title_weight, :body_weight) AS rank,
+                   snippet({SEARCH_INDEX}, 1, :open, :close, '…', :tokens) AS snippet
+            FROM {SEARCH_INDEX}
+            WHERE {SEARCH_INDEX} MATCH :expression {kind_filter}
+            ORDER BY rank
+            LIMIT :limit OFFSET :offset
+        """),
+        {
+            "expression": expression, "kind": kind, "limit": limit, "offset": offset,
+            "title_weight": TITLE_WEIGHT, "body_weight": BODY_WEIGHT,
+            "open": HIGHLIGHT[0], "close": HIGHLIGHT[1], "tokens": SNIPPET_TOKENS,
+        },
+    )
+    return [
+        (row.kind, int(row.ref_id), row.policy_id, round(-row.rank, 4), row.snippet)
+        for row in result.all()
+    ]
+
+
+def _like_snippet(body: Optional[str], needle: str) -> str:
+    body = body or ""
+    at = body.lower().find(needle.lower())
+    if at < 0:
+        return body[:120]
+    start = max(0, at - 60)
+    return ("…" if start else "") + body[start:at + len(needle) + 60] + "…"
+
+
+async def _search_like(db: AsyncSession, query: str, kind: Optional[str], limit: int, offset: int):
+    """Unranked fallback for databases without FTS5: every word must appear somewhere."""
+    words = re.findall(r"\w+", query or "", re.UNICODE)[:MAX_QUERY_TERMS]
+    hits = []
+    if kind in (None, "policy"):
+        conditions = [or_(Policy.extracted_text.ilike(f"%{w}%"), Policy.filename.ilike(f"%{w}%")) for w in words]
+        for p in (await db.execute(select(Policy).where(*conditions).order_by(Policy.id.desc()))).scalars():
+            hits.append(("policy", p.id, p.id, None, _like_snippet(p.extracted_text, words[0])))
+    if kind in (None, "rule"):
+        conditions = [or_(Rule.description.ilike(f"%{w}%"), Rule.field.ilike(f"%{w}%")) for w in words]
+        for r in (await db.execute(select(Rule).where(*conditions).order_by(Rule.id.desc()))).scalars():
+            hits.append(("rule", r.id, r.policy_id, None, _like_snippet(r.description, words[0])))
+    return hits[offset:offset + limit]
+
+
+async def search(
+    db: AsyncSession,
+    query: str,
+    kind: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> Dict[str, Any]:
+    """Ranked policy / rule matches for free text, with their policy's metadata."""
+    expression = match_expression(query)
+    if expression is None:
+        return {"query": query, "results": []}
+
+    if db.bind.dialect.name == "sqlite":
+        hits = await _search_fts(db, expression, kind, limit, offset)
+    else:
+        hits = await _search_like(db, query, kind, limit, offset)
+
+    policy_ids = {h[2] for h in hits if h[2] is not None}
+    rule_ids = {h[1] for h in hits if h[0] == "rule"}
+    policies = {
+        p.id: p for p in (await db.execute(select(Policy).where(Policy.id.in_(policy_ids)))).scalars()
+    } if policy_ids else {}
+    rules = {
+        r.id: r for r in (await db.execute(select(Rule).where(Rule.id.in_(rule_ids)))).scalars()
+    } if rule_ids else {}
+
+    results: List[Dict[str, Any]] = []
+    for kind_, ref_id, policy_id, score, snippet in hits:
+        policy = policies.get(policy_id)
+        entry = {
+            "kind": kind_,
+            "id": ref_id,
+            "policy_id": policy_id,
+            "policy_filename": policy.filename if policy else None,
+            "policy_name": policy.name if policy else None,
+            "policy_version": policy.version if policy else None,
+            "score": score,
+            "snippet": snippet,
+        }
+        rule = rules.get(ref_id) if kind_ == "rule" else None
+        if rule is not None:
+            entry.update({
+                "description": rule.description,
+                "field": rule.field,
+                "condition": rule.condition,
+                "expression": rule.expression,
+                "severity": rule.severity,
+                "is_active": rule.is_active,
+            })
+        results.append(entry)
+    return {"query": query, "match": expression, "results": results}
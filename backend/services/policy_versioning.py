@@ -0,0 +1,247 @@
+"""
+policy_versioning.py — Policy Versions and Rule Diffs
+======================================================
+Uploading a new version of an existing policy (e.g. Global_Policy_V2.pdf →
+Global_Policy_V3.pdf) no longer requires a reset and full rescan.
+
+1. FAMILY      : the policy name is the filename without extension and version
+                 suffix, so V2 and V3 of the same document share a name.
+2. RULE DIFF   : extracted rules are matched to the previous version's active
+                 rules by field (or description when no field is set) and
+                 condition, then by field alone, and classified as added,
+                 removed, changed or unchanged. A field may hold several rules.
+3. APPLY       : unchanged rules move to the new version with their ids intact,
+                 removed and changed rules are deactivated and their violations
+                 retired, and only added/changed rules are rescanned.
+"""
+
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple
+
+from sqlalchemy import select, delete
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import Policy, Rule, Violation, Employee
+from services.compliance_engine import _extract_op_and_value, evaluate_employees_against_rules
+from services.rule_expressions import rule_source
+
+
+_VERSION_SUFFIX = re.compile(r"[\s_\-]*v(?:ersion)?[\s_\-]*\d+(?:\.\d+)*$", re.IGNORECASE)
+
+
+def policy_family_name(filename: str) -> str:
+    """'Global_Policy_V3.pdf' → 'Global_Policy'."""
+    stem = re.sub(r"\.pdf$", "", filename.strip(), flags=re.IGNORECASE)
+    return _VERSION_SUFFIX.sub("", stem) or stem
+
+
+def _rule_key(field_name: Optional[str], description: Optional[str]) -> str:
+    if field_name:
+        return field_name.strip()
+    return " ".join((description or "").lower().split())
+
+
+def _canonical_condition(condition: Optional[str]) -> str:
+    """Compare conditions by operator and value, ignoring quoting and spacing."""
+    parsed = _extract_op_and_value(condition or "")
+    if not parsed:
+        return " ".join((condition or "").split())
+    op, val = parsed
+    try:
+        val = repr(float(val))
+    except ValueError:
+        pass
+    return f"{op} {val}"
+
+
+# ─── RULE DIFF ─────────────────────────────────────────────────────────────────
+
+@dataclass
+class RuleDiff:
+    added: List[Dict[str, Any]] = field(default_factory=list)
+    removed: List[Rule] = field(default_factory=list)
+    changed: List[Tuple[Rule, Dict[str, Any]]] = field(default_factory=list)
+    unchanged: List[Tuple[Rule, Dict[str, Any]]] = field(default_factory=list)
+
+
+def diff_rules(previous: List[Rule], extracted: List[Dict[str, Any]]) -> RuleDiff:
+    """
+    Classify freshly extracted rule dicts against the previous version's active rules.
+    Expression and JSON-path rules are written by hand, never extracted, so they are not diffed.
+
+    A field may carry several rules (`working_days >= 15` and `>= 20`), so
+    matching is many-to-many: first by field and condition (unchanged, or
+    changed when only the severity differs), then what is left on a field is
+    paired in order as changed. Extracted rules left over are added; every old
+    rule left over is removed.
+    """
+    diff = RuleDiff()
+    old_rules = [r for r in previous if r.is_active and not rule_source(r)]
+
+    by_condition: Dict[Tuple[str, str], List[Rule]] = defaultdict(list)
+    for old in old_rules:
+        by_condition[(_rule_key(old.field, old.description), _canonical_condition(old.condition))].append(old)
+
+    unmatched: List[Dict[str, Any]] = []
+    matched: set = set()
+    for r in extracted:
+        candidates = by_condition.get((_rule_key(r.get("field"), r.get("description")),
+                                       _canonical_condition(r.get("condition"))))
+        if not candidates:
+            unmatched.append(r)
+            continue
+        old = candidates.pop(0)
+        matched.add(id(old))
+        if (old.severity or "Medium") == r.get("severity", "Medium"):
+            diff.unchanged.append((old, r))
+        else:
+            diff.changed.append((old, r))
+
+    by_key: Dict[str, List[Rule]] = defaultdict(list)
+    for old in old_rules:
+        if id(old) not in matched:
+            by_key[_rule_key(old.field, old.description)].append(old)
+
+    for r in unmatched:
+        remaining = by_key.get(_rule_key(r.get("field"), r.get("description")))
+        if remaining:
+            diff.changed.append((remaining.pop(0), r))
+        else:
+            diff.added.append(r)
+
+    diff.removed = [old for rules in by_key.values() for old in rules]
+    return diff
+
+
+# ─── APPLY ─────────────────────────────────────────────────────────────────────
+
+def _new_rule(r: Dict[str, Any]) -> Rule:
+    return Rule(
+        field=r.get("field"),
+        description=r.get("description", ""),
+        condition=r.get("condition"),
+        severity=r.get("severity", "Medium"),
+    )
+
+
+async def find_previous_version(db: AsyncSession, name: str) -> Optional[Policy]:
+    result = await db.execute(
+        select(Policy)
+        .options(selectinload(Policy.rules))
+        .where(Policy.name == name)
+        .order_by(Policy.version.desc(), Policy.id.desc())
+        .limit(1)
+    )
+    return result.scalars().first()
+
+
+async def save_policy_version(
+    db: AsyncSession,
+    filename: str,
+    text: str,
+    extracted_rules: List[Dict[str, Any]],
+    name: Optional[str] = None,
+    rescan: bool = True,
+) -> Tuple[Policy, List[Rule], Optional[Dict[str, Any]]]:
+    """
+    Stage a new policy (and its rules) in the session, diffing against the
+    previous version of the same policy when one exists.
+    Returns (policy, rules_of_new_version, diff_summary_or_None).
+    Does not commit; the caller owns the transaction.
+    """
+    name = name or policy_family_name(filename)
+    previous = await find_previous_version(db, name)
+
+    new_policy = Policy(
+        filename=filename,
+        name=name,
+        version=(previous.version or 1) + 1 if previous else 1,
+        previous_version_id=previous.id if previous else None,
+        extracted_text=text,
+    )
+
+    if previous is None:
+        new_policy.rules = [_new_rule(r) for r in extracted_rules]
+        db.add(new_policy)
+        return new_policy, list(new_policy.rules), None
+
+    diff = diff_rules(previous.rules, extracted_rules)
+    # Rules still active on versions before `previous` were missed by earlier
+    # diffs (several rules on one field); nothing supersedes them, so retire them
+    stale = (await db.execute(
+        select(Rule).join(Policy, Rule.policy_id == Policy.id)
+        .where(Policy.name == name, Policy.id != previous.id, Rule.is_active == True)
+    )).scalars().all()
+    diff.removed += stale
+    db.add(new_policy)
+
+    # Unchanged rules keep their id (and their violations); refresh the wording only
+    for old, r in diff.unchanged:
+        old.description = r.get("description", old.description)
+        old.policy = new_policy
+
+    # Hand-written expression rules carry over to the new version as they are
+    carried = [r for r in previous.rules if r.is_active and rule_source(r)]
+    for rule in carried:
+        rule.policy = new_policy
+
+    added = [_new_rule(r) for r in diff.added]
+    replacements = [(old, _new_rule(r)) for old, r in diff.changed]
+    for rule in added + [new for _, new in replacements]:
+        rule.policy = new_policy
+        db.add(rule)
+
+    # Retire removed and superseded rules: keep the rows for history, drop their violations
+    retired_ids = [r.id for r in diff.removed] + [old.id for old, _ in replacements]
+    for r in diff.removed:
+        r.is_active = False
+    for old, _ in replacements:
+        old.is_active = False
+
+    violations_retired = 0
+    if retired_ids:
+        result = await db.execute(delete(Violation).where(Violation.rule_id.in_(retired_ids)))
+        violations_retired = result.rowcount or 0
+
+    await db.flush()  # assign ids to the new rules before they are scanned
+
+    to_scan = added + [new for _, new in replacements]
+    violations_added = 0
+    rescanned = False
+    if rescan and to_scan:
+        employees_result = await db.execute(select(Employee))
+        employees = employees_result.scalars().all()
+        new_violations = await evaluate_employees_against_rules(db, to_scan, employees)
+        violations_added = len(new_violations)
+        rescanned = True
+
+    summary = {
+        "previous_policy_id": previous.id,
+        "added": [r.id for r in added],
+        "removed": [r.id for r in diff.removed],
+        "changed": [
+            {
+                "field": new.field,
+                "old_rule_id": old.id,
+                "new_rule_id": new.id,
+                "old_condition": old.condition,
+                "new_condition": new.condition,
+                "old_severity": old.severity,
+                "new_severity": new.severity,
+            }
+            for old, new in replacements
+        ],
+        "unchanged": [old.id for old, _ in diff.unchanged] + [r.id for r in carried],
+        "violations_retired": violations_retired,
+        "violations_added": violations_added,
+        "rescanned": rescanned,
+    }
+    print(f"[versioning] {name} v{new_policy.version}: +{len(added)} -{len(diff.removed)} "
+          f"~{len(replacements)} ={len(diff.unchanged)}; retired {violations_retired}, "
+          f"added {violations_added} violations.")
+
+    rules = [old for old, _ in diff.unchanged] + carried + added + [new for _, new in replacements]
+    return new_policy, rules, summary
@@ -0,0 +1,259 @@
+"""
+preview_scan.py — Sampled Preview Scans
+========================================
+A full scan of a multi-million-row workspace takes a while to answer "is this
+rule set reasonable?". A preview evaluates the active rules on a reproducible
+sample and extrapolates, writing nothing.
+
+- SAMPLE    : ids are drawn with a seeded NumPy generator between the smallest
+              and largest employee id and fetched by primary key, so the cost
+              follows the sample size, not the table size. Gaps left by
+              deleted rows are made up with further draws. The same seed over
+              the same data gives the same sample.
+- STRATIFY  : optionally by department or month. Each stratum gets a
+              proportional share (at least MIN_PER_STRATUM rows) and the
+              estimate weights strata by their true population (GROUP BY over
+              the column's index). Small strata are sampled from their id list,
+              read from the same index.
+- ESTIMATE  : per rule, per severity and for "any violation", the share of
+              employees violating, with a Wilson score interval. Stratified
+              estimates use the effective sample size of the weighted
+              variance; finite-population correction shrinks intervals as the
+              sample approaches the whole table.
+"""
+
+import math
+import time
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import Employee, Rule
+from services.compliance_engine import compile_rules, violating_rows
+
+
+DEFAULT_SAMPLE_SIZE = 2000
+MAX_SAMPLE_SIZE = 50000
+MIN_PER_STRATUM = 30
+SMALL_STRATUM = 50000     # strata up to this size are sampled from their id list
+FETCH_CHUNK = 900         # ids per IN (...), below SQLite's old 999-parameter limit
+MAX_DRAW_ROUNDS = 8
+
+
+# ─── Sampling ──────────────────────────────────────────────────────────────────
+
+def _stratum_filter(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+async def _fetch(db: AsyncSession, ids: Sequence[int], where=None) -> Dict[int, Employee]:
+    found: Dict[int, Employee] = {}
+    for start in range(0, len(ids), FETCH_CHUNK):
+        query = select(Employee).where(Employee.id.in_(ids[start:start + FETCH_CHUNK]))
+        if where is not None:
+            query = query.where(where)
+        found.update((e.id, e) for e in (await db.execute(query)).scalars().all())
+    return found
+
+
+async def _draw(db: AsyncSession, rng, n: int, lo: int, hi: int, population: int, where=None) -> List[Employee]:
+    """n distinct employees (matching `where`) by drawing ids from [lo, hi]."""
+    picked: List[Employee] = []
+    seen: set = set()
+    span = hi - lo + 1
+    density = max(population / span, 1e-9)
+    for _ in range(MAX_DRAW_ROUNDS):
+        need = n - len(picked)
+        if need <= 0 or len(seen) >= span:
+            break
+        size = min(span, int(need / density * 1.25) + 16)
+        candidates = [c for c in dict.fromkeys(rng.integers(lo, hi + 1, size=size).tolist()) if c not in seen]
+        seen.update(candidates)
+        found = await _fetch(db, candidates, where)
+        picked += [found[c] for c in candidates if c in found][:need]
+    return picked
+
+
+async def _from_ids(db: AsyncSession, rng, n: int, where=None) -> List[Employee]:
+    """n distinct employees chosen from the full id list (small populations)."""
+    query = select(Employee.id).order_by(Employee.id)
+    if where is not None:
+        query = query.where(where)
+    ids = (await db.execute(query)).scalars().all()
+    chosen = rng.choice(len(ids), size=min(n, len(ids)), replace=False).tolist() if ids else []
+    found = await _fetch(db, [ids[i] for i in chosen])
+    return [found[ids[i]] for i in chosen if ids[i] in found]
+
+
+async def _sample(db: AsyncSession, rng, n: int, population: int, lo: int, hi: int, where=None) -> List[Employee]:
+    if population <= SMALL_STRATUM or n * 4 >= population:
+        return await _from_ids(db, rng, n, where)
+    sample = await _draw(db, rng, n, lo, hi, population, where)
+    if len(sample) < n:  # ids far sparser than the range suggests
+        return await _from_ids(db, rng, n, where)
+    return sample
+
+
+def allocate(populations: Sequence[int], n: int) -> List[int]:
+    """Proportional allocation with a floor of MIN_PER_STRATUM (capped by the stratum)."""
+    total = sum(populations)
+    return [
+        min(size, max(MIN_PER_STRATUM, round(n * size / total))) if total else 0
+        for size in populations
+    ]
+
+
+# ─── Estimation ────────────────────────────────────────────────────────────────
+
+def wilson_interval(p: float, n_eff: float, z: float, fpc: float = 1.0) -> tuple:
+    """Wilson score interval for a proportion p observed over n_eff trials."""
+    if n_eff <= 0:
+        return 0.0, 1.0
+    if fpc <= 0:
+        return p, p
+    n_eff = n_eff / fpc
+    z2 = z * z
+    centre = (p + z2 / (2 * n_eff)) / (1 + z2 / n_eff)
+    half = z * math.sqrt(p * (1 - p) / n_eff + z2 / (4 * n_eff * n_eff)) / (1 + z2 / n_eff)
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+class _Estimator:
+    """Weighted proportions over strata (a single stratum for simple random samples)."""
+
+    def __init__(self, strata, populations, sampled, z):
+        self.strata = strata                      # stratum index of every sampled row
+        self.populations = populations
+        self.sampled = sampled
+        self.total = sum(populations)
+        self.weights = [p / self.total if self.total else 0.0 for p in populations]
+        self.z = z
+
+    def estimate(self, rows) -> Dict[str, Any]:
+        import numpy as np
+
+        hits = np.bincount(self.strata[rows], minlength=len(self.populations)) if len(rows) else \
+            np.zeros(len(self.populations), dtype=np.int64)
+        rate, variance = 0.0, 0.0
+        for h, (w, n_h, N_h) in enumerate(zip(self.weights, self.sampled, self.populations)):
+            if not n_h:
+                continue
+            p_h = hits[h] / n_h
+            rate += w * p_h
+            if n_h > 1:
+                variance += w * w * p_h * (1 - p_h) / (n_h - 1) * (1 - n_h / N_h)
+        n = sum(self.sampled)
+        if variance > 0:
+            # Effective sample size of the weighted estimate; the FPC is already in the variance
+            low, high = wilson_interval(rate, rate * (1 - rate) / variance, self.z)
+        else:
+            low, high = wilson_interval(rate, n, self.z, fpc=1 - n / self.total if self.total else 0.0)
+        return {
+            "sample_violations": int(hits.sum()),
+            "rate": round(rate, 4),
+            "ci_low": round(low, 4),
+            "ci_high": round(high, 4),
+            "estimated_employees": round(rate * self.total),
+        }
+
+
+# ─── Preview ───────────────────────────────────────────────────────────────────
+
+async def preview_scan(
+    db: AsyncSession,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+    seed: int = 0,
+    stratify: Optional[str] = None,
+    confidence: float = 0.95,
+    fused: bool = False,
+) -> Dict[str, Any]:
+    """Estimate per-rule and per-severity violation rates from a sample. Writes nothing."""
+    import numpy as np
+    from services.column_store import ColumnStore
+
+    t0 = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+    rules = (await db.execute(select(Rule).where(Rule.is_active == True).order_by(Rule.id))).scalars().all()
+    # Separate statements: SQLite answers min/max from the primary key and a
+    # bare count(*) from its smallest index, but not all three in one scan
+    lo = (await db.execute(select(func.min(Employee.id)))).scalar()
+    hi = (await db.execute(select(func.max(Employee.id)))).scalar()
+    population = (await db.execute(select(func.count()).select_from(Employee))).scalar() or 0
+
+    strata_values: list = [None]
+    populations = [population]
+    sample: List[Employee] = []
+    sampled: List[int] = []
+    if population:
+        if stratify:
+            column = getattr(Employee, stratify)
+            counts = (await db.execute(select(column, func.count()).group_by(column))).all()
+            counts.sort(key=lambda c: (c[0] is None, c[0] or ""))
+            strata_values = [value for value, _ in counts]
+            populations = [count for _, count in counts]
+            for value, size, n_h in zip(strata_values, populations, allocate(populations, sample_size)):
+                part = await _sample(db, rng, n_h, size, lo, hi, _stratum_filter(column, value))
+                sample += part
+                sampled.append(len(part))
+        else:
+            sample = await _sample(db, rng, min(sample_size, population), population, lo, hi)
+            sampled = [len(sample)]
+    else:
+        sampled = [0]
+
+    index = {value: h for h, value in enumerate(strata_values)}
+    strata = np.array(
+        [index[getattr(e, stratify)] if stratify else 0 for e in sample], dtype=np.int64
+    )
+    estimator = _Estimator(strata, populations, sampled, z)
+
+    compiled_rules = compile_rules(rules, log=False)
+    store = ColumnStore.from_objects(sample)
+    rule_rows: Dict[int, Any] = {}
+    for (rule, _, _), rows in violating_rows(compiled_rules, store, fused):
+        rule_rows[rule.id] = np.asarray(rows, dtype=np.int64)
+
+    empty = np.zeros(0, dtype=np.int64)
+    by_severity: Dict[str, Any] = {}
+    for rule in rules:
+        rows = rule_rows.get(rule.id)
+        if rows is not None:
+            severity = rule.severity or "Medium"
+            by_severity[severity] = np.union1d(by_severity.get(severity, empty), rows)
+    any_rows = np.unique(np.concatenate(list(rule_rows.values()))) if rule_rows else empty
+
+    return {
+        "population": population,
+        "sample_size": len(sample),
+        "seed": seed,
+        "stratify": stratify,
+        "confidence": confidence,
+        "rules": [
+            {
+                "rule_id": rule.id,
+                "policy_id": rule.policy_id,
+                "description": rule.description,
+                "field": rule.field,
+                "condition": rule.condition,
+                "expression": rule.expression,
+                "severity": rule.severity or "Medium",
+                "evaluated": rule.id in rule_rows,
+                **(estimator.estimate(rule_rows[rule.id]) if rule.id in rule_rows else {}),
+            }
+            for rule in rules
+        ],
+        "by_severity": [
+            {"severity": severity, **estimator.estimate(rows)}
+            for severity, rows in sorted(by_severity.items())
+        ],
+        "any_violation": estimator.estimate(any_rows),
+        "strata": [
+            {stratify: value, "population": size, "sampled": n_h}
+            for value, size, n_h in zip(strata_values, populations, sampled)
+        ] if stratify else [],
+        "ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
@@ -0,0 +1,390 @@
+"""
+profiling.py — On-Demand Profiles and Event-Loop Lag
+=====================================================
+Opt-in diagnostics for a live server, off unless asked for:
+
+- CAPTURE  : one HTTP request, scan, dataset load or policy upload is profiled
+             when an admin arms it (POST /api/admin/profiles/arm) or, with
+             PROFILE_REQUEST_FLAG set, when an admin's request carries
+             ?profile=<mode> or an X-Profile header. Only one capture runs at a time; others
+             simply run unprofiled.
+- MODES    : "cprofile" writes a .pstats file (pstats, snakeviz). "sample"
+             reads the event-loop thread's stack every
+             PROFILE_SAMPLE_INTERVAL_MS from a side thread and writes collapsed
+             stacks (.folded) for flamegraph.pl or speedscope; its overhead
+             does not grow with the number of calls. Both see everything the
+             loop runs meanwhile, so concurrent requests show up too.
+- LOOP LAG : a heartbeat task notes when the loop wakes up late and a watchdog
+             thread grabs the loop thread's stack while it is still blocked,
+             so each slow callback is recorded together with the code that
+             held the loop.
+
+Files go to PROFILE_DIR; the oldest are removed beyond PROFILE_MAX_FILES.
+"""
+
+import asyncio
+import cProfile
+import functools
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import settings
+from dependencies import is_admin
+
+
+MODES = ("cprofile", "sample")
+TARGETS = ("request", "scan", "dataset", "upload")
+EXTENSIONS = {"cprofile": ".pstats", "sample": ".folded"}
+MAX_STACK_DEPTH = 128
+
+_PROFILE_NAME = re.compile(r"^[\w.-]+\.(pstats|folded)$")
+
+
+# ─── Stacks ────────────────────────────────────────────────────────────────────
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapsed(frame) -> str:
+    """Root-first `a;b;c` stack of a frame, as flamegraph tools expect."""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def _thread_frame(thread_id: int):
+    return sys._current_frames().get(thread_id)
+
+
+# ─── Captures ──────────────────────────────────────────────────────────────────
+
+class _CProfileCapture:
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self.profile.enable()
+
+    def stop(self) -> None:
+        self.profile.disable()
+
+    def write(self, path: str) -> None:
+        self.profile.dump_stats(path)
+
+
+class _SamplingCapture:
+    """Samples one thread's stack (the event loop's) from a daemon thread."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = _thread_frame(self.thread_id)
+            if frame is not None:
+                self.stacks[_collapsed(frame)] += 1
+                self.samples += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class CaptureResult:
+    def __init__(self, label: str, mode: str):
+        self.label = label
+        self.mode = mode
+        self.name: Optional[str] = None      # file name once written
+        self.ms: Optional[float] = None
+
+
+_active: Optional[str] = None
+_armed: Dict[str, Dict[str, Any]] = {}
+_recent: deque = deque(maxlen=50)
+
+
+def _profile_dir() -> str:
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    return settings.PROFILE_DIR
+
+
+def _slug(label: str) -> str:
+    return re.sub(r"[^\w-]+", "_", label).strip("_")[:60] or "profile"
+
+
+def _prune() -> None:
+    files = sorted(list_profiles(), key=lambda p: p["created_at"], reverse=True)
+    for stale in files[settings.PROFILE_MAX_FILES:]:
+        try:
+            os.remove(os.path.join(settings.PROFILE_DIR, stale["name"]))
+        except OSError:
+            pass
+
+
+@asynccontextmanager
+async def capture(label: str, mode: str):
+    """
+    Profile the body of the `async with` in the given mode. Yields a
+    CaptureResult whose `name` is set once the file is written, or None when
+    another capture is already running.
+    """
+    global _active
+    if _active is not None:
+        print(f"[profile] {label}: skipped, already profiling {_active}")
+        yield None
+        return
+
+    _active = label
+    result = CaptureResult(label, mode)
+    if mode == "sample":
+        profiler = _SamplingCapture(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+    else:
+        profiler = _CProfileCapture()
+    t0 = time.perf_counter()
+    profiler.start()
+    try:
+        yield result
+    finally:
+        profiler.stop()
+        _active = None
+        result.ms = round((time.perf_counter() - t0) * 1000, 1)
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        result.name = f"{stamp}-{_slug(label)}-{uuid.uuid4().hex[:6]}{EXTENSIONS[mode]}"
+        path = os.path.join(_profile_dir(), result.name)
+        try:
+            await asyncio.to_thread(profiler.write, path)
+            await asyncio.to_thread(_prune)
+            _recent.append({"name": result.name, "label": label, "mode": mode, "ms": result.ms,
+                            "created_at": datetime.utcnow().isoformat()})
+            print(f"[profile] {label}: {mode} profile of {result.ms} ms written to {result.name}")
+        except OSError as e:
+            result.name = None
+            print(f"[profile] {label}: could not write profile ({e})")
+
+
+# ─── Arming ────────────────────────────────────────────────────────────────────
+
+def arm(target: str, mode: str, count: int = 1, path: Optional[str] = None) -> Dict[str, Any]:
+    """Profile the next `count` runs of target (requests: under `path` only, if given)."""
+    _armed[target] = {"mode": mode, "remaining": count, "path": path}
+    return {"target": target, **_armed[target]}
+
+
+def disarm(target: Optional[str] = None) -> None:
+    if target is None:
+        _armed.clear()
+    else:
+        _armed.pop(target, None)
+
+
+def armed() -> Dict[str, Dict[str, Any]]:
+    return {target: dict(entry) for target, entry in _armed.items()}
+
+
+def take_armed(target: str, path: Optional[str] = None) -> Optional[str]:
+    """The mode to profile this run of target with, consuming one armed run."""
+    entry = _armed.get(target)
+    if entry is None or _active is not None:
+        return None
+    if entry["path"] and not (path or "").startswith(entry["path"]):
+        return None
+    entry["remaining"] -= 1
+    if entry["remaining"] <= 0:
+        del _armed[target]
+    return entry["mode"]
+
+
+def profiled(target: str):
+    """Decorator for async jobs: profile the call when `target` is armed."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            mode = take_armed(target)
+            if mode is None:
+                return await fn(*args, **kwargs)
+            async with capture(f"{target} {fn.__name__}", mode):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def request_middleware(request, call_next):
+    """HTTP middleware: profiles flagged or armed requests, naming the file in X-Profile."""
+    mode = None
+    flag = request.query_params.get("profile") or request.headers.get("X-Profile")
+    if settings.PROFILE_REQUEST_FLAG and flag in MODES and _active is None and is_admin(request):
+        mode = flag
+    if mode is None:
+        mode = take_armed("request", request.url.path)
+    if mode is None:
+        return await call_next(request)
+
+    async with capture(f"{request.method} {request.url.path}", mode) as result:
+        response = await call_next(request)
+    if result is not None and result.name:
+        response.headers["X-Profile"] = result.name
+    return response
+
+
+# ─── Stored profiles ───────────────────────────────────────────────────────────
+
+def list_profiles() -> List[Dict[str, Any]]:
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    out = []
+    for entry in os.scandir(settings.PROFILE_DIR):
+        if entry.is_file() and _PROFILE_NAME.match(entry.name):
+            stat = entry.stat()
+            out.append({
+                "name": entry.name,
+                "format": "pstats" if entry.name.endswith(".pstats") else "collapsed",
+                "bytes": stat.st_size,
+                "created_at": datetime.utcfromtimestamp(stat.st_mtime).isoformat(),
+            })
+    return sorted(out, key=lambda p: p["created_at"], reverse=True)
+
+
+def profile_path(name: str) -> Optional[str]:
+    """Path of a stored profile, or None for unknown or unsafe names."""
+    if not _PROFILE_NAME.match(name):
+        return None
+    path = os.path.join(settings.PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+def recent_captures() -> List[Dict[str, Any]]:
+    return list(reversed(_recent))
+
+
+# ─── Event-loop lag ────────────────────────────────────────────────────────────
+
+class LoopLagMonitor:
+    """
+    Heartbeat task on the loop plus a watchdog thread. The watchdog takes the
+    loop thread's stack as soon as a beat is THRESHOLD late, i.e. while the
+    offending callback is still running; the heartbeat fills in the final lag.
+    """
+
+    def __init__(self, threshold_ms: float, max_events: int):
+        self.threshold = threshold_ms / 1000
+        self.interval = max(self.threshold / 4, 0.005)
+        self.events: deque = deque(maxlen=max_events)
+        self.beats = 0
+        self.max_lag_ms = 0.0
+        self.started_at: Optional[str] = None
+        self._expected = 0.0              # monotonic time the next beat is due
+        self._pending: Optional[dict] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+        self._loop_thread = 0
+
+    def start(self) -> None:
+        self._loop_thread = threading.get_ident()
+        self._expected = time.monotonic() + self.interval
+        self.started_at = datetime.utcnow().isoformat()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            self._expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = time.monotonic() - self._expected
+            self.beats += 1
+            self.max_lag_ms = max(self.max_lag_ms, lag * 1000)
+            if lag < self.threshold:
+                continue
+            with self._lock:
+                event, self._pending = self._pending, None
+            if event is None:  # blocked between watchdog checks; no stack to show
+                event = {"at": datetime.utcnow().isoformat(), "stack": None}
+                self.events.append(event)
+            event["lag_ms"] = round(lag * 1000, 1)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            late = time.monotonic() - self._expected
+            with self._lock:
+                if late < self.threshold or self._pending is not None:
+                    continue
+                frame = _thread_frame(self._loop_thread)
+                event = {
+                    "at": datetime.utcnow().isoformat(),
+                    "lag_ms": round(late * 1000, 1),   # so far; final value set on wake-up
+                    "stack": traceback.format_stack(frame)[-MAX_STACK_DEPTH:] if frame else None,
+                }
+                self._pending = event
+                self.events.append(event)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": True,
+            "started_at": self.started_at,
+            "threshold_ms": round(self.threshold * 1000, 1),
+            "beats": self.beats,
+            "max_lag_ms": round(self.max_lag_ms, 1),
+            "slow_callbacks": len(self.events),
+        }
+
+
+_monitor: Optional[LoopLagMonitor] = None
+
+
+def start_loop_monitor(threshold_ms: Optional[float] = None) -> None:
+    global _monitor
+    if _monitor is None:
+        _monitor = LoopLagMonitor(threshold_ms or settings.LOOP_LAG_THRESHOLD_MS, settings.LOOP_LAG_MAX_EVENTS)
+        _monitor.start()
+
+
+async def stop_loop_monitor() -> None:
+    global _monitor
+    if _monitor is not None:
+        monitor, _monitor = _monitor, None
+        await monitor.stop()
+
+
+def loop_lag(limit: int = 50) -> Dict[str, Any]:
+    if _monitor is None:
+        return {"running": False, "events": []}
+    return {**_monitor.stats(), "events": list(reversed(_monitor.events))[:limit]}
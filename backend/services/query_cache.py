@@ -0,0 +1,132 @@
+"""
+query_cache.py — Read-Through Cache for Dashboard Read Endpoints
+=================================================================
+Rules and policies change only on upload/reset, yet the dashboard polls them.
+Read endpoints store their serialized JSON here, keyed by workspace and query.
+
+- TOPICS       : each entry depends on a few data topics ("rules", "policies",
+                 "employees", "violations"). Write paths call invalidate() for
+                 the topics they touch, which bumps those topics' generation.
+- VALIDITY     : an entry is served only while every topic generation it was
+                 built under is unchanged — no TTLs, no stale reads.
+- ETAG         : a hash of the body, so clients sending If-None-Match get a 304
+                 without the body being re-serialized or re-sent.
+- METRICS      : hits, misses, not-modified responses and invalidations.
+"""
+
+import hashlib
+import itertools
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from config import settings
+
+
+TOPICS = ("policies", "rules", "employees", "violations")
+
+
+@dataclass
+class CachedBody:
+    body: bytes
+    etag: str
+
+
+class QueryCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._counter = itertools.count(1)
+        self._generations: Dict[Tuple[str, str], int] = {}
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[tuple, CachedBody]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def generations(self, workspace: str, topics: Iterable[str]) -> tuple:
+        return tuple(self._generations.get((workspace, t), 0) for t in topics)
+
+    def invalidate(self, workspace: str, *topics: str) -> None:
+        """Mark topics of a workspace as changed; no topics means all of them."""
+        for topic in topics or TOPICS:
+            self._generations[(workspace, topic)] = next(self._counter)
+        self.invalidations += 1
+
+    def lookup(self, workspace: str, key: str, topics: Iterable[str]) -> CachedBody | None:
+        entry = self._entries.get((workspace, key))
+        if entry is None:
+            return None
+        gens, cached = entry
+        if gens != self.generations(workspace, topics):
+            del self._entries[(workspace, key)]
+            return None
+        self._entries.move_to_end((workspace, key))
+        return cached
+
+    def store(self, workspace: str, key: str, gens: tuple, body: bytes) -> CachedBody:
+        cached = CachedBody(body=body, etag='"' + hashlib.sha1(body).hexdigest() + '"')
+        self._entries[(workspace, key)] = (gens, cached)
+        self._entries.move_to_end((workspace, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return cached
+
+    async def get_or_load(
+        self,
+        workspace: str,
+        key: str,
+        topics: Tuple[str, ...],
+        loader: Callable[[], Awaitable[bytes]],
+    ) -> CachedBody:
+        cached = self.lookup(workspace, key, topics)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        # Capture generations before loading so a write racing the load
+        # leaves the entry already invalid instead of silently stale.
+        gens = self.generations(workspace, topics)
+        body = await loader()
+        return self.store(workspace, key, gens, body)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations,
+        }
+
+
+query_cache = QueryCache(max_entries=settings.QUERY_CACHE_MAX_ENTRIES)
+
+
+def dump_json(data: Any) -> bytes:
+    return json.dumps(jsonable_encoder(data), separators=(",", ":")).encode("utf-8")
+
+
+async def cached_json_response(
+    request: Request,
+    workspace: str,
+    key: str,
+    topics: Tuple[str, ...],
+    loader: Callable[[], Awaitable[bytes]],
+) -> Response:
+    """Serve a read endpoint through the cache, answering 304 when the client's ETag matches."""
+    cached = await query_cache.get_or_load(workspace, key, topics, loader)
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("If-None-Match", "")
+    if cached.etag in [tag.strip() for tag in if_none_match.split(",")]:
+        query_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=cached.body, media_type="application/json", headers=headers)
@@ -6,7 +6,7 @@ and compliance conditions without any AI or external API dependency.
 """
 
 import re
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Iterator
 
 
 # Maps identifying keywords to their schema field
@@ -112,62 +112,83 @@ def _extract_threshold(sentence: str) -> Optional[float]:
     return max(float(n) for n in numbers)
 
 
-def extract_rules_from_text(text: str) -> List[Dict[str, Any]]:
-    """
-    Parse policy text and return structured rule dicts ready for DB insertion.
-    """
-    sentences = re.split(r'\n|(?<=\.)\s+(?=\d+\.)', text.strip())
-
-    rules: List[Dict[str, Any]] = []
-    seen_fields: set = set()
-
-    for raw_sentence in sentences:
-        sentence = raw_sentence.strip()
-        if len(sentence) < 8:
-            continue
-
-        field = _detect_field(sentence)
-        if field is None or field in seen_fields:
-            continue
-
-        # ── policy_compliance ──────────────────────────────────────────────
-        if field == "policy_compliance":
-            rules.append({
-                "description": _strip_list_prefix(sentence),
-                "field":       "policy_compliance",
-                "condition":   "== 'Yes'",
-                "severity":    _detect_severity(sentence, field, "=="),
-            })
-            seen_fields.add(field)
-            continue
-
-        # ── actual_sales vs target_sales ───────────────────────────────────
-        if field == "actual_sales":
-            lower = sentence.lower()
-            op = "==" if any(w in lower for w in ["exact", "exactly"]) else ">="
-            rules.append({
-                "description": _strip_list_prefix(sentence),
-                "field":       "actual_sales",
-                "condition":   f"{op} target_sales",
-                "severity":    _detect_severity(sentence, field, op),
-            })
-            seen_fields.add(field)
-            continue
+def _split_sentences(text: str) -> List[str]:
+    """Split a block of policy text into candidate rule sentences."""
+    return re.split(r'\n|(?<=\.)\s+(?=\d+\.)', text.strip())
 
-        # ── numeric fields ─────────────────────────────────────────────────
-        threshold = _extract_threshold(sentence)
-        if threshold is None:
-            continue
 
-        op = _detect_operator(sentence)
-        value = int(threshold) if threshold.is_integer() else threshold
+def _rule_from_sentence(sentence: str, field: str) -> Optional[Dict[str, Any]]:
+    """Build the rule dict for one sentence already matched to a schema field."""
+    # ── policy_compliance ──────────────────────────────────────────────────
+    if field == "policy_compliance":
+        return {
+            "description": _strip_list_prefix(sentence),
+            "field":       "policy_compliance",
+            "condition":   "== 'Yes'",
+            "severity":    _detect_severity(sentence, field, "=="),
+        }
 
-        rules.append({
+    # ── actual_sales vs target_sales ───────────────────────────────────────
+    if field == "actual_sales":
+        lower = sentence.lower()
+        op = "==" if any(w in lower for w in ["exact", "exactly"]) else ">="
+        return {
             "description": _strip_list_prefix(sentence),
-            "field":       field,
-            "condition":   f"{op} {value}",
+            "field":       "actual_sales",
+            "condition":   f"{op} target_sales",
             "severity":    _detect_severity(sentence, field, op),
-        })
-        seen_fields.add(field)
+        }
+
+    # ── numeric fields ─────────────────────────────────────────────────────
+    threshold = _extract_threshold(sentence)
+    if threshold is None:
+        return None
+
+    op = _detect_operator(sentence)
+    value = int(threshold) if threshold.is_integer() else threshold
+
+    return {
+        "description": _strip_list_prefix(sentence),
+        "field":       field,
+        "condition":   f"{op} {value}",
+        "severity":    _detect_severity(sentence, field, op),
+    }
+
 
-    return rules
+def iter_rules_from_pages(
+    pages: Iterable[str],
+    seen_fields: Optional[set] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Incremental variant of extract_rules_from_text.
+    Consumes policy text page by page and yields each rule as soon as the
+    sentence defining it is seen; later pages never re-emit a field.
+
+    Pass the same `seen_fields` set across calls to feed pages one at a time.
+    """
+    if seen_fields is None:
+        seen_fields = set()
+
+    for page_text in pages:
+        for raw_sentence in _split_sentences(page_text):
+            sentence = raw_sentence.strip()
+            if len(sentence) < 8:
+                continue
+
+            field = _detect_field(sentence)
+            if field is None or field in seen_fields:
+                continue
+
+            rule = _rule_from_sentence(sentence, field)
+            if rule is None:
+                continue
+
+            seen_fields.add(field)
+            yield rule
+
+
+def extract_rules_from_text(text: str) -> List[Dict[str, Any]]:
+    """
+    Parse policy text and return structured rule dicts ready for DB insertion.
+    """
+    return list(iter_rules_from_pages([text]))
@@ -0,0 +1,489 @@
+"""
+retention.py — Retention, Archival and Compaction
+==================================================
+Violations and scan logs otherwise grow until a workspace reset, and every
+history query slows down with them. A retention run moves rows past their
+policy out of the live tables:
+
+1. SELECT  : rows older than the age limit, or beyond the newest `max_rows`,
+             are read from the read-only pool in id order (keyset batches).
+             A violation that still applies (the newest row of its employee
+             and an active rule) is never selected: scans only skip pairs
+             that already have a row, so deleting it would have the next scan
+             record the same violation again as new. Limits therefore only
+             reach violations of retired rules or removed employees, and
+             older duplicates of a pair.
+2. ARCHIVE : each batch becomes a row group of one Parquet file per run under
+             ARCHIVE_DIR (zstd-compressed, columnar); the file is moved into
+             place only once complete. Violations are archived with their
+             rendered description, so archives stay readable after the rules
+             that produced them are gone.
+3. DELETE  : archived ids are deleted in small transactions with a pause
+             between them, so a live scan waits for at most one batch.
+
+A crash between 2 and 3 leaves rows both archived and live; the next run
+archives them again and then deletes them.
+
+Runs happen on a background loop (RETENTION_ENABLED) or on demand through the
+admin router, and never overlap for the same target.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, select, delete, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from database import AsyncSessionLocal, get_workspace, workspace_keys
+from models.models import Employee, Rule, ScanLog, Violation, SEVERITY_NAMES
+from services.compliance_engine import Observation, render_description
+from services.query_cache import query_cache
+
+
+SCAN_LOG_ARCHIVE = "scan_logs"
+
+# Archive columns: (name, arrow type name)
+VIOLATION_ARCHIVE_COLUMNS = [
+    ("violation_id", "int64"), ("employee_id", "int64"), ("employee_code", "string"),
+    ("employee_name", "string"), ("rule_id", "int64"), ("rule_description", "string"),
+    ("scan_id", "string"), ("severity", "string"), ("description", "string"),
+    ("observed_value", "float64"), ("ref_value", "float64"), ("observed_text", "string"),
+    ("detected_at", "timestamp"),
+]
+SCAN_LOG_ARCHIVE_COLUMNS = [
+    ("id", "int64"), ("user_id", "int64"), ("scan_id", "string"),
+    ("policy_filename", "string"), ("dataset_filename", "string"),
+    ("violation_count", "int64"), ("employee_count", "int64"), ("scanned_at", "timestamp"),
+    ("trigger_type", "string"), ("duration_ms", "float64"), ("cached_from", "string"),
+]
+ARCHIVE_KINDS = {
+    "violations": (VIOLATION_ARCHIVE_COLUMNS, "detected_at"),
+    "scan_logs": (SCAN_LOG_ARCHIVE_COLUMNS, "scanned_at"),
+}
+
+
+class ArchiveUnavailable(RuntimeError):
+    pass
+
+
+def archive_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# ─── Policies ──────────────────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    max_age_days: int = 0   # 0 = no age limit
+    max_rows: int = 0       # 0 = no count limit
+
+    @property
+    def active(self) -> bool:
+        return self.max_age_days > 0 or self.max_rows > 0
+
+    def cutoff(self, now: datetime) -> Optional[datetime]:
+        return now - timedelta(days=self.max_age_days) if self.max_age_days > 0 else None
+
+
+def violation_policy() -> RetentionPolicy:
+    return RetentionPolicy(settings.VIOLATION_MAX_AGE_DAYS, settings.VIOLATION_MAX_ROWS)
+
+
+def scan_log_policy() -> RetentionPolicy:
+    return RetentionPolicy(settings.SCAN_LOG_MAX_AGE_DAYS, settings.SCAN_LOG_MAX_ROWS)
+
+
+@dataclass
+class RetentionResult:
+    target: str
+    started_at: datetime = field(default_factory=datetime.utcnow)
+    archived: int = 0
+    deleted: int = 0
+    batches: int = 0
+    archive_file: Optional[str] = None
+    error: Optional[str] = None
+    ms: float = 0.0
+
+
+# ─── Archive files ─────────────────────────────────────────────────────────────
+
+def archive_dir(workspace: str, kind: str) -> str:
+    if kind == SCAN_LOG_ARCHIVE:
+        return os.path.join(settings.ARCHIVE_DIR, SCAN_LOG_ARCHIVE)
+    return os.path.join(settings.ARCHIVE_DIR, workspace, kind)
+
+
+def _arrow_schema(columns):
+    import pyarrow as pa
+
+    types = {"int64": pa.int64(), "float64": pa.float64(), "string": pa.string(),
+             "timestamp": pa.timestamp("us")}
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+class _ParquetArchive:
+    """One Parquet file per run, a row group per batch; visible only once closed."""
+
+    def __init__(self, directory: str, columns):
+        import pyarrow.parquet as pq  # optional, only needed when archiving
+
+        os.makedirs(directory, exist_ok=True)
+        self.names = [name for name, _ in columns]
+        self.schema = _arrow_schema(columns)
+        self.path = os.path.join(directory, f"{datetime.utcnow():%Y%m%dT%H%M%S%f}.parquet")
+        self.writer = pq.ParquetWriter(self.path + ".tmp", self.schema, compression="zstd")
+        self.rows = 0
+
+    def write(self, rows: List[tuple]) -> None:
+        import pyarrow as pa
+
+        columns = list(zip(*rows))
+        self.writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=self.schema.field(i).type) for i, values in enumerate(columns)],
+            schema=self.schema,
+        ))
+        self.rows += len(rows)
+
+    def close(self) -> Optional[str]:
+        self.writer.close()
+        if not self.rows:
+            os.remove(self.path + ".tmp")
+            return None
+        os.replace(self.path + ".tmp", self.path)
+        return self.path
+
+    def abort(self) -> None:
+        self.writer.close()
+        os.remove(self.path + ".tmp")
+
+
+# ─── Violations ────────────────────────────────────────────────────────────────
+
+def _violation_archive_query():
+    return (
+        select(
+            Violation.id, Violation.employee_id, Employee.employee_id, Employee.name,
+            Violation.rule_id, Rule.description, Violation.scan_id,
+            Violation.severity_code, Violation.legacy_severity, Violation.legacy_description,
+            Rule.field, Rule.condition, Rule.expression,
+            Violation.observed_value, Violation.ref_value, Violation.observed_text,
+            Violation.timestamp,
+        )
+        .outerjoin(Employee, Violation.employee_id == Employee.id)
+        .outerjoin(Rule, Violation.rule_id == Rule.id)
+    )
+
+
+def _violation_archive_row(row) -> tuple:
+    (violation_id, employee_id, employee_code, employee_name, rule_id, rule_description,
+     scan_id, severity_code, legacy_severity, legacy_description, rule_field, condition,
+     expression, observed_value, ref_value, observed_text, timestamp) = row
+    obs = Observation(observed_value, ref_value, observed_text)
+    if legacy_description is not None:
+        description = legacy_description
+    elif rule_id is not None and (rule_field or expression):
+        description = render_description(rule_field, condition, expression, obs)
+    else:
+        description = None
+    return (
+        violation_id, employee_id, employee_code, employee_name, rule_id, rule_description,
+        scan_id, SEVERITY_NAMES.get(severity_code) or legacy_severity or "Medium", description,
+        observed_value, ref_value, observed_text, timestamp,
+    )
+
+
+def _current_violation_ids():
+    """Newest violation id of every (employee, rule) pair whose employee exists and rule is active."""
+    return (
+        select(func.max(Violation.id))
+        .join(Rule, Violation.rule_id == Rule.id)
+        .join(Employee, Violation.employee_id == Employee.id)
+        .where(Rule.is_active == True)
+        .group_by(Violation.employee_id, Violation.rule_id)
+    )
+
+
+async def _violation_expiry(db: AsyncSession, policy: RetentionPolicy, now: datetime):
+    """Predicate over Violation matching the rows past the policy that no longer apply, or None."""
+    conditions = []
+    cutoff = policy.cutoff(now)
+    if cutoff is not None:
+        conditions.append(Violation.timestamp < cutoff)
+    if policy.max_rows > 0:
+        # The newest max_rows survive: everything at or below the next id goes
+        boundary = (await db.execute(
+            select(Violation.id).order_by(Violation.id.desc()).offset(policy.max_rows).limit(1)
+        )).scalar()
+        if boundary is not None:
+            conditions.append(Violation.id <= boundary)
+    if not conditions:
+        return None
+    return and_(or_(*conditions), Violation.id.not_in(_current_violation_ids()))
+
+
+async def _delete_in_batches(sessionmaker, model, ids: List[int], result: RetentionResult) -> None:
+    batch_size = max(1, settings.RETENTION_BATCH_SIZE)
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start:start + batch_size]
+        async with sessionmaker() as db:
+            deleted = await db.execute(delete(model).where(model.id.in_(chunk)))
+            await db.commit()
+        result.deleted += deleted.rowcount or 0
+        result.batches += 1
+        await asyncio.sleep(settings.RETENTION_BATCH_PAUSE_MS / 1000)
+
+
+async def _collect(sessionmaker, query, id_column, to_row, columns, directory, result) -> List[int]:
+    """
+    Keyset-scan `query` in batches on a read session, archiving each batch when
+    archiving is on. Returns the ids read (at most RETENTION_MAX_ROWS_PER_RUN).
+    """
+    archive = None
+    if settings.RETENTION_ARCHIVE:
+        if not archive_available():
+            raise ArchiveUnavailable("archiving requires the pyarrow package")
+        archive = await asyncio.to_thread(_ParquetArchive, directory, columns)
+
+    ids: List[int] = []
+    batch_size = max(1, settings.RETENTION_BATCH_SIZE)
+    try:
+        while len(ids) < settings.RETENTION_MAX_ROWS_PER_RUN:
+            limit = min(batch_size, settings.RETENTION_MAX_ROWS_PER_RUN - len(ids))
+            async with sessionmaker() as db:
+                batch = (await db.execute(
+                    query.where(id_column > (ids[-1] if ids else 0)).order_by(id_column).limit(limit)
+                )).all()
+            if not batch:
+                break
+            ids.extend(row[0] for row in batch)
+            if archive is not None:
+                await asyncio.to_thread(archive.write, [to_row(row) for row in batch])
+    except BaseException:
+        if archive is not None:
+            await asyncio.to_thread(archive.abort)
+        raise
+    if archive is not None:
+        result.archived = archive.rows
+        result.archive_file = await asyncio.to_thread(archive.close)
+    return ids
+
+
+async def archive_violations(workspace: str, policy: Optional[RetentionPolicy] = None) -> RetentionResult:
+    """Archive and delete one workspace's violations past the policy."""
+    policy = policy or violation_policy()
+    result = RetentionResult(target=f"violations:{workspace}")
+    if not policy.active:
+        return result
+
+    ws = await get_workspace(workspace)
+    async with ws.read_sessionmaker() as db:
+        expiry = await _violation_expiry(db, policy, datetime.utcnow())
+    if expiry is None:
+        return result
+
+    ids = await _collect(
+        ws.read_sessionmaker, _violation_archive_query().where(expiry), Violation.id,
+        _violation_archive_row, VIOLATION_ARCHIVE_COLUMNS, archive_dir(workspace, "violations"), result,
+    )
+    await _delete_in_batches(ws.sessionmaker, Violation, ids, result)
+    if result.deleted:
+        query_cache.invalidate(workspace, "violations")
+    return result
+
+
+# ─── Scan logs ─────────────────────────────────────────────────────────────────
+
+def _scan_log_archive_query():
+    return select(*(getattr(ScanLog, name) for name, _ in SCAN_LOG_ARCHIVE_COLUMNS))
+
+
+def _scan_log_expiry(policy: RetentionPolicy, now: datetime, user_id: Optional[int]):
+    conditions = []
+    cutoff = policy.cutoff(now)
+    if cutoff is not None:
+        conditions.append(ScanLog.scanned_at < cutoff)
+    if policy.max_rows > 0:
+        # Newest max_rows per user survive
+        ranked = select(
+            ScanLog.id,
+            func.row_number().over(
+                partition_by=ScanLog.user_id,
+                order_by=(ScanLog.scanned_at.desc(), ScanLog.id.desc()),
+            ).label("rank"),
+        ).subquery()
+        conditions.append(ScanLog.id.in_(select(ranked.c.id).where(ranked.c.rank > policy.max_rows)))
+    if not conditions:
+        return None
+    expiry = or_(*conditions)
+    if user_id is not None:
+        expiry = expiry & (ScanLog.user_id == user_id)
+    return expiry
+
+
+async def archive_scan_logs(
+    user_id: Optional[int] = None, policy: Optional[RetentionPolicy] = None
+) -> RetentionResult:
+    """Archive and delete scan logs past the policy — one user's, or everyone's."""
+    policy = policy or scan_log_policy()
+    target = SCAN_LOG_ARCHIVE if user_id is None else f"{SCAN_LOG_ARCHIVE}:user_{user_id}"
+    result = RetentionResult(target=target)
+    expiry = _scan_log_expiry(policy, datetime.utcnow(), user_id) if policy.active else None
+    if expiry is None:
+        return result
+
+    ids = await _collect(
+        AsyncSessionLocal, _scan_log_archive_query().where(expiry), ScanLog.id,
+        tuple, SCAN_LOG_ARCHIVE_COLUMNS, archive_dir("", SCAN_LOG_ARCHIVE), result,
+    )
+    await _delete_in_batches(AsyncSessionLocal, ScanLog, ids, result)
+    return result
+
+
+# ─── Runs ──────────────────────────────────────────────────────────────────────
+
+_locks: Dict[str, asyncio.Lock] = {}
+_recent: deque = deque(maxlen=50)
+
+
+def running() -> List[str]:
+    return [target for target, lock in _locks.items() if lock.locked()]
+
+
+def recent_runs(targets: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    return [asdict(r) for r in reversed(_recent) if targets is None or r.target in targets]
+
+
+async def _run(target: str, job) -> Optional[RetentionResult]:
+    """Run one target's retention unless it is already running; records the outcome."""
+    lock = _locks.setdefault(target, asyncio.Lock())
+    if lock.locked():
+        return None
+    async with lock:
+        t0 = time.perf_counter()
+        try:
+            result = await job()
+        except Exception as e:
+            result = RetentionResult(target=target, error=str(e))
+        result.ms = round((time.perf_counter() - t0) * 1000, 1)
+        if result.archived or result.deleted or result.error:
+            _recent.append(result)
+        if result.error:
+            print(f"[retention] {target}: {result.error}")
+        elif result.deleted:
+            print(f"[retention] {target}: archived {result.archived}, deleted {result.deleted} "
+                  f"in {result.batches} batches ({result.ms} ms)")
+        return result
+
+
+async def run_workspace(workspace: str, user_id: Optional[int]) -> List[RetentionResult]:
+    """On-demand run for one caller: their workspace's violations and their scan logs."""
+    results = [
+        await _run(f"violations:{workspace}", lambda: archive_violations(workspace)),
+        await _run(f"{SCAN_LOG_ARCHIVE}:user_{user_id}", lambda: archive_scan_logs(user_id))
+        if user_id is not None else None,
+    ]
+    return [r for r in results if r is not None]
+
+
+async def run_all() -> List[RetentionResult]:
+    """One sweep over every workspace, then the shared scan log table."""
+    results = []
+    for workspace in workspace_keys():
+        results.append(await _run(f"violations:{workspace}", lambda: archive_violations(workspace)))
+    results.append(await _run(SCAN_LOG_ARCHIVE, archive_scan_logs))
+    return [r for r in results if r is not None]
+
+
+_loop_task: Optional[asyncio.Task] = None
+
+
+async def _retention_loop() -> None:
+    while True:
+        await asyncio.sleep(settings.RETENTION_INTERVAL_SECONDS)
+        try:
+            await run_all()
+        except Exception as e:  # keep the loop alive
+            print(f"[retention] sweep failed: {e}")
+
+
+def start() -> None:
+    global _loop_task
+    if _loop_task is None and settings.RETENTION_ENABLED:
+        _loop_task = asyncio.create_task(_retention_loop())
+
+
+async def stop() -> None:
+    global _loop_task
+    if _loop_task is not None:
+        _loop_task.cancel()
+        try:
+            await _loop_task
+        except asyncio.CancelledError:
+            pass
+        _loop_task = None
+
+
+# ─── Archive queries ───────────────────────────────────────────────────────────
+
+def _query_archive_files(
+    directory: str,
+    kind: str,
+    filters: List[tuple],
+    offset: int,
+    limit: int,
+) -> Dict[str, Any]:
+    import pyarrow.dataset as ds
+
+    files = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".parquet")
+    ) if os.path.isdir(directory) else []
+    if not files:
+        return {"files": 0, "rows": []}
+
+    columns, _ = ARCHIVE_KINDS[kind]
+    dataset = ds.dataset(files, format="parquet", schema=_arrow_schema(columns))
+    expression = None
+    for name, op, value in filters:
+        column = ds.field(name)
+        term = column >= value if op == ">=" else column < value if op == "<" else column == value
+        expression = term if expression is None else expression & term
+    table = dataset.head(offset + limit, filter=expression)
+    return {"files": len(files), "rows": table.slice(offset).to_pylist()}
+
+
+async def query_archive(
+    kind: str,
+    workspace: str,
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    employee_id: Optional[int] = None,
+    offset: int = 0,
+    limit: int = 100,
+) -> Dict[str, Any]:
+    """Archived rows of one kind, oldest archive first. Scan logs are scoped to user_id."""
+    if not archive_available():
+        raise ArchiveUnavailable("reading archives requires the pyarrow package")
+    _, time_column = ARCHIVE_KINDS[kind]
+    filters = []
+    if since is not None:
+        filters.append((time_column, ">=", since))
+    if until is not None:
+        filters.append((time_column, "<", until))
+    if kind == "violations" and employee_id is not None:
+        filters.append(("employee_id", "==", employee_id))
+    if kind == SCAN_LOG_ARCHIVE and user_id is not None:
+        filters.append(("user_id", "==", user_id))
+    return await asyncio.to_thread(
+        _query_archive_files, archive_dir(workspace, kind), kind, filters, offset, limit
+    )
@@ -0,0 +1,972 @@
+"""
+rule_expressions.py — Compound Rule Expression Language
+========================================================
+A single `field op value` condition cannot express policies such as
+"working days >= 20 and satisfaction >= 3, unless the target was beaten by 10%".
+Rules may instead carry an `expression`, written in a small language that is
+parsed once into an AST and never evaluated with eval().
+
+    working_days >= 20 AND customer_satisfaction_score >= 3
+        UNLESS actual_sales >= target_sales * 1.1
+
+Grammar (keywords are case-insensitive)
+---------------------------------------
+    expr       := or_expr ('UNLESS' or_expr)*          A UNLESS B  ≡  A OR B
+    or_expr    := and_expr ('OR' and_expr)*
+    and_expr   := not_expr ('AND' not_expr)*
+    not_expr   := 'NOT' not_expr | predicate
+    predicate  := sum [ cmp sum
+                      | ['NOT'] 'BETWEEN' sum 'AND' sum
+                      | ['NOT'] 'IN' '(' literal (',' literal)* ')' ]
+    sum        := term (('+' | '-') term)*
+    term       := unary (('*' | '/') unary)*
+    unary      := '-' unary | atom
+    atom       := NUMBER | 'string' | TRUE | FALSE | column | json_path | '(' expr ')'
+    json_path  := 'data' ('.' key ['[]'])+                 at most one '[]'
+
+Identifiers must be COLUMN_SCHEMA columns; string columns only support equality
+and their values are checked against the column's allowed values.
+
+JSON paths read Employee.data, e.g. `data.recent_trades[].amount <= 5000`. A
+path may only be compared directly (no arithmetic on it). With '[]' the
+comparison must hold for every element, so one oversized trade is a violation.
+Elements or values that are missing, or of the wrong JSON type, are ignored.
+
+An expression states what a compliant employee satisfies. It compiles to:
+
+1. NUMPY MASKS : evaluated over a ColumnStore. AND / OR children run in order
+                 of observed selectivity and only on rows still undecided, so
+                 the most decisive predicate prunes the work of the others.
+2. SQL         : the same AST as a SQLAlchemy predicate over Employee, for
+                 counting or selecting violators without loading rows. JSON
+                 paths push down to SQLite's json_extract / json_each.
+3. CLOSURES    : nested Python closures checking one record at a time, for
+                 inline checks where array setup would cost more than the test.
+
+Employees missing a value in any referenced column are never flagged. A zero
+divisor makes the value missing too, so `actual_sales / target_sales <= 1` never
+flags an employee whose target_sales is 0, in every backend.
+"""
+
+import math
+import operator
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Boolean, and_, exists, false, func, literal, not_, or_, select, true
+
+from models.models import Employee
+from services.compliance_engine import COLUMN_SCHEMA, ColumnType, OPS
+
+
+MAX_EXPRESSION_LENGTH = 1000
+MAX_NESTING_DEPTH = 32
+DESCRIBE_MAX_ELEMENTS = 10
+
+KEYWORDS = {"AND", "OR", "NOT", "UNLESS", "BETWEEN", "IN", "TRUE", "FALSE"}
+CMP_OPS = {"<", "<=", ">", ">=", "==", "!="}
+_OP_ALIASES = {"=": "==", "<>": "!="}
+
+_ARITH = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+}
+
+
+class ExpressionError(ValueError):
+    def __init__(self, message: str, position: Optional[int] = None):
+        super().__init__(message if position is None else f"{message} (at position {position})")
+        self.message = message
+        self.position = position
+
+
+# ─── AST ───────────────────────────────────────────────────────────────────────
+
+def _fmt_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+
+    def __str__(self):
+        return self.name
+
+
+@dataclass(frozen=True)
+class Literal:
+    value: Any  # float or str
+
+    def __str__(self):
+        return f"'{self.value}'" if isinstance(self.value, str) else _fmt_number(self.value)
+
+
+@dataclass(frozen=True)
+class JsonPath:
+    keys: Tuple[str, ...]
+    array_at: Optional[int] = None  # index of the key followed by '[]'
+
+    def __str__(self):
+        return "data." + ".".join(
+            key + ("[]" if i == self.array_at else "") for i, key in enumerate(self.keys)
+        )
+
+    @property
+    def array_keys(self) -> Tuple[str, ...]:
+        """Keys leading to the array (all keys for a scalar path)."""
+        return self.keys if self.array_at is None else self.keys[:self.array_at + 1]
+
+    @property
+    def element_keys(self) -> Tuple[str, ...]:
+        """Keys inside each array element."""
+        return () if self.array_at is None else self.keys[self.array_at + 1:]
+
+
+def _json_pointer(keys: Tuple[str, ...]) -> str:
+    return "$" + "".join(f".{key}" for key in keys)
+
+
+def _walk(value, keys: Tuple[str, ...]):
+    for key in keys:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def json_path_values(data, path: JsonPath) -> list:
+    """Values a path selects from one employee's data (one at most for scalar paths)."""
+    target = _walk(data, path.array_keys)
+    if path.array_at is None:
+        return [] if target is None else [target]
+    if not isinstance(target, list):
+        return []
+    return [v for v in (_walk(item, path.element_keys) for item in target) if v is not None]
+
+
+def json_element(value, text: bool):
+    """A JSON value usable in a text (strings only) or numeric (numbers only) comparison."""
+    if text:
+        return value if isinstance(value, str) else None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return None
+
+
+@dataclass(frozen=True)
+class Arith:
+    op: str
+    left: Any
+    right: Any
+
+    def __str__(self):
+        return f"({self.left} {self.op} {self.right})"
+
+
+@dataclass(frozen=True)
+class Negate:
+    operand: Any
+
+    def __str__(self):
+        return f"-{self.operand}"
+
+
+@dataclass(frozen=True)
+class Compare:
+    op: str
+    left: Any
+    right: Any
+
+    def __str__(self):
+        return f"{self.left} {self.op} {self.right}"
+
+
+@dataclass(frozen=True)
+class Between:
+    operand: Any
+    low: Any
+    high: Any
+    negated: bool = False
+
+    def __str__(self):
+        return f"{self.operand} {'NOT ' if self.negated else ''}BETWEEN {self.low} AND {self.high}"
+
+
+@dataclass(frozen=True)
+class InList:
+    operand: Any
+    values: Tuple[Literal, ...]
+    negated: bool = False
+
+    def __str__(self):
+        values = ", ".join(str(v) for v in self.values)
+        return f"{self.operand} {'NOT ' if self.negated else ''}IN ({values})"
+
+
+@dataclass(frozen=True)
+class And:
+    items: Tuple[Any, ...]
+
+    def __str__(self):
+        return "(" + " AND ".join(str(i) for i in self.items) + ")"
+
+
+@dataclass(frozen=True)
+class Or:
+    items: Tuple[Any, ...]
+
+    def __str__(self):
+        return "(" + " OR ".join(str(i) for i in self.items) + ")"
+
+
+@dataclass(frozen=True)
+class Not:
+    operand: Any
+
+    def __str__(self):
+        return f"NOT {self.operand}"
+
+
+_NUM, _STR, _BOOL, _JSON = "number", "string", "condition", "JSON value"
+
+
+def _kind(node) -> str:
+    if isinstance(node, Column):
+        return _STR if COLUMN_SCHEMA[node.name]["type"] == ColumnType.STRING else _NUM
+    if isinstance(node, Literal):
+        return _STR if isinstance(node.value, str) else _NUM
+    if isinstance(node, (Arith, Negate)):
+        return _NUM
+    if isinstance(node, JsonPath):
+        return _JSON
+    return _BOOL
+
+
+def _columns(node, found: Optional[list] = None, cls=Column) -> list:
+    """Referenced columns (or, with cls=JsonPath, JSON paths) in first-use order."""
+    found = [] if found is None else found
+    if isinstance(node, cls):
+        if node not in found:
+            found.append(node)
+    elif isinstance(node, (Arith, Compare)):
+        _columns(node.left, found, cls)
+        _columns(node.right, found, cls)
+    elif isinstance(node, (Negate, Not)):
+        _columns(node.operand, found, cls)
+    elif isinstance(node, Between):
+        for child in (node.operand, node.low, node.high):
+            _columns(child, found, cls)
+    elif isinstance(node, InList):
+        _columns(node.operand, found, cls)
+    elif isinstance(node, (And, Or)):
+        for child in node.items:
+            _columns(child, found, cls)
+    return found
+
+
+def _divisors(node, found: Optional[list] = None) -> list:
+    """Right operands of every division that can be zero, inner ones first."""
+    found = [] if found is None else found
+    if isinstance(node, Arith):
+        _divisors(node.left, found)
+        _divisors(node.right, found)
+        if node.op == "/" and node.right not in found and not (isinstance(node.right, Literal) and node.right.value):
+            found.append(node.right)
+    elif isinstance(node, Compare):
+        _divisors(node.left, found)
+        _divisors(node.right, found)
+    elif isinstance(node, (Negate, Not, InList)):
+        _divisors(node.operand, found)
+    elif isinstance(node, Between):
+        for child in (node.operand, node.low, node.high):
+            _divisors(child, found)
+    elif isinstance(node, (And, Or)):
+        for child in node.items:
+            _divisors(child, found)
+    return found
+
+
+def _predicate_path(node) -> Optional[JsonPath]:
+    """The JSON path a comparison reads, if any (the grammar allows at most one)."""
+    paths = _columns(node, cls=JsonPath)
+    return paths[0] if paths else None
+
+
+def _path_kind(node) -> str:
+    """Whether a JSON-path comparison reads numbers or strings."""
+    if isinstance(node, Compare):
+        other = node.right if isinstance(node.left, JsonPath) else node.left
+        return _kind(other)
+    if isinstance(node, InList):
+        return _kind(node.values[0])
+    return _NUM
+
+
+def _combine(cls, left, right):
+    """Flatten nested AND / OR chains so their children can be reordered freely."""
+    items = []
+    for node in (left, right):
+        items.extend(node.items if isinstance(node, cls) else (node,))
+    return cls(tuple(items))
+
+
+# ─── PARSER ────────────────────────────────────────────────────────────────────
+
+_TOKEN = re.compile(r"""
+    (?P<number> \d+(?:\.\d*)? | \.\d+ )
+  | (?P<string> '[^']*' | "[^"]*" )
+  | (?P<path>   data (?: \.[A-Za-z_][A-Za-z0-9_]* (?:\[\])? )+ )
+  | (?P<ident>  [A-Za-z_][A-Za-z0-9_]* )
+  | (?P<op>     <= | >= | != | == | <> | [<>=+\-*/(),] )
+""", re.VERBOSE)
+
+
+@dataclass
+class _Token:
+    kind: str   # number | string | path | ident | op | end
+    text: str
+    pos: int
+
+
+def _tokenize(source: str) -> List[_Token]:
+    tokens, pos = [], 0
+    while True:
+        while pos < len(source) and source[pos].isspace():
+            pos += 1
+        if pos >= len(source):
+            break
+        match = _TOKEN.match(source, pos)
+        if not match:
+            raise ExpressionError(f"unexpected character '{source[pos]}'", pos)
+        tokens.append(_Token(match.lastgroup, match.group(), pos))
+        pos = match.end()
+    tokens.append(_Token("end", "", len(source)))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, source: str):
+        self.tokens = _tokenize(source)
+        self.index = 0
+        self.depth = 0
+
+    # ── token helpers ─────────────────────────────────────────────────────────
+    def peek(self, offset: int = 0) -> _Token:
+        return self.tokens[min(self.index + offset, len(self.tokens) - 1)]
+
+    def take(self) -> _Token:
+        tok = self.peek()
+        self.index += 1
+        return tok
+
+    def at_keyword(self, word: str, offset: int = 0) -> bool:
+        tok = self.peek(offset)
+        return tok.kind == "ident" and tok.text.upper() == word
+
+    def at_op(self, *ops: str) -> bool:
+        tok = self.peek()
+        return tok.kind == "op" and _OP_ALIASES.get(tok.text, tok.text) in ops
+
+    def expect_op(self, op: str) -> _Token:
+        if not self.at_op(op):
+            tok = self.peek()
+            raise ExpressionError(f"expected '{op}' but found {self._describe(tok)}", tok.pos)
+        return self.take()
+
+    @staticmethod
+    def _describe(tok: _Token) -> str:
+        return "end of expression" if tok.kind == "end" else f"'{tok.text}'"
+
+    def require(self, node, kind: str, tok: _Token):
+        if _kind(node) != kind:
+            raise ExpressionError(f"expected a {kind}, got {_kind(node)} {node}", tok.pos)
+        return node
+
+    # ── grammar ───────────────────────────────────────────────────────────────
+    def parse(self):
+        start = self.peek()
+        node = self.expr()
+        tok = self.peek()
+        if tok.kind != "end":
+            raise ExpressionError(f"unexpected {self._describe(tok)}", tok.pos)
+        self.require(node, _BOOL, start)
+        if not _columns(node) and not _columns(node, cls=JsonPath):
+            raise ExpressionError("expression does not reference any column", start.pos)
+        return node
+
+    def expr(self):
+        self.depth += 1
+        if self.depth > MAX_NESTING_DEPTH:
+            raise ExpressionError("expression is nested too deeply", self.peek().pos)
+        start = self.peek()
+        node = self.or_expr()
+        while self.at_keyword("UNLESS"):
+            tok = self.take()
+            exception = self.or_expr()
+            node = _combine(Or, self.require(node, _BOOL, start), self.require(exception, _BOOL, tok))
+        self.depth -= 1
+        return node
+
+    def or_expr(self):
+        start = self.peek()
+        node = self.and_expr()
+        while self.at_keyword("OR"):
+            tok = self.take()
+            right = self.and_expr()
+            node = _combine(Or, self.require(node, _BOOL, start), self.require(right, _BOOL, tok))
+        return node
+
+    def and_expr(self):
+        start = self.peek()
+        node = self.not_expr()
+        while self.at_keyword("AND"):
+            tok = self.take()
+            right = self.not_expr()
+            node = _combine(And, self.require(node, _BOOL, start), self.require(right, _BOOL, tok))
+        return node
+
+    def not_expr(self):
+        if self.at_keyword("NOT"):
+            tok = self.take()
+            return Not(self.require(self.not_expr(), _BOOL, tok))
+        return self.predicate()
+
+    def predicate(self):
+        left = self.sum()
+
+        if self.at_op(*CMP_OPS):
+            tok = self.take()
+            op = _OP_ALIASES.get(tok.text, tok.text)
+            return self._compare(op, left, self.sum(), tok)
+
+        negated = self.at_keyword("NOT") and (self.at_keyword("BETWEEN", 1) or self.at_keyword("IN", 1))
+        if negated:
+            self.take()
+
+        if self.at_keyword("BETWEEN"):
+            tok = self.take()
+            low = self.sum()
+            if not self.at_keyword("AND"):
+                raise ExpressionError("expected AND in BETWEEN", self.peek().pos)
+            self.take()
+            high = self.sum()
+            if _kind(left) != _JSON:
+                self.require(left, _NUM, tok)
+            self.require(low, _NUM, tok)
+            self.require(high, _NUM, tok)
+            return Between(left, low, high, negated)
+
+        if self.at_keyword("IN"):
+            tok = self.take()
+            self.expect_op("(")
+            values = [self.literal()]
+            while self.at_op(","):
+                self.take()
+                values.append(self.literal())
+            self.expect_op(")")
+            kind = _kind(values[0]) if _kind(left) == _JSON else _kind(left)
+            if kind == _BOOL or any(_kind(v) != kind for v in values):
+                raise ExpressionError(f"IN list values must all be {kind}s", tok.pos)
+            if isinstance(left, Column) and kind == _STR:
+                values = [self._allowed_value(left, v, tok) for v in values]
+            return InList(left, tuple(values), negated)
+
+        # A bare value is only legal inside arithmetic; callers needing a condition check
+        return left
+
+    def _compare(self, op: str, left, right, tok: _Token):
+        kind = _kind(left)
+        if _JSON in (kind, _kind(right)):
+            # A path compares against a number or string, never another path
+            kind = _kind(right) if kind == _JSON else kind
+            if kind not in (_NUM, _STR):
+                raise ExpressionError(f"cannot compare {_kind(left)} {left} with {_kind(right)} {right}", tok.pos)
+        elif kind == _BOOL or _kind(right) != kind:
+            raise ExpressionError(f"cannot compare {_kind(left)} {left} with {_kind(right)} {right}", tok.pos)
+        if kind == _STR:
+            if op not in ("==", "!="):
+                raise ExpressionError(f"operator {op} is not supported for text columns", tok.pos)
+            if isinstance(left, Column) and isinstance(right, Literal):
+                right = self._allowed_value(left, right, tok)
+            elif isinstance(right, Column) and isinstance(left, Literal):
+                left = self._allowed_value(right, left, tok)
+        return Compare(op, left, right)
+
+    @staticmethod
+    def _allowed_value(column: Column, value, tok: _Token) -> Literal:
+        if not isinstance(value, Literal):
+            return value
+        allowed = COLUMN_SCHEMA[column.name].get("allowed_values") or []
+        for candidate in allowed:
+            if candidate.lower() == value.value.strip().lower():
+                return Literal(candidate)
+        if not allowed:
+            return value
+        raise ExpressionError(
+            f"'{value.value}' is not a valid value for {column.name}; expected one of {allowed}", tok.pos
+        )
+
+    def sum(self):
+        node = self.term()
+        while self.at_op("+", "-"):
+            tok = self.take()
+            right = self.term()
+            node = Arith(tok.text, self.require(node, _NUM, tok), self.require(right, _NUM, tok))
+        return node
+
+    def term(self):
+        node = self.unary()
+        while self.at_op("*", "/"):
+            tok = self.take()
+            right = self.unary()
+            node = Arith(tok.text, self.require(node, _NUM, tok), self.require(right, _NUM, tok))
+        return node
+
+    def unary(self):
+        if self.at_op("-"):
+            tok = self.take()
+            operand = self.require(self.unary(), _NUM, tok)
+            return Literal(-operand.value) if isinstance(operand, Literal) else Negate(operand)
+        return self.atom()
+
+    def literal(self) -> Literal:
+        tok = self.peek()
+        node = self.unary()
+        if not isinstance(node, Literal):
+            raise ExpressionError(f"expected a literal value, got {node}", tok.pos)
+        return node
+
+    def atom(self):
+        tok = self.take()
+        if tok.kind == "number":
+            return Literal(float(tok.text))
+        if tok.kind == "string":
+            return Literal(tok.text[1:-1])
+        if tok.kind == "path":
+            keys = tuple(key.replace("[]", "") for key in tok.text.split(".")[1:])
+            arrays = [i for i, key in enumerate(tok.text.split(".")[1:]) if key.endswith("[]")]
+            if len(arrays) > 1:
+                raise ExpressionError("only one '[]' per JSON path is supported", tok.pos)
+            return JsonPath(keys, arrays[0] if arrays else None)
+        if tok.kind == "ident":
+            word = tok.text.upper()
+            if word in ("TRUE", "FALSE"):
+                return Literal(word.capitalize())
+            if word in KEYWORDS:
+                raise ExpressionError(f"unexpected keyword {word}", tok.pos)
+            name = tok.text.lower()
+            if name not in COLUMN_SCHEMA:
+                raise ExpressionError(
+                    f"unknown column '{tok.text}'; expected one of {sorted(COLUMN_SCHEMA)}", tok.pos
+                )
+            return Column(name)
+        if tok.kind == "op" and tok.text == "(":
+            node = self.expr()
+            self.expect_op(")")
+            return node
+        raise ExpressionError(f"unexpected {self._describe(tok)}", tok.pos)
+
+
+# ─── SELECTIVITY ───────────────────────────────────────────────────────────────
+
+class SelectivityStats:
+    """Observed pass rate of each sub-condition, keyed by its canonical text."""
+
+    MAX_ENTRIES = 4096
+
+    def __init__(self):
+        self._counts: Dict[str, List[int]] = {}
+
+    def record(self, node, mask) -> None:
+        key = str(node)
+        counts = self._counts.get(key)
+        if counts is None:
+            if len(self._counts) >= self.MAX_ENTRIES:
+                self._counts.clear()
+            counts = self._counts[key] = [0, 0]
+        counts[0] += int(mask.size)
+        counts[1] += int(mask.sum())
+
+    def pass_rate(self, node) -> float:
+        counts = self._counts.get(str(node))
+        if not counts or not counts[0]:
+            return 0.5
+        return counts[1] / counts[0]
+
+    def order(self, items, conjunction: bool) -> list:
+        """AND: most often false first. OR: most often true first. Ties keep authored order."""
+        if conjunction:
+            return sorted(items, key=self.pass_rate)
+        return sorted(items, key=lambda node: -self.pass_rate(node))
+
+
+selectivity = SelectivityStats()
+
+
+# ─── NUMPY COMPILATION ─────────────────────────────────────────────────────────
+
+def _values(node, store, rows, elements=None):
+    import numpy as np
+
+    if isinstance(node, Column):
+        return store.take(node.name, rows)
+    if isinstance(node, JsonPath):
+        return elements
+    if isinstance(node, Literal):
+        return node.value
+    if isinstance(node, Negate):
+        return -_values(node.operand, store, rows, elements)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return _ARITH[node.op](_values(node.left, store, rows, elements), _values(node.right, store, rows, elements))
+
+
+def _as_mask(result, size: int):
+    import numpy as np
+
+    if np.ndim(result) == 0:
+        return np.full(size, bool(result))
+    return np.asarray(result, dtype=bool)
+
+
+def _predicate(node, store, rows, size: int, elements=None):
+    """Mask for a single comparison; `elements` stands in for its JSON path, if any."""
+    import numpy as np
+
+    def values(n):
+        return _values(n, store, rows, elements)
+
+    if isinstance(node, Compare):
+        return _as_mask(OPS[node.op](values(node.left), values(node.right)), size)
+
+    if isinstance(node, Between):
+        value = values(node.operand)
+        mask = _as_mask((value >= values(node.low)) & (value <= values(node.high)), size)
+        return ~mask if node.negated else mask
+
+    value = values(node.operand)
+    mask = np.zeros(size, dtype=bool)
+    for candidate in node.values:
+        mask |= _as_mask(value == candidate.value, size)
+    return ~mask if node.negated else mask
+
+
+def _path_predicate(node, path: JsonPath, store, rows, size: int):
+    """A row satisfies a JSON-path comparison when every element its path selects does."""
+    import numpy as np
+
+    parents, elements = store.json_elements(path, text=_path_kind(node) == _STR)
+    if rows is None:
+        positions = parents
+    else:
+        position_of = np.full(store.size, -1)
+        position_of[rows] = np.arange(size)
+        keep = position_of[parents] >= 0
+        parents, elements = parents[keep], elements[keep]
+        positions = position_of[parents]
+
+    # Row columns on the other side are read at each element's parent row
+    ok = _predicate(node, store, parents, len(parents), elements)
+    out = np.ones(size, dtype=bool)
+    out[positions[~ok]] = False
+    return out
+
+
+def _mask(node, store, rows, stats: SelectivityStats):
+    """Boolean mask of rows (all rows when `rows` is None) satisfying `node`."""
+    import numpy as np
+
+    size = store.size if rows is None else len(rows)
+
+    if isinstance(node, (Compare, Between, InList)):
+        path = _predicate_path(node)
+        if path is not None:
+            return _path_predicate(node, path, store, rows, size)
+        return _predicate(node, store, rows, size)
+
+    if isinstance(node, Not):
+        return ~_mask(node.operand, store, rows, stats)
+
+    # AND / OR: each child only sees the rows the previous ones left undecided
+    conjunction = isinstance(node, And)
+    out = np.zeros(size, dtype=bool)
+    pending = None  # positions (into `rows`) still undecided; None means all
+    for child in stats.order(node.items, conjunction):
+        child_rows = rows if pending is None else (pending if rows is None else rows[pending])
+        mask = _mask(child, store, child_rows, stats)
+        stats.record(child, mask)
+        positions = np.arange(size) if pending is None else pending
+        if conjunction:
+            pending = positions[mask]
+        else:
+            out[positions[mask]] = True
+            pending = positions[~mask]
+        if pending.size == 0:
+            break
+    if conjunction:
+        out[pending] = True
+    return out
+
+
+# ─── CLOSURE COMPILATION ───────────────────────────────────────────────────────
+# Same semantics as the masks: numbers compare as floats, text as stripped
+# strings and JSON paths skip missing values. Records with a zero divisor are
+# skipped by violates() before any closure runs.
+
+def _scalar(value, kind: str):
+    """A record value as the masks would see it, or None when missing / unusable."""
+    if value is None:
+        return None
+    if kind == _STR:
+        return str(value).strip()
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def _divide(a: float, b: float) -> float:
+    return a / b if b else math.nan
+
+
+def _value_fn(node):
+    """Closure (record, element) -> value; `element` stands in for a JSON path."""
+    if isinstance(node, Column):
+        name, kind = node.name, _kind(node)
+        return lambda record, element: _scalar(getattr(record, name, None), kind)
+    if isinstance(node, JsonPath):
+        return lambda record, element: element
+    if isinstance(node, Literal):
+        value = node.value
+        return lambda record, element: value
+    if isinstance(node, Negate):
+        operand = _value_fn(node.operand)
+        return lambda record, element: -operand(record, element)
+    left, right = _value_fn(node.left), _value_fn(node.right)
+    op = _divide if node.op == "/" else _ARITH[node.op]
+    return lambda record, element: op(left(record, element), right(record, element))
+
+
+def _predicate_fn(node):
+    """Closure (record, element) -> bool for a single comparison."""
+    if isinstance(node, Compare):
+        left, right, op = _value_fn(node.left), _value_fn(node.right), OPS[node.op]
+        return lambda record, element: op(left(record, element), right(record, element))
+    if isinstance(node, Between):
+        value, low, high = _value_fn(node.operand), _value_fn(node.low), _value_fn(node.high)
+        negated = node.negated
+        return lambda record, element: (
+            low(record, element) <= value(record, element) <= high(record, element)
+        ) != negated
+    value, candidates, negated = _value_fn(node.operand), {v.value for v in node.values}, node.negated
+    return lambda record, element: (value(record, element) in candidates) != negated
+
+
+def _check_fn(node):
+    """Closure record -> bool: does the record satisfy `node`?"""
+    if isinstance(node, (Compare, Between, InList)):
+        predicate = _predicate_fn(node)
+        path = _predicate_path(node)
+        if path is None:
+            return lambda record: predicate(record, None)
+        text = _path_kind(node) == _STR
+
+        def every_element(record):
+            for value in json_path_values(getattr(record, "data", None), path):
+                value = json_element(value, text)
+                if value is not None and not predicate(record, value):
+                    return False
+            return True
+        return every_element
+    if isinstance(node, Not):
+        operand = _check_fn(node.operand)
+        return lambda record: not operand(record)
+    items = [_check_fn(item) for item in node.items]
+    if isinstance(node, And):
+        return lambda record: all(item(record) for item in items)
+    return lambda record: any(item(record) for item in items)
+
+
+# ─── SQL COMPILATION ───────────────────────────────────────────────────────────
+
+def _is_boolean_column(node) -> bool:
+    return isinstance(node, Column) and isinstance(getattr(Employee, node.name).type, Boolean)
+
+
+def _sql_literal(node, against, paths: Optional[dict] = None):
+    """String flags ('True' / 'False') are stored as booleans in the employees table."""
+    if _is_boolean_column(against) and isinstance(node, Literal) and isinstance(node.value, str):
+        return true() if node.value.lower() == "true" else false()
+    return _sql(node, paths)
+
+
+_JSON_TYPES = {_NUM: ["integer", "real"], _STR: ["text"]}
+
+
+def _sql_path_predicate(node, path: JsonPath):
+    """JSON-path comparison as json_extract (scalar) or NOT EXISTS over json_each (array)."""
+    json_types = _JSON_TYPES[_path_kind(node)]
+
+    if path.array_at is None:
+        pointer = _json_pointer(path.keys)
+        value = func.json_extract(Employee.data, pointer)
+        json_type = func.coalesce(func.json_type(Employee.data, pointer), "null")
+        return or_(json_type.not_in(json_types), _sql(node, {path: value}))
+
+    pointer = _json_pointer(path.array_keys)
+    elements = func.json_each(Employee.data, pointer).table_valued("value", "type", name="je")
+    if path.element_keys:
+        element_pointer = _json_pointer(path.element_keys)
+        value = func.json_extract(elements.c.value, element_pointer)
+        json_type = func.json_type(elements.c.value, element_pointer)
+    else:
+        value, json_type = elements.c.value, elements.c.type
+    failing = (
+        select(literal(1))
+        .select_from(elements)
+        .where(
+            func.json_type(Employee.data, pointer) == "array",
+            json_type.in_(json_types),
+            not_(_sql(node, {path: value})),
+        )
+    )
+    return ~exists(failing)
+
+
+def _sql(node, paths: Optional[dict] = None):
+    if isinstance(node, Column):
+        return getattr(Employee, node.name)
+    if isinstance(node, JsonPath):
+        return paths[node]
+    if paths is None and isinstance(node, (Compare, Between, InList)):
+        path = _predicate_path(node)
+        if path is not None:
+            return _sql_path_predicate(node, path)
+    if isinstance(node, Literal):
+        return literal(node.value)
+    if isinstance(node, Negate):
+        return -_sql(node.operand, paths)
+    if isinstance(node, Arith):
+        return _ARITH[node.op](_sql(node.left, paths), _sql(node.right, paths))
+    if isinstance(node, Compare):
+        return OPS[node.op](_sql_literal(node.left, node.right, paths), _sql_literal(node.right, node.left, paths))
+    if isinstance(node, Between):
+        clause = _sql(node.operand, paths).between(_sql(node.low, paths), _sql(node.high, paths))
+        return not_(clause) if node.negated else clause
+    if isinstance(node, InList):
+        operand = _sql(node.operand, paths)
+        values = [_sql_literal(v, node.operand, paths) for v in node.values]
+        return operand.not_in(values) if node.negated else operand.in_(values)
+    if isinstance(node, Not):
+        return not_(_sql(node.operand))
+    if isinstance(node, And):
+        return and_(*[_sql(i) for i in node.items])
+    return or_(*[_sql(i) for i in node.items])
+
+
+# ─── PUBLIC API ────────────────────────────────────────────────────────────────
+
+class CompiledExpression:
+    def __init__(self, node, source: Optional[str] = None):
+        self.node = node
+        self.source = source if source is not None else str(node)
+        self.columns: Tuple[str, ...] = tuple(c.name for c in _columns(node))
+        self.paths: Tuple[JsonPath, ...] = tuple(_columns(node, cls=JsonPath))
+        self._column_kinds = tuple((c.name, _kind(c)) for c in _columns(node))
+        self._divisors = tuple(_divisors(node))
+        self._check = None
+        self._divisor_fns = ()
+
+    def __str__(self):
+        return str(self.node)
+
+    def violating_rows(self, store, stats: SelectivityStats = selectivity) -> List[int]:
+        """Indices (into the store) of employees that do not satisfy the expression."""
+        import numpy as np
+
+        valid = store.valid(self.columns)
+        rows = None if valid.all() else np.flatnonzero(valid)
+        for divisor in self._divisors:
+            size = store.size if rows is None else len(rows)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                nonzero = _as_mask(_values(divisor, store, rows) != 0, size)
+            if not nonzero.all():
+                rows = np.flatnonzero(nonzero) if rows is None else rows[nonzero]
+        satisfied = _mask(self.node, store, rows, stats)
+        if rows is None:
+            return np.flatnonzero(~satisfied).tolist()
+        return rows[~satisfied].tolist()
+
+    def violates(self, record) -> bool:
+        """Check a single record (an Employee or anything with the same attributes)."""
+        for name, kind in self._column_kinds:
+            if _scalar(getattr(record, name, None), kind) is None:
+                return False
+        if self._check is None:
+            self._divisor_fns = tuple(_value_fn(d) for d in self._divisors)
+            self._check = _check_fn(self.node)
+        for divisor in self._divisor_fns:
+            if divisor(record, None) == 0:
+                return False
+        return not self._check(record)
+
+    def violation_sql(self):
+        """SQLAlchemy predicate over Employee matching the same violators."""
+        present = [getattr(Employee, c).isnot(None) for c in self.columns]
+        nonzero = [_sql(d) != 0 for d in self._divisors]
+        return and_(*present, *nonzero, not_(_sql(self.node)))
+
+    def observed(self, employee) -> str:
+        """The referenced values of one record, e.g. 'working_days=17, data.level=3'."""
+        observed = [f"{c}={getattr(employee, c, None)}" for c in self.columns]
+        for path in self.paths:
+            values = json_path_values(getattr(employee, "data", None), path)
+            if path.array_at is None:
+                observed.append(f"{path}={values[0] if values else None}")
+            else:
+                shown = ", ".join(str(v) for v in values[:DESCRIBE_MAX_ELEMENTS])
+                more = ", …" if len(values) > DESCRIBE_MAX_ELEMENTS else ""
+                observed.append(f"{path}=[{shown}{more}]")
+        return ", ".join(observed)
+
+    def describe(self, employee) -> str:
+        return self.describe_observed(self.observed(employee))
+
+    def describe_observed(self, observed: str) -> str:
+        return f"{observed} does not satisfy {self}"
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(source: str) -> CompiledExpression:
+    """Parse and type-check a rule expression. Raises ExpressionError."""
+    source = (source or "").strip()
+    if not source:
+        raise ExpressionError("expression is empty", 0)
+    if len(source) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionError(f"expression is longer than {MAX_EXPRESSION_LENGTH} characters")
+    return CompiledExpression(_Parser(source).parse(), source)
+
+
+def rule_source(rule) -> Optional[str]:
+    """Expression text of a rule: its expression, or a JSON-path field with its condition."""
+    if rule.expression:
+        return rule.expression
+    if (rule.field or "").startswith("data.") and rule.condition:
+        return f"{rule.field} {rule.condition}"
+    return None
+
+
+def compile_condition(norm: dict) -> CompiledExpression:
+    """Lift a normalized single-condition rule (see normalize_rule) into the same AST."""
+    if norm["ref_col"]:
+        right = Column(norm["ref_col"])
+    elif isinstance(norm["typed_value"], str):
+        right = Literal(norm["typed_value"])
+    else:
+        right = Literal(float(norm["typed_value"]))
+    return CompiledExpression(Compare(norm["op"], Column(norm["field"]), right))
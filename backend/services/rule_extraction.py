@@ -0,0 +1,100 @@
+"""
+rule_extraction.py — Streaming Two-Tier Rule Extraction
+========================================================
+Turns an uploaded policy PDF into (extracted_text, rules) page by page.
+
+- Pages are parsed in a worker thread, one at a time, so the event loop keeps
+  serving other requests while pdfplumber works through a large document.
+- Tier 1 (Gemini) only ever sees the first MAX_PROMPT_CHARS characters, so the
+  request is fired as soon as that much text has arrived; the remaining pages
+  are parsed while the model is thinking.
+- Tier 2 (regex) runs incrementally on each page when Gemini is not configured,
+  and otherwise only after Gemini has failed or returned nothing.
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional
+
+from services.pdf_extractor import iter_pdf_pages
+from services.regex_rule_extractor import iter_rules_from_pages
+from services import gemini_service
+
+
+@dataclass
+class PolicyExtraction:
+    text: str
+    rules: List[Dict[str, Any]] = field(default_factory=list)
+    tier: str = "regex"   # "gemini" or "regex"
+
+
+async def extract_policy_rules(pdf_bytes: bytes) -> PolicyExtraction:
+    """
+    Extract policy text and rules from PDF bytes.
+    Returns a PolicyExtraction whose text is empty when the PDF had no text.
+    """
+    use_gemini = gemini_service.is_configured()
+
+    pages: List[str] = []
+    regex_rules: List[Dict[str, Any]] = []
+    seen_fields: set = set()
+    gemini_task: Optional[asyncio.Task] = None
+    chars = 0
+
+    page_iter = iter_pdf_pages(pdf_bytes)
+    while (page := await asyncio.to_thread(next, page_iter, None)) is not None:
+        pages.append(page)
+        chars += len(page) + 1
+
+        if not use_gemini:
+            regex_rules.extend(iter_rules_from_pages([page], seen_fields))
+        elif gemini_task is None and chars >= gemini_service.MAX_PROMPT_CHARS:
+            gemini_task = asyncio.create_task(
+                gemini_service.generate_rules_from_text("\n".join(pages))
+            )
+
+    text = "\n".join(pages).strip()
+    if not text:
+        if gemini_task is not None:
+            gemini_task.cancel()
+        return PolicyExtraction(text="")
+
+    if not use_gemini:
+        print(f"[extract] Gemini not configured, regex extracted {len(regex_rules)} rules.")
+        return PolicyExtraction(text=text, rules=regex_rules, tier="regex")
+
+    if gemini_task is None:
+        gemini_task = asyncio.create_task(gemini_service.generate_rules_from_text(text))
+    return await _finish_extraction(text, pages, gemini_task)
+
+
+async def extract_rules_from_pages(pages: List[str]) -> PolicyExtraction:
+    """
+    Same tiers as extract_policy_rules for text that has already been parsed
+    (e.g. in a worker process by a batch upload).
+    """
+    text = "\n".join(pages).strip()
+    if not text:
+        return PolicyExtraction(text="")
+    if not gemini_service.is_configured():
+        regex_rules = list(iter_rules_from_pages(pages))
+        print(f"[extract] Gemini not configured, regex extracted {len(regex_rules)} rules.")
+        return PolicyExtraction(text=text, rules=regex_rules, tier="regex")
+    return await _finish_extraction(
+        text, pages, asyncio.create_task(gemini_service.generate_rules_from_text(text))
+    )
+
+
+async def _finish_extraction(text: str, pages: List[str], gemini_task: asyncio.Task) -> PolicyExtraction:
+    try:
+        ai_rules = await gemini_task
+        if ai_rules:
+            print(f"[extract] Gemini extracted {len(ai_rules)} rules (Tier 1 used).")
+            return PolicyExtraction(text=text, rules=ai_rules, tier="gemini")
+    except Exception as e:
+        print(f"[extract] Gemini unavailable ({type(e).__name__}: {e}), using regex fallback.")
+
+    # Tier 2 — only reached when Tier 1 produced nothing usable
+    regex_rules = list(iter_rules_from_pages(pages))
+    print(f"[extract] Regex fallback: {len(regex_rules)} rules")
+    return PolicyExtraction(text=text, rules=regex_rules, tier="regex")
@@ -0,0 +1,213 @@
+"""
+scan_service.py — Compliance Scan Runner
+=========================================
+Shared by the scan trigger and the pipelined run endpoint: loads the active
+rules and employees of one workspace, evaluates them, and builds the ScanLog
+entry that is written to the control database.
+
+Scans are content-versioned. A scan's inputs are the active rule set (a
+digest of every active rule's id and definition) and the workspace data (the
+"employees" and "violations" generations of query_cache). Evaluation only
+ever adds the pairs that are missing, so a scan over unchanged inputs cannot
+find anything new. Such a repeat returns the cached summary of the scan that
+last ran on those inputs without loading employees. Any change to either input
+misses the cache and scans as before.
+"""
+
+import hashlib
+import secrets
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import Employee, Rule, Violation, Policy, ScanLog
+from services.compliance_engine import evaluate_employees_against_rules
+from services.query_cache import query_cache
+
+
+DEFAULT_DATASET_FILENAME = "Policy_Compliance_Dataset_Updated.csv"
+SCAN_CACHE_MAX_ENTRIES = 256
+DATA_TOPICS = ("employees", "violations")
+
+
+@dataclass
+class ScanResult:
+    new_violations: List[Violation] = field(default_factory=list)
+    employee_count: int = 0
+    total_violations: int = 0
+    policy_filename: str = "Unknown Policy"
+    scan_id: str = field(default_factory=lambda: secrets.token_hex(4))
+    violations_by_policy: Dict[int, int] = field(default_factory=dict)  # new violations per policy id
+    ran: bool = False  # False when there were no active rules or no employees
+    cached: bool = False  # inputs unchanged since cached_scan_id; nothing was evaluated
+    cached_scan_id: Optional[str] = None
+    violation_ids: List[int] = field(default_factory=list)  # violations added by cached_scan_id (or this scan)
+    rule_digest: Optional[str] = None
+    duration_ms: float = 0.0
+
+
+@dataclass
+class _CachedScan:
+    scan_id: str
+    employee_count: int
+    total_violations: int
+    policy_filename: str
+    violation_ids: List[int]
+
+
+# (workspace, employee_id) -> ((rule digest, data generations), summary)
+_scan_cache: "OrderedDict[tuple, Tuple[tuple, _CachedScan]]" = OrderedDict()
+
+
+def _ms(since: float) -> float:
+    return round((time.perf_counter() - since) * 1000, 1)
+
+
+def rule_set_digest(rules: List[Rule]) -> str:
+    h = hashlib.sha256()
+    for rule in sorted(rules, key=lambda r: r.id):
+        h.update(repr((rule.id, rule.field, rule.condition, rule.expression, rule.severity)).encode())
+    return h.hexdigest()[:16]
+
+
+def _cache_lookup(key: tuple, version: tuple) -> Optional[_CachedScan]:
+    entry = _scan_cache.get(key)
+    if entry is None or entry[0] != version:
+        return None
+    _scan_cache.move_to_end(key)
+    return entry[1]
+
+
+def _cache_store(key: tuple, version: tuple, summary: _CachedScan) -> None:
+    _scan_cache[key] = (version, summary)
+    _scan_cache.move_to_end(key)
+    while len(_scan_cache) > SCAN_CACHE_MAX_ENTRIES:
+        _scan_cache.popitem(last=False)
+
+
+async def run_scan(
+    db: AsyncSession,
+    employee_id: Optional[int] = None,
+    commit: bool = True,
+    mode: str = "standard",
+    workspace: Optional[str] = None,
+) -> ScanResult:
+    """
+    Evaluate the workspace's employees against its active rules.
+    With commit=False new violations are only flushed, leaving the
+    transaction to the caller. New violations carry the scan's id.
+    mode="fused" evaluates threshold rules per field instead of per rule.
+
+    Given its workspace key, a committed scan is cached: a repeat over the
+    same rules and data returns the earlier summary (cached=True), and new
+    violations invalidate the workspace's "violations" topic here.
+    """
+    t0 = time.perf_counter()
+    scan_id = secrets.token_hex(4)
+    # 1. Fetch active rules
+    rules_result = await db.execute(select(Rule).filter(Rule.is_active == True))
+    active_rules = rules_result.scalars().all()
+
+    if not active_rules:
+        return ScanResult()
+
+    digest = rule_set_digest(active_rules)
+    use_cache = workspace is not None and commit
+    cache_key = (workspace, employee_id)
+    data_version = query_cache.generations(workspace, DATA_TOPICS) if use_cache else None
+    if use_cache:
+        hit = _cache_lookup(cache_key, (digest, data_version))
+        if hit is not None:
+            print(f"[scan] Rules and data unchanged since scan {hit.scan_id}; returning its result.")
+            return ScanResult(
+                employee_count=hit.employee_count,
+                total_violations=hit.total_violations,
+                policy_filename=hit.policy_filename,
+                scan_id=scan_id,
+                ran=True,
+                cached=True,
+                cached_scan_id=hit.scan_id,
+                violation_ids=list(hit.violation_ids),
+                rule_digest=digest,
+                duration_ms=_ms(t0),
+            )
+
+    # 2. Fetch employees to scan
+    employees_query = select(Employee)
+    if employee_id:
+        employees_query = employees_query.filter(Employee.id == employee_id)
+
+    employees_result = await db.execute(employees_query)
+    employees_to_scan = employees_result.scalars().all()
+
+    if not employees_to_scan:
+        return ScanResult()
+
+    # 3. Evaluate
+    new_violations = await evaluate_employees_against_rules(
+        db, active_rules, employees_to_scan, scan_id, fused=(mode == "fused"),
+    )
+    violations_by_policy = Counter(v.rule.policy_id for v in new_violations)
+
+    # Sessions keep objects loaded across commits and ids come back from the
+    # INSERT, so the new rows are returned as they are — no per-row refresh
+    if new_violations:
+        if commit:
+            await db.commit()
+        else:
+            await db.flush()
+
+    # 4. Count total violations for this scan
+    total_violations = (await db.execute(select(func.count(Violation.id)))).scalar_one()
+
+    # 5. Fetch policy filename for the log
+    policy_result = await db.execute(select(Policy).order_by(Policy.id.desc()).limit(1))
+    latest_policy = policy_result.scalars().first()
+
+    result = ScanResult(
+        new_violations=new_violations,
+        employee_count=len(employees_to_scan),
+        total_violations=total_violations,
+        policy_filename=latest_policy.filename if latest_policy else "Unknown Policy",
+        scan_id=scan_id,
+        violations_by_policy=dict(violations_by_policy),
+        ran=True,
+        violation_ids=[v.id for v in new_violations],
+        rule_digest=digest,
+        duration_ms=_ms(t0),
+    )
+
+    if use_cache:
+        # Only cache when no other write touched the data while this scan ran;
+        # nothing awaits between this check, the invalidation and the store
+        unchanged = query_cache.generations(workspace, DATA_TOPICS) == data_version
+        if new_violations:
+            query_cache.invalidate(workspace, "violations")
+        if unchanged:
+            _cache_store(cache_key, (digest, query_cache.generations(workspace, DATA_TOPICS)), _CachedScan(
+                scan_id, result.employee_count, total_violations, result.policy_filename, result.violation_ids,
+            ))
+    return result
+
+
+def build_scan_log(
+    result: ScanResult,
+    user_id: Optional[int],
+    dataset_filename: str = DEFAULT_DATASET_FILENAME,
+    trigger_type: str = "manual",
+) -> ScanLog:
+    return ScanLog(
+        user_id=user_id,
+        scan_id=result.scan_id,
+        policy_filename=result.policy_filename,
+        dataset_filename=dataset_filename,
+        violation_count=result.total_violations,
+        employee_count=result.employee_count,
+        trigger_type=trigger_type,
+        duration_ms=result.duration_ms,
+        cached_from=result.cached_scan_id,
+    )
@@ -0,0 +1,335 @@
+"""
+scheduler.py — Recurring Scans
+===============================
+Runs scans on cron schedules stored in the control database (ScanSchedule),
+inside the API process, without competing for the workspaces' single writer.
+
+- CRON      : five fields (minute hour day-of-month month day-of-week) with
+              `*`, lists, ranges and steps, or @hourly / @daily / @nightly /
+              @weekly / @monthly. Times are UTC like every other timestamp.
+- CLAIM     : every SCHEDULER_TICK_SECONDS, due schedules are claimed by moving
+              next_run_at forward with a conditional UPDATE. Only one process
+              wins a claim, and a schedule that missed several slots (server
+              down) fires once, not once per missed slot.
+- COALESCE  : runs are queued per workspace. A run due while the same workspace
+              is already queued merges into it; while it is running, at most
+              one follow-up is kept. Manual runs (POST /api/schedules/{id}/run)
+              go through the same queue, and ad-hoc scans (POST /api/scan/trigger,
+              /api/scan/run) hold the same per-workspace slot through
+              workspace_scan(), so no two scans of one workspace overlap.
+- CAP       : at most SCHEDULER_MAX_CONCURRENT_SCANS scans run at once across
+              all workspaces.
+- NO-OP     : scans go through run_scan's content-versioned cache. When
+              neither the rules nor the data changed since the last scan the
+              run is recorded on the schedule as "unchanged" and nothing is
+              evaluated. Every run that found data writes a ScanLog with its
+              trigger_type ("scheduled", or "manual" when a manual run was
+              queued) and duration; an unchanged run's log names the scan it
+              reused in cached_from.
+"""
+
+import asyncio
+import calendar
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, update
+
+from config import settings
+from database import AsyncSessionLocal, get_workspace, workspace_key
+from models.models import ScanSchedule
+from services.scan_service import build_scan_log, run_scan
+
+
+# ─── Cron ──────────────────────────────────────────────────────────────────────
+
+class CronError(ValueError):
+    pass
+
+
+CRON_MACROS = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@nightly": "0 2 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+# (name, low, high) of each field; day-of-week 7 is Sunday too
+_FIELDS = (("minute", 0, 59), ("hour", 0, 23), ("day of month", 1, 31), ("month", 1, 12), ("day of week", 0, 7))
+MAX_SEARCH_STEPS = 5000
+
+
+def _parse_field(text: str, name: str, low: int, high: int) -> frozenset:
+    values = set()
+    for part in text.split(","):
+        body, _, step = part.partition("/")
+        try:
+            step = int(step) if step else 1
+            if body == "*":
+                start, stop = low, high
+            elif "-" in body:
+                start, stop = (int(x) for x in body.split("-", 1))
+            else:
+                start = int(body)
+                stop = high if step > 1 else start
+        except ValueError:
+            raise CronError(f"invalid {name} '{part}'")
+        if step < 1 or not (low <= start <= stop <= high):
+            raise CronError(f"{name} '{part}' is outside {low}-{high}")
+        values.update(range(start, stop + 1, step))
+    return frozenset(values)
+
+
+@dataclass(frozen=True)
+class CronSchedule:
+    minutes: frozenset
+    hours: frozenset
+    days: frozenset
+    months: frozenset
+    weekdays: frozenset          # 0 = Sunday
+    any_day: bool                # day-of-month is `*`
+    any_weekday: bool            # day-of-week is `*`
+
+    @classmethod
+    def parse(cls, expression: str) -> "CronSchedule":
+        text = CRON_MACROS.get(expression.strip().lower(), expression.strip())
+        parts = text.split()
+        if len(parts) != 5:
+            raise CronError("a cron expression has five fields: minute hour day-of-month month day-of-week")
+        fields = [_parse_field(p, *spec) for p, spec in zip(parts, _FIELDS)]
+        weekdays = frozenset(d % 7 for d in fields[4])
+        return cls(*fields[:4], weekdays, parts[2] == "*", parts[4] == "*")
+
+    def _day_matches(self, t: datetime) -> bool:
+        in_month = t.day in self.days
+        in_week = (t.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_month and in_week
+        return in_month or in_week   # cron: either restricted day field matches
+
+    def next_after(self, after: datetime) -> datetime:
+        """First matching minute strictly after `after`."""
+        t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        for _ in range(MAX_SEARCH_STEPS):
+            if t.month not in self.months:
+                days = calendar.monthrange(t.year, t.month)[1] - t.day + 1
+                t = (t + timedelta(days=days)).replace(hour=0, minute=0)
+            elif not self._day_matches(t):
+                t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+            elif t.hour not in self.hours:
+                t = (t + timedelta(hours=1)).replace(minute=0)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise CronError("the expression never matches")
+
+
+def next_run(expression: str, after: Optional[datetime] = None) -> datetime:
+    return CronSchedule.parse(expression).next_after(after or datetime.utcnow())
+
+
+# ─── Queue ─────────────────────────────────────────────────────────────────────
+
+@dataclass
+class ScheduledRun:
+    workspace: str
+    user_id: Optional[int]
+    schedule_ids: List[int]
+    mode: str = "standard"
+    trigger: str = "scheduled"    # or "manual" / "pipeline" for ad-hoc scans
+    queued_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    coalesced: int = 0            # further requests merged into this run
+    status: Optional[str] = None
+    scan_id: Optional[str] = None
+    ms: Optional[float] = None
+
+
+_queued: Dict[str, ScheduledRun] = {}       # workspace -> run waiting to start
+_running: Dict[str, ScheduledRun] = {}      # workspace -> run in progress
+_tasks: set = set()
+_recent: deque = deque(maxlen=50)
+_semaphore: Optional[asyncio.Semaphore] = None
+_loop_task: Optional[asyncio.Task] = None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.SCHEDULER_MAX_CONCURRENT_SCANS)
+    return _semaphore
+
+
+def enqueue(
+    schedule_id: int, user_id: Optional[int], mode: str = "standard", trigger: str = "scheduled",
+) -> Dict[str, Any]:
+    """Queue a scan of the user's workspace, merging into one already waiting."""
+    workspace = workspace_key(user_id)
+    pending = _queued.get(workspace)
+    if pending is not None:
+        pending.coalesced += 1
+        if schedule_id not in pending.schedule_ids:
+            pending.schedule_ids.append(schedule_id)
+        if mode == "fused":
+            pending.mode = mode
+        if trigger == "manual":
+            pending.trigger = trigger
+        return {"workspace": workspace, "coalesced": True}
+
+    run = ScheduledRun(workspace, user_id, [schedule_id], mode, trigger=trigger)
+    _queued[workspace] = run
+    task = asyncio.create_task(_execute(run))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return {"workspace": workspace, "coalesced": False}
+
+
+async def _wait_for_workspace(workspace: str) -> None:
+    while workspace in _running:
+        await asyncio.sleep(0.2)
+
+
+async def _execute(run: ScheduledRun) -> None:
+    # A follow-up waits for the workspace's current run to finish, then for a slot
+    await _wait_for_workspace(run.workspace)
+    async with _get_semaphore():
+        await _wait_for_workspace(run.workspace)
+        _queued.pop(run.workspace, None)
+        _running[run.workspace] = run
+        t0 = time.perf_counter()
+        try:
+            await _scan(run)
+        except Exception as e:
+            run.status = f"failed: {type(e).__name__}: {e}"
+            print(f"[scheduler] {run.workspace}: {run.status}")
+        finally:
+            run.ms = round((time.perf_counter() - t0) * 1000, 1)
+            _running.pop(run.workspace, None)
+            _recent.append(run)
+            await _record(run)
+
+
+@asynccontextmanager
+async def workspace_scan(workspace: str, user_id: Optional[int], trigger: str, mode: str = "standard"):
+    """
+    Hold the workspace's scan slot for an ad-hoc scan: waits for a scheduled
+    (or other ad-hoc) scan of the workspace to finish, and keeps scheduled
+    runs of it waiting until the body is done. Not counted against the cap.
+    """
+    await _wait_for_workspace(workspace)
+    run = ScheduledRun(workspace, user_id, [], mode, trigger=trigger)
+    _running[workspace] = run
+    t0 = time.perf_counter()
+    try:
+        yield run
+    finally:
+        run.ms = round((time.perf_counter() - t0) * 1000, 1)
+        _running.pop(workspace, None)
+
+
+async def _scan(run: ScheduledRun) -> None:
+    ws = await get_workspace(run.workspace)
+    async with ws.sessionmaker() as db:
+        result = await run_scan(db, mode=run.mode, workspace=run.workspace)
+    run.scan_id = result.scan_id
+    if not result.ran:
+        run.status = "no data"
+        return
+    if result.cached:
+        run.status = "unchanged"
+        run.scan_id = result.cached_scan_id
+    else:
+        run.status = "scanned"
+        print(f"[scheduler] {run.workspace}: {len(result.new_violations)} new violations "
+              f"in {result.duration_ms} ms")
+    async with AsyncSessionLocal() as control_db:
+        control_db.add(build_scan_log(result, run.user_id, trigger_type=run.trigger))
+        await control_db.commit()
+
+
+async def _record(run: ScheduledRun) -> None:
+    try:
+        async with AsyncSessionLocal() as control_db:
+            await control_db.execute(
+                update(ScanSchedule)
+                .where(ScanSchedule.id.in_(run.schedule_ids))
+                .values(last_run_at=datetime.utcnow(), last_status=run.status, last_scan_id=run.scan_id)
+            )
+            await control_db.commit()
+    except Exception as e:
+        print(f"[scheduler] could not record run of {run.workspace}: {e}")
+
+
+def status(user_id: Optional[int] = None, all_workspaces: bool = False) -> Dict[str, Any]:
+    workspace = workspace_key(user_id)
+    visible = lambda run: all_workspaces or run.workspace == workspace
+    return {
+        "enabled": settings.SCHEDULER_ENABLED,
+        "max_concurrent_scans": settings.SCHEDULER_MAX_CONCURRENT_SCANS,
+        "running": [asdict(r) for r in _running.values() if visible(r)],
+        "queued": [asdict(r) for r in _queued.values() if visible(r)],
+        "recent": [asdict(r) for r in reversed(_recent) if visible(r)],
+    }
+
+
+# ─── Ticks ─────────────────────────────────────────────────────────────────────
+
+async def tick(now: Optional[datetime] = None) -> int:
+    """Claim and enqueue every due schedule; returns how many were claimed."""
+    now = now or datetime.utcnow()
+    async with AsyncSessionLocal() as control_db:
+        due = (await control_db.execute(
+            select(ScanSchedule).where(ScanSchedule.enabled == True, ScanSchedule.next_run_at <= now)
+        )).scalars().all()
+        claimed = []
+        for schedule in due:
+            try:
+                following = next_run(schedule.cron, now)
+            except CronError as e:  # edited by hand into something invalid
+                following = None
+                print(f"[scheduler] schedule {schedule.id}: {e}; disabling")
+            result = await control_db.execute(
+                update(ScanSchedule)
+                .where(ScanSchedule.id == schedule.id, ScanSchedule.next_run_at == schedule.next_run_at)
+                .values(next_run_at=following, enabled=following is not None)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1 and following is not None:
+                claimed.append(schedule)
+        await control_db.commit()
+
+    for schedule in claimed:
+        enqueue(schedule.id, schedule.user_id, schedule.mode or "standard")
+    return len(claimed)
+
+
+async def _scheduler_loop() -> None:
+    while True:
+        try:
+            await tick()
+        except Exception as e:  # keep the loop alive
+            print(f"[scheduler] tick failed: {e}")
+        await asyncio.sleep(settings.SCHEDULER_TICK_SECONDS)
+
+
+def start() -> None:
+    global _loop_task
+    if _loop_task is None and settings.SCHEDULER_ENABLED:
+        _loop_task = asyncio.create_task(_scheduler_loop())
+
+
+async def stop() -> None:
+    global _loop_task
+    if _loop_task is not None:
+        _loop_task.cancel()
+        try:
+            await _loop_task
+        except asyncio.CancelledError:
+            pass
+        _loop_task = None
+    for task in list(_tasks):
+        task.cancel()
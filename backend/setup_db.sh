@@ -4,27 +4,27 @@ export PYTHONPATH=.
 
 python3 -c "
 import asyncio
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
-from models.models import Rule, Policy, Base
-from database import engine, AsyncSessionLocal
+import models.models
+from models.models import Rule, Policy
+from database import engine, AsyncSessionLocal, ensure_schema
 
 async def setup_test_rules():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-        
+    await ensure_schema(engine)
+
     async with AsyncSessionLocal() as session:
         # Create a dummy policy
-        policy = Policy(filename='test_policy.pdf', extracted_text='Dummy text')
+        policy = Policy(filename='test_policy.pdf', name='test_policy', extracted_text='Dummy text')
         session.add(policy)
         await session.commit()
         await session.refresh(policy)
-        
+
         # Create rules
         rules = [
-            Rule(policy_id=policy.id, category='Working Hours', description='Minimum working days is 20 days per month.', parameters={'min_working_days': 20}),
-            Rule(policy_id=policy.id, category='Sales', description='Sales target must be met.', parameters={}),
-            Rule(policy_id=policy.id, category='Customer Success', description='Customer satisfaction score must be at least 3.', parameters={'min_csat': 3}),
-            Rule(policy_id=policy.id, category='General', description='Employees must adhere to overall company policy compliance.', parameters={})
+            Rule(policy_id=policy.id, description='Minimum working days is 20 days per month.', field='working_days', condition='>= 20', severity='High'),
+            Rule(policy_id=policy.id, description='Sales target must be met.', field='actual_sales', condition='>= target_sales', severity='High'),
+            Rule(policy_id=policy.id, description='Customer satisfaction score must be at least 3.', field='customer_satisfaction_score', condition='>= 3'),
+            Rule(policy_id=policy.id, description='Employees must adhere to overall company policy compliance.', field='policy_compliance', condition=\"== 'Yes'\"),
+            Rule(policy_id=policy.id, description='No single trade may exceed 5000.', field='data.recent_trades[].amount', condition='<= 5000', severity='Critical'),
         ]
         session.add_all(rules)
         await session.commit()
@@ -0,0 +1,96 @@
+"""
+Shared test setup. Settings are read when config is first imported, so the
+environment is pointed at a throwaway data directory before anything from the
+app is. Every `auth` fixture registers a fresh user, which gives each test its
+own workspace file.
+
+Run from backend/:  python -m pytest
+"""
+
+import itertools
+import os
+import random
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = tempfile.mkdtemp(prefix="policyguard-tests-")
+
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DATA_DIR}/control.db"
+os.environ["WORKSPACE_DIR"] = os.path.join(DATA_DIR, "workspaces")
+os.environ["PROFILE_DIR"] = os.path.join(DATA_DIR, "profiles")
+os.environ["GEMINI_API_KEY"] = ""           # rules come from the regex extractor
+os.environ["SCHEDULER_ENABLED"] = "false"
+sys.path.insert(0, BACKEND_DIR)
+
+import pytest
+from fastapi.testclient import TestClient
+
+from models.models import Employee, Rule
+
+POLICY_PDF = os.path.join(BACKEND_DIR, "..", "PolicyGuard", "Global_Policy_V2.pdf")
+
+_users = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def auth(client):
+    """Bearer headers of a new user (and so a new, empty workspace)."""
+    n = next(_users)
+    response = client.post("/api/auth/register", json={
+        "email": f"user{n}@example.com", "username": f"user{n}", "password": "secret",
+    })
+    assert response.status_code == 201, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def policy(client, auth) -> int:
+    """Id of the sample policy uploaded to the `auth` user's workspace (four regex-extracted rules)."""
+    with open(POLICY_PDF, "rb") as pdf:
+        response = client.post("/api/policies/upload", headers=auth,
+                               files={"file": ("Global_Policy_V2.pdf", pdf, "application/pdf")})
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def make_employees(count: int = 300, seed: int = 7) -> list:
+    """Transient employees with gaps (None) in every column, some zero targets and assorted JSON data."""
+    rng = random.Random(seed)
+    maybe = lambda value: None if rng.random() < 0.05 else value
+    employees = []
+    for i in range(1, count + 1):
+        trades = [{"amount": rng.choice([100, 2500, 4999.5, 5000, 7200, "n/a"]), "desk": rng.choice(["fx", "eq"])}
+                  for _ in range(rng.randint(0, 4))]
+        data = {
+            "level": rng.choice([1, 2, 3, "senior", None, True]),
+            "region": rng.choice(["EU", "US", "APAC", 3]),
+            "recent_trades": trades,
+            "tags": rng.choice([["vip"], ["a", "b"], [], [1, 2]]),
+        }
+        employees.append(Employee(
+            id=i,
+            employee_id=f"E{i:04d}",
+            name=f"Employee {i}",
+            working_days=maybe(rng.randint(10, 26)),
+            target_sales=0 if i % 20 == 0 else maybe(rng.randint(5000, 20000)),
+            actual_sales=maybe(rng.randint(4000, 22000)),
+            customer_satisfaction_score=maybe(rng.choice([1, 2, 3, 3.5, 4, 5])),
+            policy_compliance=maybe(rng.choice(["Yes", "No"])),
+            data=None if rng.random() < 0.1 else data,
+        ))
+    return employees
+
+
+def make_rule(rule_id: int, field=None, condition=None, expression=None, severity="Medium", **kw) -> Rule:
+    return Rule(id=rule_id, policy_id=1, description=kw.pop("description", f"rule {rule_id}"),
+                field=field, condition=condition, expression=expression, severity=severity,
+                is_active=kw.pop("is_active", True), **kw)
@@ -0,0 +1,53 @@
+import random
+
+from conftest import make_employees, make_rule
+from services.column_store import ColumnStore
+from services.compliance_engine import compile_rules, normalize_rule, violating_rows
+
+
+def mixed_rules(count: int = 60, seed: int = 11) -> list:
+    """Threshold rules with repeated fields, thresholds and operators, plus the kinds fusion leaves alone."""
+    rng = random.Random(seed)
+    ranges = {"working_days": (8, 28), "target_sales": (4000, 21000), "customer_satisfaction_score": (0, 6)}
+    rules = []
+    for rule_id in range(1, count + 1):
+        field = rng.choice(sorted(ranges))
+        threshold = rng.randint(*ranges[field])
+        rules.append(make_rule(rule_id, field, f"{rng.choice(['<', '<=', '>', '>=', '==', '!='])} {threshold}"))
+    rules += [
+        make_rule(count + 1, "actual_sales", ">= target_sales"),
+        make_rule(count + 2, "policy_compliance", "== 'Yes'"),
+        make_rule(count + 3, expression="working_days >= 20 UNLESS actual_sales >= target_sales * 1.1"),
+        make_rule(count + 4, "data.recent_trades[].amount", "<= 5000"),
+        make_rule(count + 5, "working_days", "is whatever the manager says"),   # skipped
+    ]
+    return rules
+
+
+def rows_by_rule(compiled_rules, store, fused):
+    return {rule.id: sorted(rows) for (rule, _, _), rows in violating_rows(compiled_rules, store, fused=fused)}
+
+
+def test_fused_and_standard_scans_flag_the_same_rows():
+    compiled_rules = compile_rules(mixed_rules(), log=False)
+    store = ColumnStore.from_objects(make_employees())
+
+    standard = rows_by_rule(compiled_rules, store, fused=False)
+    fused = rows_by_rule(compiled_rules, store, fused=True)
+
+    assert len(standard) == len(compiled_rules) == 64
+    assert fused == standard
+    assert any(standard.values())
+
+
+def test_fused_scan_of_a_subset_matches():
+    compiled_rules = compile_rules(mixed_rules(seed=3), log=False)
+    store = ColumnStore.from_objects(make_employees()[::7])
+
+    assert rows_by_rule(compiled_rules, store, fused=True) == rows_by_rule(compiled_rules, store, fused=False)
+
+
+def test_normalize_rule_rewrites_or_rejects_hallucinated_conditions():
+    assert normalize_rule(make_rule(1, "working_days", ">= 20"))["op"] == ">="
+    assert normalize_rule(make_rule(2, "policy_compliance", "== True"))["typed_value"] == "Yes"
+    assert normalize_rule(make_rule(3, "not_a_column", ">= 1")) is None
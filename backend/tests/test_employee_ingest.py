@@ -0,0 +1,137 @@
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from conftest import DATA_DIR
+from database import Base
+from models.models import Employee, JsonPathBuffer, Violation
+from schemas.schemas import EmployeeCreate
+from services.employee_ingest import (
+    MAX_LINE_BYTES, BatchResult, LineTooLong, iter_ndjson_lines, upsert_employees,
+)
+
+
+def lines_of(*chunks):
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        return [item async for item in iter_ndjson_lines(stream())]
+
+    return asyncio.run(collect())
+
+
+def ndjson(*records) -> bytes:
+    return b"\n".join(r if isinstance(r, bytes) else json.dumps(r).encode() for r in records) + b"\n"
+
+
+def employee(n, **fields):
+    """An NDJSON record that complies with the sample policy unless `fields` say otherwise."""
+    return {
+        "employee_id": f"E{n}", "name": f"Employee {n}", "working_days": 22, "target_sales": 1000,
+        "actual_sales": 1000, "customer_satisfaction_score": 5, "policy_compliance": "Yes", **fields,
+    }
+
+
+# ─── Line splitting ────────────────────────────────────────────────────────────
+
+def test_lines_split_across_chunks_keep_their_numbers():
+    assert lines_of(b'{"a"', b': 1}\n\n  \n{"b": 2}\n{"c"', b": 3}") == [
+        (1, b'{"a": 1}'), (4, b'{"b": 2}'), (5, b'{"c": 3}'),
+    ]
+
+
+def test_unterminated_line_longer_than_the_limit_is_rejected():
+    with pytest.raises(LineTooLong) as raised:
+        lines_of(b"{}\n", b"x" * (MAX_LINE_BYTES // 2), b"x" * (MAX_LINE_BYTES // 2 + 1))
+    assert raised.value.line_no == 2
+
+
+# ─── Upserts ───────────────────────────────────────────────────────────────────
+
+def test_batches_are_upserted_with_multi_row_statements():
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{DATA_DIR}/ingest.db")
+        statements = []
+        event.listen(engine.sync_engine, "before_cursor_execute",
+                     lambda conn, cursor, sql, params, context, many: statements.append(sql))
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all,
+                                tables=[Employee.__table__, JsonPathBuffer.__table__, Violation.__table__])
+        rows = [EmployeeCreate(**employee(n, data={"level": n % 3})).model_dump() for n in range(2500)]
+        results = []
+        async with async_sessionmaker(engine)() as db:
+            for _ in range(2):
+                statements.clear()
+                results.append(BatchResult(batch=1, first_line=1, last_line=len(rows)))
+                await upsert_employees(db, rows, results[-1])
+                await db.commit()
+            count = (await db.execute(select(func.count()).select_from(Employee))).scalar()
+        await engine.dispose()
+        upserts = [sql for sql in statements if sql.startswith("INSERT INTO employees")]
+        return results, count, upserts
+
+    (inserted, updated), count, upserts = asyncio.run(run())
+    assert (inserted.inserted, updated.updated, count) == (2500, 2500, 2500)
+    assert len(upserts) == 3
+    assert all(sql.count("), (") >= 499 for sql in upserts)
+
+
+# ─── Endpoint ──────────────────────────────────────────────────────────────────
+
+def test_ingest_upserts_in_batches_and_reports_invalid_lines(client, auth):
+    body = ndjson(
+        employee(1), employee(2, data={"level": 2}), b"{not json", employee(3),
+        {"name": "no id"}, employee(2, working_days=5),
+    )
+    response = client.post("/api/employees/ingest", params={"batch_size": 2}, content=body, headers=auth)
+    assert response.status_code == 200, response.text
+    result = response.json()
+
+    assert result["totals"] == {"received": 6, "inserted": 3, "updated": 1, "invalid": 2, "violations_cleared": 0}
+    assert [(b["first_line"], b["last_line"]) for b in result["batches"]] == [(1, 2), (3, 4), (5, 6)]
+    assert [e["line"] for b in result["batches"] for e in b["errors"]] == [3, 5]
+
+    employees = {e["employee_id"]: e for e in client.get("/api/employees/", headers=auth).json()}
+    assert sorted(employees) == ["E1", "E2", "E3"]
+    assert employees["E2"]["working_days"] == 5
+    assert employees["E2"]["data"] is None
+
+
+def test_reingest_clears_the_updated_employees_violations(client, auth, policy):
+    client.post("/api/employees/ingest", content=ndjson(employee(1, working_days=1), employee(2)), headers=auth)
+    flagged = client.post("/api/scan/trigger", headers=auth).json()
+    assert {v["employee_id"] for v in flagged} == {1}
+
+    response = client.post("/api/employees/ingest", content=ndjson(employee(1)), headers=auth)
+    assert response.json()["totals"]["violations_cleared"] == len(flagged)
+    assert client.get("/api/violations/", headers=auth).json() == []
+
+
+def test_oversized_line_aborts_with_413_after_committing_earlier_batches(client, auth):
+    body = ndjson(employee(1), employee(2)) + b'{"employee_id": "E3", "name": "' + b"x" * MAX_LINE_BYTES
+    response = client.post("/api/employees/ingest", params={"batch_size": 2}, content=body, headers=auth)
+
+    assert response.status_code == 413
+    assert response.json()["totals"]["inserted"] == 2
+    assert "line 3" in response.json()["detail"]
+    assert len(client.get("/api/employees/", headers=auth).json()) == 2
+
+
+def test_json_rules_see_ingested_data(client, auth, policy):
+    rule = client.post("/api/rules/", json={
+        "policy_id": policy, "description": "No trade above 5000",
+        "field": "data.recent_trades[].amount", "condition": "<= 5000", "severity": "High",
+    }, headers=auth).json()
+    client.post("/api/employees/ingest", content=ndjson(
+        employee(1, data={"recent_trades": [{"amount": 100}, {"amount": 7200}]}),
+        employee(2, data={"recent_trades": [{"amount": 4999}]}),
+        employee(3),
+    ), headers=auth)
+
+    flagged = client.post("/api/scan/trigger", headers=auth).json()
+    assert [(v["employee_id"], v["rule_id"]) for v in flagged] == [(1, rule["id"])]
@@ -0,0 +1,75 @@
+from conftest import make_rule
+from services.policy_versioning import diff_rules, policy_family_name
+
+
+def extracted(field, condition, severity="Medium", description=None):
+    return {"field": field, "condition": condition, "severity": severity,
+            "description": description or f"{field} {condition}"}
+
+
+def test_policy_family_name_drops_version_suffix():
+    assert policy_family_name("Global_Policy_V3.pdf") == "Global_Policy"
+
+
+def test_same_rules_are_unchanged_despite_formatting():
+    previous = [make_rule(1, "working_days", ">= 20"), make_rule(2, "policy_compliance", "== 'Yes'")]
+    diff = diff_rules(previous, [extracted("working_days", ">=20.0"), extracted("policy_compliance", '== "Yes"')])
+
+    assert [old.id for old, _ in diff.unchanged] == [1, 2]
+    assert not diff.added and not diff.removed and not diff.changed
+
+
+def test_severity_or_threshold_change_is_changed():
+    previous = [make_rule(1, "working_days", ">= 20"), make_rule(2, "target_sales", ">= 5000")]
+    diff = diff_rules(previous, [extracted("working_days", ">= 20", "High"), extracted("target_sales", ">= 6000")])
+
+    assert [(old.id, new["condition"]) for old, new in diff.changed] == [(1, ">= 20"), (2, ">= 6000")]
+    assert not diff.unchanged
+
+
+def test_duplicate_fields_are_matched_many_to_many():
+    previous = [
+        make_rule(1, "working_days", ">= 15"),
+        make_rule(2, "working_days", ">= 20"),
+        make_rule(3, "actual_sales", ">= target_sales"),
+    ]
+    diff = diff_rules(previous, [extracted("working_days", ">= 20"), extracted("working_days", ">= 25")])
+
+    assert [(old.id, new["condition"]) for old, new in diff.unchanged] == [(2, ">= 20")]
+    assert [(old.id, new["condition"]) for old, new in diff.changed] == [(1, ">= 25")]
+    assert [old.id for old in diff.removed] == [3]
+    assert not diff.added
+
+
+def test_each_old_rule_matches_at_most_once():
+    previous = [make_rule(1, "working_days", ">= 20"), make_rule(2, "working_days", ">= 20")]
+    diff = diff_rules(previous, [extracted("working_days", ">= 20")])
+
+    assert [old.id for old, _ in diff.unchanged] == [1]
+    assert [old.id for old in diff.removed] == [2]
+
+    diff = diff_rules(previous[:1], [extracted("working_days", ">= 20"), extracted("working_days", ">= 20")])
+    assert len(diff.unchanged) == 1 and len(diff.added) == 1
+
+
+def test_new_field_is_added_and_rules_without_field_match_by_description():
+    previous = [make_rule(1, description="Managers  must Approve expenses", condition="approved")]
+    diff = diff_rules(previous, [
+        extracted(None, "approved", description="managers must approve expenses"),
+        extracted("customer_satisfaction_score", ">= 3"),
+    ])
+
+    assert [old.id for old, _ in diff.unchanged] == [1]
+    assert [r["field"] for r in diff.added] == ["customer_satisfaction_score"]
+
+
+def test_expression_and_inactive_rules_are_not_diffed():
+    previous = [
+        make_rule(1, expression="working_days >= 20 UNLESS actual_sales >= target_sales"),
+        make_rule(2, "data.recent_trades[].amount", "<= 5000"),
+        make_rule(3, "working_days", ">= 20", is_active=False),
+    ]
+    diff = diff_rules(previous, [extracted("working_days", ">= 20")])
+
+    assert [r["condition"] for r in diff.added] == [">= 20"]
+    assert not diff.removed and not diff.changed and not diff.unchanged
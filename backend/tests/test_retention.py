@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from sqlalchemy import select, update
+
+from config import settings
+from database import get_workspace, workspace_key
+from models.models import Rule, Violation
+from services.auth_service import decode_token
+from services.retention import RetentionPolicy, archive_violations
+
+
+@pytest.fixture(autouse=True)
+def no_archive(monkeypatch):
+    monkeypatch.setattr(settings, "RETENTION_ARCHIVE", False)
+
+
+def workspace_of(auth) -> str:
+    return workspace_key(int(decode_token(auth["Authorization"][7:])["sub"]))
+
+
+def seed_and_scan(client, auth):
+    records = [
+        {"employee_id": "E1", "name": "Low days", "working_days": 3},
+        {"employee_id": "E2", "name": "Compliant", "working_days": 22},
+        {"employee_id": "E3", "name": "Unhappy", "working_days": 22, "customer_satisfaction_score": 1},
+    ]
+    common = {"target_sales": 1000, "actual_sales": 1000, "customer_satisfaction_score": 5}
+    body = "\n".join(json.dumps({**common, **r}) for r in records).encode()
+    assert client.post("/api/employees/ingest", content=body, headers=auth).status_code == 200
+    return client.post("/api/scan/trigger", headers=auth).json()
+
+
+async def _violations(workspace):
+    ws = await get_workspace(workspace)
+    async with ws.sessionmaker() as db:
+        return (await db.execute(select(Violation.id, Violation.employee_id, Violation.rule_id)
+                                 .order_by(Violation.id))).all()
+
+
+def test_current_violations_survive_limits_and_are_not_recreated(client, auth, policy):
+    flagged = seed_and_scan(client, auth)
+    assert len(flagged) == 2
+    workspace = workspace_of(auth)
+
+    result = client.portal.call(archive_violations, workspace, RetentionPolicy(max_rows=1))
+    assert result.deleted == 0
+    assert client.post("/api/scan/trigger", headers=auth).json() == []
+
+
+def test_violations_that_no_longer_apply_expire(client, auth, policy):
+    flagged = seed_and_scan(client, auth)
+    workspace = workspace_of(auth)
+    retired_rule = next(v["rule_id"] for v in flagged if v["employee_id"] == 3)
+    stale = next(v for v in flagged if v["employee_id"] == 1)
+
+    async def retire_rule_and_duplicate():
+        ws = await get_workspace(workspace)
+        async with ws.sessionmaker() as db:
+            await db.execute(update(Rule).where(Rule.id == retired_rule).values(is_active=False))
+            db.add(Violation(employee_id=1, rule_id=stale["rule_id"], scan_id="later"))
+            await db.commit()
+
+    client.portal.call(retire_rule_and_duplicate)
+    result = client.portal.call(archive_violations, workspace, RetentionPolicy(max_rows=1))
+
+    assert result.deleted == 2
+    remaining = client.portal.call(_violations, workspace)
+    assert [(employee, rule) for _, employee, rule in remaining] == [(1, stale["rule_id"])]
+    assert remaining[0][0] != stale["id"]   # the newest row of the pair is kept
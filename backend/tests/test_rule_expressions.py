@@ -0,0 +1,162 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from conftest import DATA_DIR, make_employees
+from database import Base
+from models.models import Employee, JsonPathBuffer
+from services.column_store import ColumnStore
+from services.json_buffers import load_json_buffers, update_json_buffers
+from services.rule_expressions import ExpressionError, compile_expression
+
+
+# ─── Parsing ───────────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("source, expected", [
+    ("working_days >= 20", "working_days >= 20"),
+    ("working_days >= 20 and customer_satisfaction_score >= 3",
+     "(working_days >= 20 AND customer_satisfaction_score >= 3)"),
+    ("working_days >= 20 UNLESS actual_sales >= target_sales * 1.1",
+     "(working_days >= 20 OR actual_sales >= (target_sales * 1.1))"),
+    ("NOT working_days BETWEEN 10 AND 20", "NOT working_days BETWEEN 10 AND 20"),
+    ("policy_compliance IN ('Yes')", "policy_compliance IN ('Yes')"),
+    ("-working_days < -10", "-working_days < -10"),
+    ("data.recent_trades[].amount <= 5000", "data.recent_trades[].amount <= 5000"),
+])
+def test_parses_to_canonical_form(source, expected):
+    assert str(compile_expression(source)) == expected
+
+
+def test_references_columns_and_paths_in_first_use_order():
+    compiled = compile_expression("data.region == 'EU' OR actual_sales >= target_sales AND data.level >= 2")
+    assert compiled.columns == ("actual_sales", "target_sales")
+    assert [str(p) for p in compiled.paths] == ["data.region", "data.level"]
+
+
+@pytest.mark.parametrize("source, message, position", [
+    ("", "expression is empty", 0),
+    ("working_days >=", "unexpected end of expression", 15),
+    ("unknown_col > 1", "unknown column 'unknown_col'", 0),
+    ("policy_compliance > 'Yes'", "operator > is not supported for text columns", 18),
+    ("policy_compliance == 'Maybe'", "'Maybe' is not a valid value for policy_compliance", 18),
+    ("data.a[].b[] > 1", "only one '[]' per JSON path is supported", 0),
+    ("data.x + 1 > 2", "expected a number, got JSON value data.x", 7),
+    ("working_days >= 'x'", "cannot compare number working_days with string 'x'", 13),
+    ("(working_days > 1", "expected ')' but found end of expression", 17),
+    ("working_days > 1)", "unexpected ')'", 16),
+    ("working_days", "expected a condition", 0),
+    ("working_days IN ()", "unexpected ')'", 17),
+    ("working_days >= 20 @ 3", "unexpected character '@'", 19),
+    ("x" * 5000, "expression is longer than", None),
+])
+def test_rejects_invalid_expressions(source, message, position):
+    with pytest.raises(ExpressionError) as raised:
+        compile_expression(source)
+    assert message in raised.value.message
+    assert raised.value.position == position
+
+
+# ─── Backends agree ────────────────────────────────────────────────────────────
+
+EXPRESSIONS = [
+    "working_days >= 20",
+    "working_days >= 20 AND customer_satisfaction_score >= 3",
+    "working_days >= 20 AND customer_satisfaction_score >= 3 UNLESS actual_sales >= target_sales * 1.1",
+    "NOT working_days BETWEEN 12 AND 22",
+    "policy_compliance IN ('Yes')",
+    "policy_compliance == 'Yes' OR working_days > 24",
+    "actual_sales - target_sales > -1000",
+    "-working_days < -15",
+    "actual_sales / target_sales >= 0.9",
+    "NOT actual_sales / target_sales > 1.5 OR working_days >= 20",
+    "data.recent_trades[].amount <= 5000",
+    "data.recent_trades[].desk == 'fx'",
+    "data.recent_trades[].amount < 5000 AND working_days >= 15",
+    "data.level >= 2",
+    "data.region == 'EU' OR data.level >= 2",
+    "data.tags[] IN ('a', 'vip')",
+    "NOT data.region == 'US'",
+]
+
+
+@pytest.fixture(scope="module")
+def persisted():
+    """
+    The fixture as stored (column defaults replace its gaps), with the violators
+    of each expression according to SQL and the JSON path buffers it uses.
+    """
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{DATA_DIR}/expressions.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[Employee.__table__, JsonPathBuffer.__table__])
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        async with sessionmaker() as db:
+            employees = make_employees()
+            db.add_all(employees)
+            await db.flush()
+            await update_json_buffers(db, [(e.id, e.data) for e in employees])
+            await db.commit()
+
+        async with sessionmaker() as db:
+            stored = (await db.execute(select(Employee).order_by(Employee.id))).scalars().all()
+            sql, buffers = {}, {}
+            for source in EXPRESSIONS:
+                compiled = compile_expression(source)
+                sql[source] = sorted((await db.execute(
+                    select(Employee.id).where(compiled.violation_sql())
+                )).scalars().all())
+                buffers[source] = await load_json_buffers(db, compiled.paths)
+        await engine.dispose()
+        return stored, sql, buffers
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("source", EXPRESSIONS)
+def test_mask_sql_and_closure_backends_agree(source, persisted):
+    employees, sql, buffers = persisted
+    compiled = compile_expression(source)
+
+    mask = sorted(employees[row].id for row in compiled.violating_rows(ColumnStore.from_objects(employees)))
+    closure = sorted(e.id for e in employees if compiled.violates(e))
+    buffered = sorted(
+        employees[row].id
+        for row in compiled.violating_rows(ColumnStore.from_objects(employees, buffers[source]))
+    )
+
+    assert mask, "the fixture should make every expression flag someone"
+    assert mask == closure == sql[source] == buffered
+
+
+def test_buffers_map_onto_a_subset_in_any_order(persisted):
+    employees, _, buffers = persisted
+    source = "data.recent_trades[].amount <= 5000"
+    subset = employees[::-3]
+    compiled = compile_expression(source)
+
+    walked = compiled.violating_rows(ColumnStore.from_objects(subset))
+    buffered = compiled.violating_rows(ColumnStore.from_objects(subset, buffers[source]))
+    assert buffered == walked
+
+
+@pytest.mark.parametrize("source", EXPRESSIONS)
+def test_missing_values_are_never_flagged(source):
+    employees = make_employees()
+    compiled = compile_expression(source)
+
+    mask = [employees[row] for row in compiled.violating_rows(ColumnStore.from_objects(employees))]
+    assert [e.id for e in mask] == [e.id for e in employees if compiled.violates(e)]
+    assert all(getattr(e, column) is not None for e in mask for column in compiled.columns)
+
+
+def test_zero_divisor_is_a_missing_value():
+    employees = make_employees()
+    compiled = compile_expression("actual_sales / target_sales <= 1")
+    zero_target = [row for row, e in enumerate(employees) if e.target_sales == 0 and e.actual_sales]
+
+    assert zero_target
+    assert not set(zero_target) & set(compiled.violating_rows(ColumnStore.from_objects(employees)))
+    assert not any(compiled.violates(employees[row]) for row in zero_target)
+    assert not compile_expression("working_days / 0 > 1").violating_rows(ColumnStore.from_objects(employees))
@@ -0,0 +1,70 @@
+import json
+
+
+def seed_employees(client, auth):
+    records = [
+        {"employee_id": "E1", "name": "Low days", "working_days": 3, "target_sales": 1000, "actual_sales": 1000,
+         "customer_satisfaction_score": 5},
+        {"employee_id": "E2", "name": "Compliant", "working_days": 22, "target_sales": 1000, "actual_sales": 1000,
+         "customer_satisfaction_score": 5},
+    ]
+    body = "\n".join(json.dumps(r) for r in records).encode()
+    assert client.post("/api/employees/ingest", content=body, headers=auth).status_code == 200
+
+
+def trigger(client, auth):
+    response = client.post("/api/scan/trigger", headers=auth)
+    assert response.status_code == 200, response.text
+    return response
+
+
+def test_repeat_scan_is_served_from_the_cache(client, auth, policy):
+    seed_employees(client, auth)
+    first = trigger(client, auth)
+    assert first.headers["X-Scan-Cache"] == "miss"
+    assert [v["employee_id"] for v in first.json()] == [1]
+
+    again = trigger(client, auth)
+    assert again.headers["X-Scan-Cache"] == "hit"
+    assert again.headers["X-Scan-Cached-From"] == first.headers["X-Scan-Id"]
+    assert again.json() == []   # nothing new; the cached scan's violations stay listed under its id
+
+    listed = client.get("/api/violations/", params={"scan_id": first.headers["X-Scan-Id"]}, headers=auth)
+    assert [v["id"] for v in listed.json()] == [v["id"] for v in first.json()]
+
+
+def test_employee_writes_invalidate_the_cache(client, auth, policy):
+    seed_employees(client, auth)
+    trigger(client, auth)
+
+    response = client.put("/api/employees/E2", headers=auth, json={
+        "employee_id": "E2", "name": "Compliant", "working_days": 4, "target_sales": 1000, "actual_sales": 1000,
+        "customer_satisfaction_score": 5,
+    })
+    assert response.status_code == 200, response.text
+
+    rescan = trigger(client, auth)
+    assert rescan.headers["X-Scan-Cache"] == "miss"
+    assert "X-Scan-Cached-From" not in rescan.headers
+    assert [v["employee_id"] for v in rescan.json()] == [2]   # only new violations are returned
+
+
+def test_rule_changes_invalidate_the_cache(client, auth, policy):
+    seed_employees(client, auth)
+    trigger(client, auth)
+
+    response = client.post("/api/rules/", headers=auth, json={
+        "policy_id": policy, "description": "At least 25 working days",
+        "expression": "working_days >= 25", "severity": "Low",
+    })
+    assert response.status_code == 201, response.text
+
+    rescan = trigger(client, auth)
+    assert rescan.headers["X-Scan-Cache"] == "miss"
+    assert trigger(client, auth).headers["X-Scan-Cache"] == "hit"
+
+
+def test_scan_without_employees_does_not_run(client, auth, policy):
+    first = trigger(client, auth)
+    assert first.json() == []
+    assert "X-Scan-Cache" not in first.headers
@@ -0,0 +1,58 @@
+import json
+import time
+from datetime import datetime, timedelta
+
+from services import scheduler
+
+
+def seed_employees(client, auth):
+    records = [
+        {"employee_id": "E1", "name": "Low days", "working_days": 3},
+        {"employee_id": "E2", "name": "Compliant", "working_days": 22},
+    ]
+    common = {"target_sales": 1000, "actual_sales": 1000, "customer_satisfaction_score": 5}
+    body = "\n".join(json.dumps({**common, **r}) for r in records).encode()
+    assert client.post("/api/employees/ingest", content=body, headers=auth).status_code == 200
+
+
+def wait_for_runs(client, auth, count, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get("/api/schedules/status", headers=auth).json()
+        if not status["running"] and not status["queued"] and len(status["recent"]) >= count:
+            return status["recent"]
+        time.sleep(0.05)
+    raise AssertionError(f"scheduled runs did not finish: {status}")
+
+
+def scan_logs(client, auth):
+    return list(reversed(client.get("/api/scan/logs", headers=auth).json()))
+
+
+def test_manual_and_unchanged_runs_are_logged_with_their_trigger(client, auth, policy):
+    seed_employees(client, auth)
+    schedule = client.post("/api/schedules/", json={"cron": "@daily"}, headers=auth).json()
+
+    assert client.post(f"/api/schedules/{schedule['id']}/run", headers=auth).status_code == 202
+    wait_for_runs(client, auth, 1)
+    assert client.post(f"/api/schedules/{schedule['id']}/run", headers=auth).status_code == 202
+    recent = wait_for_runs(client, auth, 2)
+
+    assert [run["status"] for run in recent[:2]] == ["unchanged", "scanned"]
+    first, second = scan_logs(client, auth)
+    assert [log["trigger_type"] for log in (first, second)] == ["manual", "manual"]
+    assert first["cached_from"] is None
+    assert second["cached_from"] == first["scan_id"]
+    assert second["violation_count"] == first["violation_count"] == 1
+
+
+def test_runs_claimed_by_a_tick_are_logged_as_scheduled(client, auth, policy):
+    seed_employees(client, auth)
+    schedule = client.post("/api/schedules/", json={"cron": "@hourly"}, headers=auth).json()
+
+    due = datetime.fromisoformat(schedule["next_run_at"]) + timedelta(seconds=1)
+    assert client.portal.call(scheduler.tick, due) >= 1
+    wait_for_runs(client, auth, 1)
+
+    [log] = scan_logs(client, auth)
+    assert log["trigger_type"] == "scheduled"
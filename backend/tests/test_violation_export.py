@@ -0,0 +1,36 @@
+import csv
+import io
+import json
+import zipfile
+
+
+def seed_and_scan(client, auth, name):
+    record = {"employee_id": "E1", "name": name, "working_days": 3, "target_sales": 1000,
+              "actual_sales": 1000, "customer_satisfaction_score": 5}
+    assert client.post("/api/employees/ingest", content=json.dumps(record).encode(), headers=auth).status_code == 200
+    assert len(client.post("/api/scan/trigger", headers=auth).json()) == 1
+
+
+def test_csv_export_joins_employee_and_rule(client, auth, policy):
+    seed_and_scan(client, auth, "Ada Lovelace")
+    response = client.get("/api/violations/export", headers=auth)
+
+    assert response.status_code == 200
+    header, row = list(csv.reader(io.StringIO(response.text)))
+    assert "Ada Lovelace" in row and len(row) == len(header)
+
+
+def test_exports_do_not_turn_uploaded_text_into_formulas(client, auth, policy):
+    name = '=HYPERLINK("http://example.com","x")'
+    seed_and_scan(client, auth, name)
+
+    _, row = list(csv.reader(io.StringIO(client.get("/api/violations/export", headers=auth).text)))
+    assert "'" + name in row
+
+    response = client.get("/api/violations/export", params={"format": "xlsx"}, headers=auth)
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.content)) as workbook:
+        sheet = workbook.read("xl/worksheets/sheet1.xml").decode()
+        strings = workbook.read("xl/sharedStrings.xml").decode() if "xl/sharedStrings.xml" in workbook.namelist() else ""
+    assert "<f>" not in sheet
+    assert "HYPERLINK" in sheet + strings
@@ -0,0 +1,54 @@
+import json
+
+from sqlalchemy import func, select
+
+from database import clear_workspace, get_workspace, workspace_key
+from models.models import Employee
+from services.auth_service import decode_token
+
+
+def workspace_of(auth) -> str:
+    return workspace_key(int(decode_token(auth["Authorization"][7:])["sub"]))
+
+
+def search(client, auth, q="satisfaction"):
+    return client.get("/api/policies/search", params={"q": q}, headers=auth).json()["results"]
+
+
+def seed(client, auth):
+    body = "\n".join(json.dumps({"employee_id": f"E{i}", "name": "n", "working_days": i}) for i in range(30))
+    client.post("/api/employees/ingest", content=body.encode(), headers=auth)
+    assert client.post("/api/scan/trigger", headers=auth).json()
+
+
+def test_reset_empties_the_workspace_and_its_search_index(client, auth, policy):
+    seed(client, auth)
+    assert search(client, auth)
+
+    assert client.post("/api/scan/reset", headers=auth).status_code == 200
+    for path in ("/api/employees/", "/api/violations/", "/api/policies/", "/api/rules/"):
+        assert client.get(path, headers=auth).json() == [], path
+    assert search(client, auth) == []
+
+    with open(__import__("conftest").POLICY_PDF, "rb") as pdf:
+        client.post("/api/policies/upload", headers=auth,
+                    files={"file": ("Global_Policy_V2.pdf", pdf, "application/pdf")})
+    assert search(client, auth)
+    seed(client, auth)
+
+
+def test_clear_workspace_rolls_back_with_its_transaction(client, auth, policy):
+    seed(client, auth)
+    workspace = workspace_of(auth)
+
+    async def clear_then_roll_back():
+        ws = await get_workspace(workspace)
+        async with ws.sessionmaker() as db:
+            await clear_workspace(db)
+            assert (await db.execute(select(func.count()).select_from(Employee))).scalar() == 0
+            await db.rollback()
+        async with ws.sessionmaker() as db:
+            return (await db.execute(select(func.count()).select_from(Employee))).scalar()
+
+    assert client.portal.call(clear_then_roll_back) == 30
+    assert search(client, auth)